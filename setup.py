@@ -65,6 +65,13 @@ setup(
     install_requires=requires,
     tests_require=requires,
     test_suite='pyomgidl.tests.suite',
+    entry_points={
+        'console_scripts': [
+            'pyomgidl = pyomgidl.commands:main',
+            'pyomgidl-daemon = pyomgidl.daemon:main',
+            'pyomgidl-client = pyomgidl.client:main',
+            ],
+        },
     generation_hooks=[
         ply_generation_hook,
         ]
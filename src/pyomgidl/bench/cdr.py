@@ -0,0 +1,148 @@
+import sys
+import time
+from StringIO import StringIO
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser
+from pyomgidl.codegen import CDRGenerator
+from pyomgidl.runtime import cdr as _cdr
+
+__all__ = [
+    'IDL',
+    'compile_codecs',
+    'measure',
+    'main',
+    ]
+
+IDL = '''
+struct Tick {
+  unsigned long long timestamp;
+  double bid;
+  double ask;
+  long bid_size;
+  long ask_size;
+  unsigned short venue;
+  boolean firm;
+};
+
+struct Order {
+  string symbol;
+  unsigned long id;
+  double price;
+  long quantity;
+  sequence<long> fills;
+  sequence<octet> tag;
+};
+
+struct Book {
+  string symbol;
+  sequence<Tick> ticks;
+};
+
+struct Telemetry {
+  sequence<double> values;
+  sequence<Tick> ticks;
+};
+
+struct Frame {
+  unsigned long width;
+  unsigned long height;
+  sequence<octet> pixels;
+};
+'''
+
+def compile_codecs(pack_runs=True, numpy=False):
+    out = StringIO()
+    CDRGenerator(out=out, pack_runs=pack_runs, numpy=numpy)(parser().parse(IDL, lexer=lexer()))
+    namespace = {}
+    exec out.getvalue() in namespace
+    return namespace
+
+def samples(ns):
+    tick = ns['Tick'](1234567890123, 101.25, 101.5, 300, 200, 7, True)
+    return [
+        ('Tick', tick),
+        ('Order', ns['Order']('ACME', 42, 101.25, 500, [100, 200, 200], 'client-7')),
+        ('Book', ns['Book']('ACME', [tick] * 20)),
+        ]
+
+def measure(function, argument, duration):
+    count = 0
+    n = 1
+    start = time.time()
+    while True:
+        for _ in range(n):
+            function(argument)
+        count += n
+        elapsed = time.time() - start
+        if elapsed >= duration:
+            return count / elapsed
+        n *= 2
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Measures CDR marshaling throughput of generated codecs')
+    argparser.add_argument('--duration', type=float, default=0.5)
+    argparser.add_argument('--frame-size', type=int, default=4 << 20)
+    argparser.add_argument('--telemetry-size', type=int, default=100000)
+    argparser.add_argument('--batch-sizes', default='1,100,10000')
+    options = argparser.parse_args(argv)
+
+    sys.stdout.write('%-8s %-10s %8s %14s %14s\n' % ('type', 'runs', 'octets', 'encode (msg/s)', 'decode (msg/s)'))
+    for pack_runs in (True, False):
+        ns = compile_codecs(pack_runs)
+        for name, value in samples(ns):
+            encode, decode = ns['encode_' + name], ns['decode_' + name]
+            data = encode(value)
+            sys.stdout.write('%-8s %-10s %8d %14.0f %14.0f\n' % (
+                name, pack_runs and 'packed' or 'per-field', len(data),
+                measure(encode, value, options.duration),
+                measure(decode, data, options.duration)))
+
+    ns = compile_codecs()
+    decode = ns['decode_Frame']
+    data = ns['encode_Frame'](ns['Frame'](1024, options.frame_size // 1024, b'\0' * options.frame_size))
+    sys.stdout.write('\n%-8s %-10s %8s %14s\n' % ('type', 'octets', 'mode', 'decode (msg/s)'))
+    for copy in (True, False):
+        sys.stdout.write('%-8s %-10d %8s %14.0f\n' % (
+            'Frame', len(data), copy and 'copy' or 'view',
+            measure(lambda data: decode(data, copy=copy), data, options.duration)))
+
+    sys.stdout.write('\n%-10s %-10s %8s %14s %14s\n' % ('type', 'octets', 'path', 'encode (msg/s)', 'decode (msg/s)'))
+    for use_numpy in (False, True):
+        if use_numpy and _cdr.numpy is None:
+            sys.stdout.write('numpy is not available\n')
+            break
+        ns = compile_codecs(numpy=use_numpy)
+        tick = samples(ns)[0][1]
+        value = ns['Telemetry'](
+            [i * 0.5 for i in range(options.telemetry_size)],
+            [tick] * options.telemetry_size)
+        data = ns['encode_Telemetry'](value)
+        if use_numpy:
+            value = ns['decode_Telemetry'](data)
+        sys.stdout.write('%-10s %-10d %8s %14.2f %14.2f\n' % (
+            'Telemetry', len(data), use_numpy and 'numpy' or 'python',
+            measure(ns['encode_Telemetry'], value, options.duration),
+            measure(ns['decode_Telemetry'], data, options.duration)))
+
+    ns = compile_codecs()
+    tick = samples(ns)[0][1]
+    encode, decode = ns['encode_Tick'], ns['decode_Tick']
+    encode_many, decode_many = ns['encode_many_Tick'], ns['decode_many_Tick']
+    sys.stdout.write('\n%-8s %6s %-8s %14s %14s\n' % ('type', 'batch', 'api', 'encode (rec/s)', 'decode (rec/s)'))
+    for n in [int(n) for n in options.batch_sizes.split(',')]:
+        records = [tick] * n
+        messages = [encode(record) for record in records]
+        buf = bytearray()
+        encode_many(records, buf)
+        for api, encode_batch, decode_batch, data in (
+                ('single', lambda records: [encode(record) for record in records],
+                    lambda messages: [decode(message) for message in messages], messages),
+                ('many', lambda records: encode_many(records, buf),
+                    lambda data: decode_many(data, n), bytes(buf))):
+            sys.stdout.write('%-8s %6d %-8s %14.0f %14.0f\n' % (
+                'Tick', n, api,
+                measure(encode_batch, records, options.duration) * n,
+                measure(decode_batch, data, options.duration) * n))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import os
+import random
+
+__all__ = [
+    'Corpus',
+    'generate_corpus',
+    'write_corpus',
+    ]
+
+MAIN = 'main.idl'
+
+TYPES = ('long', 'short', 'double', 'boolean', 'string', 'unsigned long long', 'octet')
+
+COMMENTS = (
+    '// %s',
+    '/* %s */',
+    '/*\n * %s\n */',
+    )
+
+WORDS = ('returns', 'the', 'current', 'value', 'of', 'a', 'quote', 'when', 'order', 'book', 'is', 'updated')
+
+class Corpus(object):
+    # the knobs of a synthetic IDL tree. modules are nested depth levels
+    # deep and each innermost one holds interfaces; includes is the number
+    # of files main.idl includes, each of which includes a shared base.
+    # macro_density is the fraction of operations declared through a
+    # function-like macro and of parameters bounded by a macro, comments
+    # the number of comments before each operation
+    __slots__ = ('modules', 'interfaces', 'operations', 'depth', 'includes', 'macro_density', 'comments', 'seed')
+
+    def __init__(self, modules=4, interfaces=8, operations=8, depth=2, includes=4,
+                 macro_density=0.2, comments=1, seed=0):
+        self.modules = modules
+        self.interfaces = interfaces
+        self.operations = operations
+        self.depth = depth
+        self.includes = includes
+        self.macro_density = macro_density
+        self.comments = comments
+        self.seed = seed
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+def comment(rng):
+    return rng.choice(COMMENTS) % ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+
+def base_file():
+    return ''.join([
+        '#ifndef BASE_IDL\n',
+        '#define BASE_IDL\n',
+        '#define MAX_NAME 32\n',
+        '#define MAX_ITEMS 64\n',
+        '#define DECLARE_OP(name, t) t name(in t a, in Base::Name b, out t c)\n',
+        'module Base {\n',
+        '  typedef string<MAX_NAME> Name;\n',
+        '  typedef sequence<long, MAX_ITEMS> Longs;\n',
+        '  enum Status { OK, PENDING, FAILED };\n',
+        '  exception Failure { string reason; Status status; };\n',
+        '};\n',
+        '#endif\n',
+        ])
+
+def include_file(i):
+    guard = 'COMMON%d_IDL' % i
+    retval = [
+        '#ifndef %s\n' % guard,
+        '#define %s\n' % guard,
+        '#include "base.idl"\n',
+        'module Common%d {\n' % i,
+        ]
+    retval.append('  struct Item { Base::Name name; double price; long quantity[4]; };\n')
+    retval.append('  typedef sequence<Item, MAX_ITEMS> Items;\n')
+    retval.append('  union Value switch (long) { case 0: long l; case 1: double d; default: Base::Name s; };\n')
+    retval.append('  const long LIMIT = MAX_ITEMS * %d;\n' % (i + 1))
+    retval.append('};\n')
+    retval.append('#endif\n')
+    return ''.join(retval)
+
+def parameter_type(corpus, rng):
+    if corpus.includes and rng.random() < 0.3:
+        i = rng.randrange(corpus.includes)
+        return rng.choice(['Common%d::Item' % i, 'Common%d::Items' % i, 'Common%d::Value' % i])
+    if rng.random() < corpus.macro_density:
+        return rng.choice(['Base::Longs', 'Base::Name'])
+    return rng.choice(TYPES)
+
+def interface(corpus, rng, name, pad):
+    retval = ['%sinterface %s {\n' % (pad, name)]
+    pad += '  '
+    for k in range(corpus.operations):
+        for _ in range(corpus.comments):
+            retval.append(''.join(pad + line + '\n' for line in comment(rng).split('\n')))
+        if rng.random() < corpus.macro_density:
+            retval.append('%sDECLARE_OP(op%d, %s);\n' % (pad, k, rng.choice(TYPES[:4])))
+        elif k % 4 == 3:
+            retval.append('%sattribute %s attr%d;\n' % (pad, parameter_type(corpus, rng), k))
+        else:
+            parameters = ', '.join('%s %s p%d' % (rng.choice(('in', 'in', 'out', 'inout')), parameter_type(corpus, rng), n)
+                                   for n in range(rng.randint(0, 4)))
+            retval.append('%s%s op%d(%s) raises (Base::Failure);\n' % (pad, parameter_type(corpus, rng), k, parameters))
+    retval.append('%s};\n' % pad[:-2])
+    return ''.join(retval)
+
+def main_file(corpus, rng):
+    retval = ['#include "base.idl"\n']
+    retval.extend('#include "common%d.idl"\n' % i for i in range(corpus.includes))
+    for i in range(corpus.modules):
+        pad = ''
+        names = ['M%d' % i] + ['N%d' % d for d in range(1, corpus.depth)]
+        for name in names:
+            retval.append('%smodule %s {\n' % (pad, name))
+            pad += '  '
+        for j in range(corpus.interfaces):
+            retval.append(interface(corpus, rng, 'I%d' % j, pad))
+        for _ in names:
+            pad = pad[:-2]
+            retval.append('%s};\n' % pad)
+    return ''.join(retval)
+
+def generate_corpus(corpus=None):
+    # file name -> IDL text, the same for the same knobs and seed;
+    # MAIN includes every other file
+    if corpus is None:
+        corpus = Corpus()
+    rng = random.Random(corpus.seed)
+    retval = {'base.idl': base_file()}
+    for i in range(corpus.includes):
+        retval['common%d.idl' % i] = include_file(i)
+    retval[MAIN] = main_file(corpus, rng)
+    return retval
+
+def write_corpus(files, directory):
+    for name, text in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(text)
+    return os.path.join(directory, MAIN)
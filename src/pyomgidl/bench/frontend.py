@@ -0,0 +1,167 @@
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+from StringIO import StringIO
+from argparse import ArgumentParser
+from zope.interface import implements
+from pyomgidl.reader import lexer, parser, preprocess
+from pyomgidl.reader.interfaces import INodeVisitor
+from pyomgidl.reader.tree import walk_ast_nodes
+from pyomgidl.codegen import InterfaceGenerator
+from pyomgidl.bench.corpus import Corpus, generate_corpus, write_corpus
+
+__all__ = [
+    'PHASES',
+    'compare',
+    'measure_phases',
+    'main',
+    ]
+
+PHASES = ('preprocess', 'lex', 'parse', 'walk', 'generate')
+
+# the metrics a baseline is checked against; rates regress when they drop,
+# everything else when it grows
+COMPARED = PHASES + ('tokens_per_s', 'nodes_per_s', 'peak_rss_kb')
+RATES = frozenset(['tokens_per_s', 'nodes_per_s'])
+
+class NodeCounter(object):
+    implements(INodeVisitor)
+
+    def __init__(self):
+        self.count = 0
+
+    def visit(self, node):
+        self.count += 1
+
+    def depart(self, node):
+        pass
+
+for name in INodeVisitor.names():
+    setattr(NodeCounter, name, NodeCounter.__dict__[name.split('_')[0]])
+
+def peak_rss():
+    # kilobytes; macOS reports bytes
+    retval = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return sys.platform == 'darwin' and retval // 1024 or retval
+
+def best_of(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result = function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def read_preprocessed(path):
+    with open(path) as f:
+        return preprocess(f)
+
+def count_tokens(text):
+    retval = 0
+    lex = lexer()
+    lex.input(text)
+    while lex.token() is not None:
+        retval += 1
+    return retval
+
+def count_nodes(spec):
+    counter = NodeCounter()
+    walk_ast_nodes(spec, counter)
+    return counter.count
+
+def measure_phases(path, repeat=3):
+    # best of repeat for every phase. parse lexes as it goes, since the
+    # grammar switches lexer states, so lex is also measured on its own
+    results = {}
+    results['preprocess'], text = best_of(lambda: read_preprocessed(path), repeat)
+    results['lex'], tokens = best_of(lambda: count_tokens(text), repeat)
+    results['parse'], spec = best_of(lambda: parser().parse(text, lexer=lexer()), repeat)
+    results['walk'], nodes = best_of(lambda: count_nodes(spec), repeat)
+    results['generate'], _ = best_of(lambda: InterfaceGenerator(out=StringIO())(spec), repeat)
+    results['octets'] = len(text)
+    results['tokens'] = tokens
+    results['nodes'] = nodes
+    results['tokens_per_s'] = tokens / results['lex']
+    results['nodes_per_s'] = nodes / results['parse']
+    results['peak_rss_kb'] = peak_rss()
+    return results
+
+def compare(results, baseline, threshold=0.1, thresholds={}):
+    # (metric, baseline, current, relative change) of every metric that is
+    # worse than the baseline by more than its threshold
+    retval = []
+    for metric in COMPARED:
+        before, after = baseline.get(metric), results.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / float(before)
+        if (metric in RATES and -change or change) > thresholds.get(metric, threshold):
+            retval.append((metric, before, after, change))
+    return retval
+
+def parse_thresholds(values):
+    retval = {}
+    for value in values:
+        metric, _, fraction = value.partition('=')
+        if metric not in COMPARED:
+            raise ValueError('Unknown metric: %s' % metric)
+        retval[metric] = float(fraction)
+    return retval
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Measures each phase of the IDL front end over a synthetic corpus')
+    argparser.add_argument('idl', nargs='?', help='IDL file to measure instead of the synthetic corpus')
+    defaults = Corpus()
+    for knob in Corpus.__slots__:
+        argparser.add_argument('--' + knob.replace('_', '-'), type=type(getattr(defaults, knob)), default=getattr(defaults, knob))
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument('--baseline', help='JSON file of earlier results to compare with')
+    argparser.add_argument('--save-baseline', help='writes the results to this JSON file')
+    argparser.add_argument('--threshold', type=float, default=0.1, help='tolerated relative regression')
+    argparser.add_argument('--metric-threshold', action='append', default=[], metavar='METRIC=FRACTION')
+    options = argparser.parse_args(argv)
+
+    corpus = Corpus(**dict((knob, getattr(options, knob)) for knob in Corpus.__slots__))
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = options.idl or write_corpus(generate_corpus(corpus), work_dir)
+        results = measure_phases(path, options.repeat)
+    finally:
+        shutil.rmtree(work_dir)
+    subject = options.idl or corpus.as_dict()
+
+    baseline = {}
+    if options.baseline:
+        with open(options.baseline) as f:
+            saved = json.load(f)
+        if saved['subject'] != subject:
+            sys.stderr.write('The baseline was measured on %r\n' % (saved['subject'], ))
+            return 2
+        baseline = saved['results']
+
+    sys.stdout.write('%d octets, %d tokens, %d nodes\n' % (results['octets'], results['tokens'], results['nodes']))
+    sys.stdout.write('%-14s %14s %14s %9s\n' % ('metric', 'current', 'baseline', 'change'))
+    for metric in COMPARED:
+        scale = metric in PHASES and 1000 or 1
+        before = baseline.get(metric)
+        sys.stdout.write('%-14s %14.2f %14s %9s\n' % (
+            metric in PHASES and metric + ' (ms)' or metric, results[metric] * scale,
+            before is not None and '%.2f' % (before * scale) or '-',
+            before and '%+.1f%%' % ((results[metric] - before) * 100.0 / before) or '-'))
+
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as f:
+            json.dump({'subject': subject, 'results': results}, f, indent=2, sort_keys=True)
+
+    regressions = compare(results, baseline, options.threshold, parse_thresholds(options.metric_threshold))
+    for metric, before, after, change in regressions:
+        sys.stdout.write('regression: %s %+.1f%% (%.4g -> %.4g)\n' % (metric, change * 100, before, after))
+    return regressions and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
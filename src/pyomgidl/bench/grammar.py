@@ -0,0 +1,69 @@
+import sys
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser, preprocess, RuleProfile
+from pyomgidl.bench.corpus import Corpus, generate_corpus, write_corpus
+
+__all__ = [
+    'profile_files',
+    'compare',
+    'main',
+    ]
+
+def profile_files(paths, repeat=1, webidl=False):
+    # preprocessing is left out, only the parses are profiled
+    texts = []
+    for path in paths:
+        with open(path) as f:
+            texts.append(preprocess(f))
+    retval = RuleProfile()
+    for _ in range(repeat):
+        for text in texts:
+            parser(webidl=webidl, profile=retval).parse(text, lexer=lexer(webidl=webidl))
+    return retval
+
+def compare(before, after, out=sys.stdout, limit=None):
+    # actions whose time per call changed most between two profiles first
+    rows = []
+    for name in set(before.rules) | set(after.rules):
+        calls0, seconds0 = before.rules.get(name, (0, 0.0))
+        calls1, seconds1 = after.rules.get(name, (0, 0.0))
+        mean0 = calls0 and seconds0 / calls0 or 0.0
+        mean1 = calls1 and seconds1 / calls1 or 0.0
+        rows.append((name, calls0, calls1, mean0, mean1))
+    rows.sort(key=lambda row: (-abs(row[4] - row[3]), row[0]))
+    out.write('%-40s %10s %10s %12s %12s %8s\n' % ('action', 'calls', 'calls', 'us/call', 'us/call', 'change'))
+    for name, calls0, calls1, mean0, mean1 in rows[:limit]:
+        out.write('%-40s %10d %10d %12.2f %12.2f %8s\n' % (
+            name, calls0, calls1, mean0 * 1e6, mean1 * 1e6,
+            mean0 and '%+.1f%%' % ((mean1 - mean0) * 100 / mean0) or '-'))
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Profiles the grammar actions of the IDL parser')
+    argparser.add_argument('idl', nargs='*', help='IDL files to parse (default: the synthetic corpus)')
+    argparser.add_argument('--webidl', action='store_true')
+    argparser.add_argument('--repeat', type=int, default=5)
+    argparser.add_argument('--limit', type=int, default=30, help='actions shown')
+    argparser.add_argument('--dump', help='writes the profile to this JSON file')
+    argparser.add_argument('--compare', help='JSON dump of an earlier profile to compare with')
+    options = argparser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        paths = options.idl or [write_corpus(generate_corpus(Corpus()), work_dir)]
+        profile = profile_files(paths, options.repeat, options.webidl)
+    finally:
+        shutil.rmtree(work_dir)
+    profile.report(limit=options.limit)
+    if options.dump:
+        with open(options.dump, 'w') as f:
+            profile.dump(f)
+    if options.compare:
+        with open(options.compare) as f:
+            before = RuleProfile.load(f)
+        sys.stdout.write('\n')
+        compare(before, profile, limit=options.limit)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser
+from pyomgidl.codegen import InterfaceGenerator
+
+__all__ = [
+    'generate_idl',
+    'measure',
+    'main',
+    ]
+
+PREFIX = 'bench_gen'
+
+PROBE = '''
+import sys, time
+sys.path.insert(0, %(base_dir)r)
+start = time.time()
+%(statements)s
+sys.stdout.write('%%f\\n' %% (time.time() - start))
+'''
+
+def generate_idl(modules, interfaces, operations):
+    retval = []
+    for i in range(modules):
+        retval.append('module M%d {\n' % i)
+        for j in range(interfaces):
+            retval.append('  interface M%d_I%d {\n' % (i, j))
+            for k in range(operations):
+                retval.append('    long op%d(in long a, in string b, out double c);\n' % k)
+                retval.append('    attribute long attr%d;\n' % k)
+            retval.append('  };\n')
+        retval.append('};\n')
+    return ''.join(retval)
+
+def generate(spec, base_dir, layout):
+    if layout == 'single':
+        os.makedirs(base_dir)
+        with open(os.path.join(base_dir, PREFIX + '.py'), 'w') as out:
+            InterfaceGenerator(out=out)(spec)
+    else:
+        InterfaceGenerator(base_dir, prefix=PREFIX, lazy=(layout == 'lazy'))(spec)
+
+def probe_statements(layout, touch, interfaces):
+    names = ['M0_I%d' % j for j in range(min(touch, interfaces))]
+    if layout == 'single':
+        return '\n'.join(['import %s' % PREFIX] + ['%s.%s' % (PREFIX, name) for name in names])
+    return '\n'.join(['import %s.M0' % PREFIX] + ['%s.M0.%s' % (PREFIX, name) for name in names])
+
+def measure(base_dir, statements, repeat):
+    script = PROBE % dict(base_dir=base_dir, statements=statements)
+    # the first run byte-compiles the generated modules
+    subprocess.check_output([sys.executable, '-c', script])
+    return sorted(float(subprocess.check_output([sys.executable, '-c', script])) for _ in range(repeat))[repeat // 2]
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Measures the import time of generated interface modules')
+    argparser.add_argument('--modules', type=int, default=20)
+    argparser.add_argument('--interfaces', type=int, default=50)
+    argparser.add_argument('--operations', type=int, default=10)
+    argparser.add_argument('--touch', type=int, default=5)
+    argparser.add_argument('--repeat', type=int, default=5)
+    options = argparser.parse_args(argv)
+
+    spec = parser().parse(generate_idl(options.modules, options.interfaces, options.operations), lexer=lexer())
+    work_dir = tempfile.mkdtemp()
+    try:
+        sys.stdout.write('%-8s %12s\n' % ('layout', 'import (ms)'))
+        for layout in ('single', 'module', 'lazy'):
+            base_dir = os.path.join(work_dir, layout)
+            generate(spec, base_dir, layout)
+            elapsed = measure(base_dir, probe_statements(layout, options.touch, options.interfaces), options.repeat)
+            sys.stdout.write('%-8s %12.2f\n' % (layout, elapsed * 1000))
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import sys
+import json
+from StringIO import StringIO
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser
+from pyomgidl.codegen import JSONGenerator
+from pyomgidl.bench.cdr import measure
+
+__all__ = [
+    'IDL',
+    'reflective_to_json',
+    'main',
+    ]
+
+IDL = '''
+enum Side { BUY, SELL };
+struct Fill { unsigned long long timestamp; double price; long quantity; Side side; };
+struct Order {
+  string symbol;
+  unsigned long id;
+  double price;
+  sequence<long> tags;
+  sequence<Fill> fills;
+};
+'''
+
+def reflective_to_json(value):
+    # the generic converter the generated functions replace
+    if isinstance(value, int) and hasattr(value, '_names'):
+        return value._names[value]
+    elif isinstance(value, (list, tuple)):
+        return [reflective_to_json(item) for item in value]
+    elif hasattr(value, '_fields'):
+        return dict((field, reflective_to_json(getattr(value, field))) for field in value._fields)
+    return value
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Compares generated JSON converters with a reflective converter')
+    argparser.add_argument('--duration', type=float, default=0.5)
+    argparser.add_argument('--fills', type=int, default=20)
+    options = argparser.parse_args(argv)
+
+    out = StringIO()
+    JSONGenerator(out=out)(parser().parse(IDL, lexer=lexer()))
+    ns = {}
+    exec out.getvalue() in ns
+    fill = ns['Fill'](1234567890123, 101.25, 300, ns['SELL'])
+    order = ns['Order']('ACME', 42, 101.25, [1, 2, 3], [fill] * options.fills)
+    assert reflective_to_json(order) == ns['to_json_Order'](order)
+
+    sys.stdout.write('%-12s %14s\n' % ('converter', 'to-JSON (msg/s)'))
+    for name, convert in (('reflective', reflective_to_json), ('generated', ns['to_json_Order'])):
+        sys.stdout.write('%-12s %14.0f\n' % (name, measure(convert, order, options.duration)))
+    text = json.dumps(ns['to_json_Order'](order))
+    sys.stdout.write('%-12s %14.0f\n' % ('from-JSON', measure(
+        lambda text: ns['from_json_Order'](json.loads(text)), text, options.duration)))
+    sys.stdout.write('%-12s %14.0f\n' % ('dump', measure(
+        lambda value: ns['dump_Order'](value, StringIO()), order, options.duration)))
+
+if __name__ == '__main__':
+    main()
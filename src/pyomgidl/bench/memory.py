@@ -0,0 +1,53 @@
+import sys
+import json
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser, preprocess, build_symbol_table, measure_memory, trace_actions
+from pyomgidl.bench.corpus import Corpus, generate_corpus, write_corpus
+
+__all__ = [
+    'main',
+    ]
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Reports the memory a parsed IDL specification retains')
+    argparser.add_argument('idl', nargs='?', help='IDL file to parse (default: the synthetic corpus)')
+    argparser.add_argument('--webidl', action='store_true')
+    argparser.add_argument('--resolve', action='store_true', help='measures the symbol table built from it as well')
+    argparser.add_argument('--trace', action='store_true', help='attributes allocations to grammar actions with tracemalloc')
+    argparser.add_argument('--limit', type=int, default=20)
+    argparser.add_argument('--json', help='writes the report to this JSON file')
+    options = argparser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = options.idl or write_corpus(generate_corpus(Corpus()), work_dir)
+        with open(path) as f:
+            text = preprocess(f)
+    finally:
+        shutil.rmtree(work_dir)
+    actions = None
+    if options.trace:
+        try:
+            spec, actions = trace_actions(text, options.webidl)
+        except RuntimeError as e:
+            argparser.error(str(e))
+    else:
+        spec = parser(webidl=options.webidl).parse(text, lexer=lexer(webidl=options.webidl))
+    symbols = options.resolve and build_symbol_table(spec) or None
+    report = measure_memory(spec, symbols)
+    report.report(limit=options.limit)
+    if actions is not None:
+        sys.stdout.write('\n%-48s %10s %12s\n' % ('action', 'calls', 'octets'))
+        for name, (calls, size) in sorted(actions.items(), key=lambda item: (-item[1][1], item[0]))[:options.limit]:
+            sys.stdout.write('%-48s %10d %12d\n' % (name, calls, size))
+    if options.json:
+        retval = report.as_dict()
+        if actions is not None:
+            retval['actions'] = actions
+        with open(options.json, 'w') as f:
+            json.dump(retval, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
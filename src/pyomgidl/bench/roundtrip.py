@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+from StringIO import StringIO
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser
+from pyomgidl.reader.tree import *
+from pyomgidl.codegen import SkeletonGenerator
+from pyomgidl.codegen.base import python_identifier
+from pyomgidl.runtime import cdr as _cdr, giop
+
+__all__ = [
+    'IDL',
+    'Unsupported',
+    'compile_skeletons',
+    'sample_value',
+    'main',
+    ]
+
+IDL = '''
+module Bench {
+  struct Tick {
+    unsigned long long timestamp;
+    double bid;
+    double ask;
+    long size;
+  };
+  enum Side { BUY, SELL };
+  typedef sequence<Tick> Ticks;
+  struct Order { string symbol; Side side; double price; Ticks ticks; };
+  interface Quotes {
+    attribute long level;
+    long add(in long a, in long b);
+    Tick echo(in Tick tick);
+    Order place(in Order order, out unsigned long id);
+    Ticks history(in string symbol);
+    oneway void publish(in Tick tick);
+  };
+};
+'''
+
+TRANSPORTS = ('inline', 'socketpair', 'unix')
+
+class Unsupported(Exception):
+    pass
+
+def compile_skeletons(text):
+    # the generator is returned too, as its symbol table describes the
+    # operations
+    out = StringIO()
+    generator = SkeletonGenerator(out=out)
+    generator(parser().parse(text, lexer=lexer()))
+    namespace = {}
+    exec out.getvalue() in namespace
+    return generator, namespace
+
+def sample_value(generator, ns, type, scope, items=8, depth=0):
+    # a value of an IDL type made of made up members, for operations whose
+    # arguments are only known from their signature
+    if isinstance(type, BasicTypeNode):
+        if type.name == 'boolean':
+            return True
+        elif type.name in ('float', 'double', 'long double'):
+            return 0.5
+        elif type.name == 'char':
+            return 'c'
+        elif type.name == 'wchar':
+            return u'w'
+        elif type.name in ('any', 'Object', 'void'):
+            raise Unsupported(type.name)
+        return 7
+    elif isinstance(type, WideStringType):
+        return u'sample'
+    elif isinstance(type, StringType):
+        return 'sample'
+    elif isinstance(type, SequenceType):
+        count = depth < 4 and items or 0
+        if type.size is not None:
+            count = min(count, generator.evaluate(type.size, scope))
+        if isinstance(type.type, BasicTypeNode) and type.type.name == 'octet':
+            return b'\7' * count
+        return [sample_value(generator, ns, type.type, scope, items, depth + 1) for _ in range(count)]
+    elif isinstance(type, SimpleTypeReferenceNode):
+        type, scope = generator.dealias(type, scope)
+        if not isinstance(type, SimpleTypeReferenceNode):
+            return sample_value(generator, ns, type, scope, items, depth)
+        qualified_name = generator.symbols.lookup(type, scope)
+        definition = generator.symbols.symbols[qualified_name]
+        if isinstance(definition, Enum):
+            return ns[generator.local_name(qualified_name)]._values[0]
+        elif isinstance(definition, (Struct, ExceptionDecl)):
+            return ns[generator.local_name(qualified_name)](*[
+                sample_value(generator, ns, member, qualified_name, items, depth + 1)
+                for _, member in generator.expand_members(definition.members)])
+        raise Unsupported('::'.join(qualified_name))
+    raise Unsupported(type.__class__.__name__)
+
+def interfaces(generator):
+    return [
+        (qualified_name, definition)
+        for qualified_name, definition in sorted(generator.symbols.symbols.items())
+        if isinstance(definition, Interface) and definition.body is not None]
+
+def make_servant(generator, ns, qualified_name, node, items):
+    # a servant answering every operation with sample values of its results
+    attributes = {}
+    for operation in generator.all_operations(node, qualified_name):
+        if operation.name.startswith('_get_'):
+            attributes[python_identifier(operation.name[5:])] = sample_value(
+                generator, ns, operation.outs[0][1], operation.interface, items)
+        elif not operation.name.startswith('_set_'):
+            outs = tuple(sample_value(generator, ns, member, operation.interface, items) for _, member in operation.outs)
+            value = outs[0] if len(outs) == 1 else outs or None
+            attributes[python_identifier(operation.name)] = (lambda value: lambda self, *args: value)(value)
+    return type(generator.local_name(qualified_name), (ns['%sSkeleton' % generator.local_name(qualified_name)], ), attributes)()
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def measure_calls(call, duration):
+    latencies = []
+    start = time.time()
+    while True:
+        before = time.time()
+        call()
+        after = time.time()
+        latencies.append(after - before)
+        if after - start >= duration:
+            break
+    latencies.sort()
+    return len(latencies) / (after - start), percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Measures round trips of generated skeletons over GIOP loopback transports')
+    argparser.add_argument('idl', nargs='?', help='IDL file whose interfaces are measured (default: a built-in sample)')
+    argparser.add_argument('--duration', type=float, default=0.5)
+    argparser.add_argument('--items', type=int, default=8, help='elements in sample sequences')
+    argparser.add_argument('--transports', default=','.join(TRANSPORTS))
+    argparser.add_argument('--big-endian', action='store_true')
+    options = argparser.parse_args(argv)
+
+    text = IDL
+    if options.idl is not None:
+        with open(options.idl) as f:
+            text = f.read()
+    generator, ns = compile_skeletons(text)
+    byteorder = options.big_endian and _cdr.BIG_ENDIAN or _cdr.NATIVE
+    work_dir = tempfile.mkdtemp()
+    try:
+        sys.stdout.write('%-24s %-10s %6s %12s %10s %10s\n' % (
+            'operation', 'transport', 'octets', 'calls/s', 'p50 (us)', 'p99 (us)'))
+        for qualified_name, node in interfaces(generator):
+            servant = make_servant(generator, ns, qualified_name, node, options.items)
+            for transport in options.transports.split(','):
+                server = None
+                if transport == 'inline':
+                    call = lambda operation, body, response_expected: servant._dispatch(operation, body, byteorder)
+                    close = lambda: None
+                elif transport == 'socketpair':
+                    client = giop.loopback(servant._dispatch, byteorder)
+                    call, close = client.call, client.close
+                elif transport == 'unix':
+                    server = giop.Server(os.path.join(work_dir, 'socket'), servant._dispatch).start()
+                    client = giop.connect(server.path, byteorder)
+                    call, close = client.call, client.close
+                else:
+                    raise ValueError('Unknown transport: %s' % transport)
+                try:
+                    for operation in generator.all_operations(node, qualified_name):
+                        prefix = generator.local_name(operation.interface)
+                        try:
+                            arguments = tuple(sample_value(generator, ns, member, operation.interface, options.items)
+                                              for _, member in operation.ins)
+                        except Unsupported as e:
+                            sys.stdout.write('%-24s skipped (%s is not supported)\n' % (operation.name, e))
+                            continue
+                        body = ns['encode_' + operation.codec('request') % prefix](arguments, byteorder)
+                        response_expected = not operation.oneway
+                        rate, p50, p99 = measure_calls(
+                            lambda: call(operation.name, body, response_expected), options.duration)
+                        sys.stdout.write('%-24s %-10s %6d %12.0f %10.1f %10.1f\n' % (
+                            '%s.%s' % (generator.local_name(qualified_name), operation.name),
+                            transport, len(body), rate, p50 * 1e6, p99 * 1e6))
+                finally:
+                    close()
+                    if server is not None:
+                        server.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == '__main__':
+    main()
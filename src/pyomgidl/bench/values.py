@@ -0,0 +1,57 @@
+import sys
+import timeit
+from StringIO import StringIO
+from argparse import ArgumentParser
+from pyomgidl.reader import lexer, parser
+from pyomgidl.codegen import ValueGenerator
+
+__all__ = [
+    'IDL',
+    'instance_size',
+    'main',
+    ]
+
+IDL = '''
+struct Sample {
+  unsigned long long timestamp;
+  double value;
+  long channel;
+  string unit;
+  boolean valid;
+};
+'''
+
+class DictSample(object):
+    def __init__(self, timestamp, value, channel, unit, valid):
+        self.timestamp = timestamp
+        self.value = value
+        self.channel = channel
+        self.unit = unit
+        self.valid = valid
+
+def instance_size(instance):
+    retval = sys.getsizeof(instance)
+    if hasattr(instance, '__dict__'):
+        retval += sys.getsizeof(instance.__dict__)
+    return retval
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(description='Compares generated slotted value classes with a dict based class')
+    argparser.add_argument('--number', type=int, default=200000)
+    options = argparser.parse_args(argv)
+
+    out = StringIO()
+    ValueGenerator(out=out)(parser().parse(IDL, lexer=lexer()))
+    namespace = {}
+    exec out.getvalue() in namespace
+
+    sys.stdout.write('%-8s %16s %18s\n' % ('class', 'instance (bytes)', 'construct (obj/s)'))
+    for name, cls in (('dict', DictSample), ('slots', namespace['Sample'])):
+        elapsed = min(timeit.repeat(
+            lambda: cls(1234567890, 0.5, 7, 'degC', True),
+            number=options.number, repeat=3))
+        sys.stdout.write('%-8s %16d %18.0f\n' % (
+            name, instance_size(cls(1234567890, 0.5, 7, 'degC', True)), options.number / elapsed))
+
+if __name__ == '__main__':
+    main()
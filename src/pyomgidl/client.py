@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import socket
+import tempfile
+
+# only the standard library is imported here, so that starting the
+# client stays cheap; the daemon does the rest
+
+__all__ = [
+    'default_socket',
+    'request',
+    'main',
+    ]
+
+def default_socket():
+    return os.environ.get('PYOMGIDL_SOCKET') or \
+        os.path.join(tempfile.gettempdir(), 'pyomgidl-%d.sock' % os.getuid())
+
+def request(path, message):
+    # one JSON object each way, one per line
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+        s.sendall(json.dumps(message) + '\n')
+        f = s.makefile('rb')
+        try:
+            line = f.readline()
+        finally:
+            f.close()
+    finally:
+        s.close()
+    if not line:
+        raise socket.error('The daemon closed the connection')
+    return json.loads(line)
+
+def main(argv=sys.argv[1:]):
+    # pyomgidl-client [--socket PATH] (--stop | pyomgidl arguments...)
+    path = default_socket()
+    if argv[:1] == ['--socket'] and len(argv) > 1:
+        path, argv = argv[1], argv[2:]
+    if argv == ['--stop']:
+        message = {'command': 'stop'}
+    else:
+        message = {'command': 'compile', 'argv': argv, 'cwd': os.getcwd()}
+    try:
+        response = request(path, message)
+    except (socket.error, ValueError) as e:
+        sys.stderr.write('pyomgidl-client: cannot talk to the daemon at %s: %s\n' % (path, getattr(e, 'strerror', None) or e))
+        return 2
+    sys.stdout.write(response.get('stdout', u'').encode('utf-8'))
+    sys.stderr.write(response.get('stderr', u'').encode('utf-8'))
+    return response['status']
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+from pyomgidl.codegen.base import *
+from pyomgidl.codegen.output import *
+from pyomgidl.codegen.interfaces import *
+from pyomgidl.codegen.exceptions import *
+from pyomgidl.codegen.values import *
+from pyomgidl.codegen.layout import *
+from pyomgidl.codegen.cdr import *
+from pyomgidl.codegen.jsoncodec import *
+from pyomgidl.codegen.validators import *
+from pyomgidl.codegen.aio import *
+from pyomgidl.codegen.skeletons import *
+from pyomgidl.codegen.typecodes import *
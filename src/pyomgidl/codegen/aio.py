@@ -0,0 +1,68 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.codegen.base import python_identifier
+from pyomgidl.codegen.cdr import CDRGenerator, repository_id
+
+__all__ = [
+    'AsyncStubGenerator',
+    ]
+
+class AsyncStubGenerator(CDRGenerator):
+    # the generated stubs use async def and need Python 3.5 or later
+    def add_stub_imports(self):
+        self.add_import('from pyomgidl.runtime import aio as _aio')
+
+    def emit_raises(self, operation):
+        # user exceptions an operation may raise, by repository id
+        if not operation.raises:
+            return
+        self.write('%s = {%s}' % (operation.codec('raises') % ('_' + self.local_name(self.current_scope)), ', '.join(
+            '%r: %s' % (repository_id(qualified_name), self.reference_name(qualified_name, '_r_%s'))
+            for qualified_name in operation.raises)))
+
+    def emit_stub_method(self, operation):
+        prefix = self.local_name(self.current_scope)
+        arguments = [python_identifier(name) for name, _ in operation.ins]
+        self.write('async def %s(%s):' % (python_identifier(operation.name), ', '.join(['self'] + arguments)))
+        self.indent()
+        # locals are prefixed so that parameters named like them survive
+        self.write('_connection = self._connection')
+        self.write('_bo = _connection.byteorder')
+        request = '%s(%s, _bo)' % (
+            'encode_' + operation.codec('request') % prefix,
+            len(arguments) == 1 and '(%s, )' % arguments[0] or '(%s)' % ', '.join(arguments))
+        if operation.oneway:
+            self.write('_connection.send_oneway(%r, %s)' % (operation.name, request))
+        else:
+            self.write('_status, _body = await _connection.request(%r, %s)' % (operation.name, request))
+            self.write('if _status:')
+            self.indent()
+            self.write('_aio.raise_reply(_status, _body, _bo, %s)' % (
+                operation.raises and operation.codec('raises') % ('_' + prefix) or 'None'))
+            self.dedent()
+            reply = 'decode_' + operation.codec('reply') % prefix
+            if len(operation.outs) == 1:
+                self.write('return %s(_body, _bo)[0]' % reply)
+            elif operation.outs:
+                self.write('return %s(_body, _bo)' % reply)
+        self.dedent()
+        self.write()
+
+    def depart_interface(self, node):
+        if node.body is not None:
+            self.add_stub_imports()
+            name = self.local_name(self.current_scope)
+            bases = [self.reference(base, '%sStub') for base in node.supers or []] or ['_aio.Stub']
+            operations = self.interface_operations(node, self.current_scope)
+            if any(operation.raises for operation in operations):
+                for operation in operations:
+                    self.emit_raises(operation)
+                self.write()
+            self.write('class %sStub(%s):' % (name, ', '.join(bases)))
+            self.indent()
+            self.write('_repository_id = %r' % repository_id(self.current_scope))
+            self.write()
+            for operation in operations:
+                self.emit_stub_method(operation)
+            self.dedent()
+            self.export('%sStub' % name)
+        super(AsyncStubGenerator, self).depart_interface(node)
@@ -0,0 +1,211 @@
+import sys
+import keyword
+from zope.interface import implements
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.interfaces import INodeVisitor
+from pyomgidl.reader.resolver import build_symbol_table
+from pyomgidl.codegen.output import StreamOutput, FileTreeOutput
+
+__all__ = [
+    'PythonGenerator',
+    'python_identifier',
+    'render_value',
+    ]
+
+def python_identifier(name):
+    if keyword.iskeyword(name) or name in ('None', 'True', 'False'):
+        return '_' + name
+    return name
+
+def render_value(value_node):
+    if isinstance(value_node, (IntegerValue, FloatValue)):
+        return value_node.value
+    elif isinstance(value_node, StringValue):
+        return repr(value_node.value)
+    elif isinstance(value_node, BooleanValue):
+        return repr(value_node.value)
+    else:
+        raise Exception("Unsupported type")
+
+class PythonGenerator(object):
+    implements(INodeVisitor)
+
+    global_module = '_GlobalIDL'
+
+    def __init__(self, base_dir=None, prefix=None, out=sys.stdout, shifter='    ', output=None, jobs=None, lazy=False):
+        self.base_dir = base_dir
+        self.prefix = prefix
+        self.lazy = lazy
+        self.module_stack = []
+        self.definition_stack = []
+        self.scope_stack = [()]
+        self.shifter = shifter
+        self.pad = ''
+        self.symbols = None
+        self.owns_output = output is None
+        if output is None:
+            if base_dir is not None:
+                output = FileTreeOutput(base_dir, jobs)
+            else:
+                output = StreamOutput(out)
+        self.output = output
+        if prefix:
+            self.module_stack.append(prefix)
+
+    def current_module(self):
+        return sum((i.split('.') for i in self.module_stack), [])
+
+    def module_name(self, components=None):
+        if components is None:
+            components = self.current_module()
+        return components and '.'.join(components) or self.global_module
+
+    def definition_module(self, package, name):
+        if not self.lazy or self.output.single_module:
+            return package
+        return '%s._%s' % (package, name)
+
+    @property
+    def buffer(self):
+        package = self.module_name()
+        if self.definition_stack:
+            name = self.definition_module(package, self.definition_stack[0])
+            if name != package:
+                return self.output.module(name, package=False)
+        return self.output.module(package)
+
+    def begin_definition(self, name):
+        self.definition_stack.append(name)
+        self.export(name)
+
+    def export(self, symbol):
+        if self.lazy:
+            self.output.module(self.module_name()).export(symbol, '_' + self.definition_stack[0])
+
+    def end_definition(self):
+        self.definition_stack.pop()
+
+    @property
+    def current_scope(self):
+        return self.scope_stack[-1]
+
+    def add_import(self, line):
+        self.buffer.add_import(line)
+
+    def python_location(self, qualified_name):
+        i = 0
+        while i < len(qualified_name) - 1 and \
+                isinstance(self.symbols.symbols.get(qualified_name[0:i + 1]), Module):
+            i += 1
+        components = ([self.prefix] if self.prefix else []) + list(qualified_name[0:i])
+        return self.module_name(sum((c.split('.') for c in components), [])), \
+               qualified_name[i:]
+
+    def local_name(self, qualified_name):
+        return '_'.join(self.python_location(qualified_name)[1])
+
+    def reference(self, node, template='%s'):
+        return self.reference_name(self.symbols.lookup(node, self.current_scope), template)
+
+    def reference_name(self, qualified_name, template='%s'):
+        module, components = self.python_location(qualified_name)
+        symbol = template % '_'.join(components)
+        if self.output.single_module or self.definition_module(module, components[0]) == self.buffer.name:
+            return symbol
+        alias = '_%s_%s' % (module.replace('.', '_'), symbol)
+        self.add_import('from %s import %s as %s' % (module, symbol, alias))
+        return alias
+
+    def indent(self):
+        self.pad += self.shifter
+
+    def dedent(self):
+        self.pad = self.pad[0:-len(self.shifter)]
+
+    def write(self, line=''):
+        self.buffer.write(line and self.pad + line + '\n' or '\n')
+
+    def enter_scope(self, name):
+        self.scope_stack.append(self.current_scope + (name, ))
+
+    def leave_scope(self):
+        self.scope_stack.pop()
+
+    def visit_specification(self, node):
+        pass
+
+    def depart_specification(self, node):
+        pass
+
+    def visit_module(self, node):
+        if self.lazy:
+            components = self.current_module()
+            for component in node.name.value.split('.'):
+                self.output.module(self.module_name(components)).export(component, component)
+                components = components + [component]
+        self.module_stack.append(node.name.value)
+        self.enter_scope(node.name.value)
+
+    def depart_module(self, node):
+        self.module_stack.pop()
+        self.leave_scope()
+
+    def visit_interface(self, node):
+        self.enter_scope(node.name.value)
+
+    def depart_interface(self, node):
+        self.leave_scope()
+
+    def visit_value_type(self, node):
+        self.enter_scope(node.name.value)
+
+    def depart_value_type(self, node):
+        self.leave_scope()
+
+    def visit_struct(self, node):
+        self.enter_scope(node.name.value)
+
+    def depart_struct(self, node):
+        self.leave_scope()
+
+    def visit_enum(self, node):
+        pass
+
+    def depart_enum(self, node):
+        pass
+
+    def visit_union(self, node):
+        self.enter_scope(node.name.value)
+
+    def depart_union(self, node):
+        self.leave_scope()
+
+    def visit_type_def(self, node):
+        pass
+
+    def visit_native_decl(self, node):
+        pass
+
+    def visit_attr_def(self, node):
+        pass
+
+    def visit_operation_def(self, node):
+        pass
+
+    def visit_field_def(self, node):
+        pass
+
+    def visit_const_decl(self, node):
+        pass
+
+    def visit_except_decl(self, node):
+        self.enter_scope(node.name.value)
+
+    def depart_except_decl(self, node):
+        self.leave_scope()
+
+    def __call__(self, spec):
+        self.symbols = build_symbol_table(spec)
+        walk_ast_nodes(spec, self)
+        if self.owns_output:
+            return self.output.commit()
@@ -0,0 +1,795 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.resolver import declarator_name
+from pyomgidl.codegen.values import ValueGenerator
+from pyomgidl.codegen.layout import PRIMITIVES, LayoutTable, format_size, product
+
+__all__ = [
+    'CDRGenerator',
+    'Operation',
+    'repository_id',
+    ]
+
+# marshaled as strings rather than lists of one-octet items
+OCTET_FORMATS = ('B', 'c')
+
+class Run(object):
+    def __init__(self, alignment):
+        self.alignment = alignment
+        self.format = ''
+        self.size = 0
+        self.items = []
+        self.types = []
+
+    def accepts(self, fmt):
+        return format_size(fmt) <= self.alignment
+
+    def add(self, item, fmt, type=None):
+        size = format_size(fmt)
+        pad = -self.size % size
+        self.format += 'x' * pad + fmt
+        self.size += pad + size
+        self.items.append(item)
+        self.types.append(type)
+
+def repository_id(qualified_name):
+    return 'IDL:%s:1.0' % '/'.join(qualified_name)
+
+class Operation(object):
+    # what travels on the wire for one operation or attribute accessor
+    def __init__(self, interface, name, ins, outs, oneway=False, raises=(), properties=()):
+        self.interface = interface
+        self.name = name
+        self.ins = ins
+        self.outs = outs
+        self.oneway = oneway
+        self.raises = raises
+        self.properties = properties
+
+    def codec(self, kind):
+        return '%%s_%s_%s' % (self.name, kind)
+
+class CDRGenerator(ValueGenerator):
+    def __init__(self, *args, **kwargs):
+        self.pack_runs = kwargs.pop('pack_runs', True)
+        self.numpy = kwargs.pop('numpy', False)
+        self.validate = kwargs.pop('validate', False)
+        super(CDRGenerator, self).__init__(*args, **kwargs)
+        self.interface_stack = []
+        self.layouts = LayoutTable(self)
+
+    def add_runtime_imports(self):
+        self.add_import('from itertools import repeat as _repeat')
+        self.add_import('from pyomgidl.runtime import cdr as _cdr')
+        self.add_import('from pyomgidl.runtime.cdr import ZEROS as _ZEROS, ULONG as _ULONG')
+        if self.validate:
+            self.add_import('from pyomgidl.runtime import bounds as _bounds')
+
+    def declare_struct(self, fmt):
+        return self.buffer.declare('_cdr.structs(%r)' % fmt, '_S')
+
+    def primitive_format(self, type, scope=None):
+        type, scope = self.dealias(type, scope)
+        if isinstance(type, BasicTypeNode):
+            return PRIMITIVES.get(type.name)
+        elif self.enum_name(type, scope) is not None:
+            # enums travel as their unsigned long ordinal
+            return 'I'
+        return None
+
+    def enum_members(self, type):
+        qualified_name = self.enum_name(type)
+        return qualified_name and self.reference_name(qualified_name) + '._values'
+
+    def fixed_layout(self, type, scope, offset):
+        # (spec, alignment, first alignment, start, end) of a fixed-size
+        # type placed at offset, where spec describes it to _cdr.dtype()
+        fmt = self.primitive_format(type, scope)
+        if fmt is not None:
+            size = format_size(fmt)
+            start = offset + (-offset % size)
+            return fmt, size, size, start, start + size
+        type, scope = self.dealias(type, scope)
+        if isinstance(type, ArrayType):
+            fmt = self.primitive_format(type.type, scope)
+            if fmt is None:
+                return None
+            shape = tuple(self.evaluate(dimension, scope) for dimension in type.dimension)
+            size = format_size(fmt)
+            start = offset + (-offset % size)
+            return (fmt, shape), size, size, start, start + size * product(shape)
+        if isinstance(type, Struct):
+            scope = scope + (type.name.value, )
+            definition = type
+        elif isinstance(type, SimpleTypeReferenceNode):
+            scope = self.symbols.lookup(type, scope)
+            definition = self.symbols.symbols[scope]
+            if not isinstance(definition, Struct):
+                return None
+        else:
+            return None
+        fields = []
+        alignment = 1
+        first_alignment = start = None
+        for name, member_type in self.expand_members(definition.members):
+            layout = self.fixed_layout(member_type, scope, offset)
+            if layout is None:
+                return None
+            spec, member_alignment, member_first_alignment, member_start, offset = layout
+            if start is None:
+                start = member_start
+                first_alignment = member_first_alignment
+            fields.append((name, spec, member_start - start))
+            alignment = max(alignment, member_alignment)
+        if start is None:
+            return None
+        return (fields, offset - start), alignment, first_alignment, start, offset
+
+    def declare_record_layout(self, type):
+        layout = self.fixed_layout(type, self.current_scope, 0)
+        if layout is None:
+            return None
+        spec, alignment, first_alignment, start, end = layout
+        if not isinstance(spec[0], list):
+            return None
+        # as in record_format, the next record starts at the alignment of
+        # its first member; records whose layout then shifts from one to
+        # the next are left to the per-element codec
+        stride = end - start + (-(end - start) % first_alignment)
+        if stride % alignment:
+            return None
+        return self.buffer.declare('_cdr.RecordLayout(%r, %d, %d, %d, %d)' % (spec, alignment, first_alignment, end, stride), '_L')
+
+    def flush_write_run(self, run):
+        if run.alignment > 1:
+            self.write('buf += _ZEROS[:-len(buf) & %d]' % (run.alignment - 1))
+        self.write('buf += %s[bo].pack(%s)' % (self.declare_struct(run.format), ', '.join(run.items)))
+
+    def flush_read_run(self, run):
+        if run.alignment > 1:
+            self.write('pos += -pos & %d' % (run.alignment - 1))
+        if len(run.items) == 1:
+            self.write('%s = %s[bo].unpack_from(data, pos)[0]' % (run.items[0], self.declare_struct(run.format)))
+        else:
+            self.write('%s = %s[bo].unpack_from(data, pos)' % (', '.join(run.items), self.declare_struct(run.format)))
+        self.write('pos += %d' % run.size)
+        for item, type in zip(run.items, run.types):
+            members = type is not None and self.enum_members(type)
+            if members:
+                self.write('%s = %s[%s]' % (item, members, item))
+
+    def emit_members(self, members, flush_run, emit):
+        run = None
+        for item, type in members:
+            fmt = self.primitive_format(type)
+            if fmt is not None:
+                if run is None or not self.pack_runs or not run.accepts(fmt):
+                    if run is not None:
+                        flush_run(run)
+                    run = Run(format_size(fmt))
+                run.add(item, fmt, type)
+            else:
+                if run is not None:
+                    flush_run(run)
+                    run = None
+                emit(type, item, 0)
+        if run is not None:
+            flush_run(run)
+
+    def emit_write_members(self, members):
+        if not members:
+            self.write('pass')
+        self.emit_members(members, self.flush_write_run, self.emit_write)
+
+    def emit_read_members(self, members):
+        self.emit_members(members, self.flush_read_run, self.emit_read)
+
+    def emit_write(self, type, expr, depth):
+        if self.validate and isinstance(type, (StringType, SequenceType, ArrayType)):
+            # named types check their own bounds inside _w_X, so values are
+            # traversed once
+            self.emit_bounds(type, expr, depth, False)
+        fmt = self.primitive_format(type)
+        if fmt is not None:
+            run = Run(format_size(fmt))
+            run.add(expr, fmt)
+            self.flush_write_run(run)
+        elif isinstance(type, BasicTypeNode) and type.name == 'wchar':
+            self.write('_cdr.write_wchar(buf, %s, bo)' % expr)
+        elif isinstance(type, BasicTypeNode) and type.name == 'any':
+            self.add_import('from pyomgidl.runtime import typecode as _tc')
+            self.write('_tc.write_any(buf, %s, bo)' % expr)
+        elif isinstance(type, WideStringType):
+            self.write('_cdr.write_wstring(buf, %s, bo)' % expr)
+        elif isinstance(type, StringType):
+            self.write('_cdr.write_string(buf, %s, bo)' % expr)
+        elif isinstance(type, SequenceType):
+            self.emit_write_sequence(type, expr, depth)
+        elif isinstance(type, ArrayType):
+            self.emit_write_array(type, expr, depth)
+        else:
+            function = not isinstance(type, BasicTypeNode) and self.codec_reference(type, '_w_%s') or None
+            if function is None:
+                self.write('_cdr.unsupported(%r)' % self.describe(type))
+            else:
+                self.write('%s(buf, %s, bo)' % (function, expr))
+
+    def emit_write_sequence(self, type, expr, depth):
+        fmt = self.primitive_format(type.type)
+        if fmt in OCTET_FORMATS:
+            self.write('_cdr.write_octets(buf, %s, bo)' % expr)
+        elif fmt is not None:
+            self.write('_cdr.write_sequence(buf, %r, %d, %s, bo)' % (fmt, format_size(fmt), expr))
+        elif self.numpy and self.declare_record_layout(type.type) is not None:
+            self.write('_cdr.write_records(buf, %s, %s, %s, bo)' % (
+                self.declare_record_layout(type.type), self.codec_reference(type.type, '_w_%s'), expr))
+        else:
+            self.write('buf += _ZEROS[:-len(buf) & 3]')
+            self.write('buf += _ULONG[bo].pack(len(%s))' % expr)
+            self.element_paths['e%d' % depth] = self.bound_path(expr) + '[]'
+            self.write('for e%d in %s:' % (depth, expr))
+            self.indent()
+            self.emit_write(type.type, 'e%d' % depth, depth + 1)
+            self.dedent()
+
+    def emit_write_array(self, type, expr, depth):
+        dimensions = [self.evaluate(dimension) for dimension in type.dimension]
+        fmt = self.primitive_format(type.type)
+        if fmt in OCTET_FORMATS:
+            self.write('_cdr.write_fixed_octets(buf, %s, %d)' % (expr, product(dimensions)))
+        elif fmt is not None and self.numpy:
+            self.write('_cdr.write_ndarray(buf, %s, %r, %d, %s, bo)' % (
+                self.declare_struct('%d%s' % (product(dimensions), fmt)), fmt, len(dimensions), expr))
+        elif fmt is not None:
+            size = format_size(fmt)
+            if size > 1:
+                self.write('buf += _ZEROS[:-len(buf) & %d]' % (size - 1))
+            if len(dimensions) > 1:
+                expr = '_cdr.flatten(%s, %d)' % (expr, len(dimensions))
+            self.write('buf += %s[bo].pack(*%s)' % (self.declare_struct('%d%s' % (product(dimensions), fmt)), expr))
+        else:
+            for i in range(len(dimensions)):
+                self.element_paths['e%d' % (depth + i)] = self.bound_path(expr) + '[]'
+                self.write('for e%d in %s:' % (depth + i, expr))
+                self.indent()
+                expr = 'e%d' % (depth + i)
+            self.emit_write(type.type, expr, depth + len(dimensions))
+            for i in range(len(dimensions)):
+                self.dedent()
+
+    def emit_read(self, type, target, depth):
+        fmt = self.primitive_format(type)
+        if fmt is not None:
+            run = Run(format_size(fmt))
+            run.add(target, fmt, type)
+            self.flush_read_run(run)
+        elif isinstance(type, BasicTypeNode) and type.name == 'wchar':
+            self.write('%s, pos = _cdr.read_wchar(data, pos, bo)' % target)
+        elif isinstance(type, BasicTypeNode) and type.name == 'any':
+            self.add_import('from pyomgidl.runtime import typecode as _tc')
+            self.write('%s, pos = _tc.read_any(data, pos, bo)' % target)
+        elif isinstance(type, WideStringType):
+            self.write('%s, pos = _cdr.read_wstring(data, pos, bo)' % target)
+        elif isinstance(type, StringType):
+            self.write('%s, pos = _cdr.read_string(data, pos, bo)' % target)
+        elif isinstance(type, SequenceType):
+            self.emit_read_sequence(type, target, depth)
+        elif isinstance(type, ArrayType):
+            self.emit_read_array(type, target, depth)
+        else:
+            function = not isinstance(type, BasicTypeNode) and self.codec_reference(type, '_r_%s') or None
+            if function is None:
+                self.write('_cdr.unsupported(%r)' % self.describe(type))
+            else:
+                self.write('%s, pos = %s(data, pos, bo)' % (target, function))
+
+    def emit_read_sequence(self, type, target, depth):
+        fmt = self.primitive_format(type.type)
+        if fmt in OCTET_FORMATS:
+            self.write('%s, pos = _cdr.read_octets(data, pos, bo)' % target)
+        elif fmt is not None and self.numpy:
+            # enum ordinals stay in the ndarray; they compare equal to the members
+            members = self.enum_members(type.type)
+            self.write('%s, pos = _cdr.read_ndsequence(data, pos, %r, %d, bo%s)' % (
+                target, fmt, format_size(fmt), members and ', ' + members or ''))
+        elif fmt is not None:
+            self.write('%s, pos = _cdr.read_sequence(data, pos, %r, %d, bo)' % (target, fmt, format_size(fmt)))
+            if self.enum_members(type.type):
+                self.write('%s = _cdr.to_members(%s, %s, 1)' % (target, self.enum_members(type.type), target))
+        elif self.numpy and self.declare_record_layout(type.type) is not None:
+            self.write('%s, pos = _cdr.read_records(data, pos, %s, %s, bo)' % (
+                target, self.declare_record_layout(type.type), self.codec_reference(type.type, '_r_%s')))
+        elif self.bulk_format(type.type) is not None:
+            fmt, size, stride, first_alignment, alignment = self.bulk_format(type.type)
+            self.write('%s, pos = _cdr.read_fixed_sequence(data, pos, bo, %s, %d, %d, %d, %s, %s)' % (
+                target, self.declare_struct(fmt.rstrip('x')), stride, first_alignment, alignment,
+                self.record_factory(type.type), self.codec_reference(type.type, '_r_%s')))
+        else:
+            self.write('n%d, pos = _cdr.read_count(data, pos, bo)' % depth)
+            self.write('%s = []' % target)
+            self.write('for _ in _repeat(None, n%d):' % depth)
+            self.indent()
+            self.emit_read(type.type, 'e%d' % depth, depth + 1)
+            self.write('%s.append(e%d)' % (target, depth))
+            self.dedent()
+
+    def emit_read_array(self, type, target, depth):
+        dimensions = [self.evaluate(dimension) for dimension in type.dimension]
+        fmt = self.primitive_format(type.type)
+        if fmt in OCTET_FORMATS:
+            size = product(dimensions)
+            self.write('_cdr.check_length(data, pos, %d)' % size)
+            self.write('%s = data[pos:pos + %d]' % (target, size))
+            self.write('pos += %d' % size)
+        elif fmt is not None and self.numpy:
+            members = self.enum_members(type.type)
+            self.write('%s, pos = _cdr.read_ndarray(data, pos, %s, %r, %r, bo%s)' % (
+                target, self.declare_struct('%d%s' % (product(dimensions), fmt)), fmt, tuple(dimensions),
+                members and ', ' + members or ''))
+        elif fmt is not None:
+            size = format_size(fmt)
+            if size > 1:
+                self.write('pos += -pos & %d' % (size - 1))
+            values = '%s[bo].unpack_from(data, pos)' % self.declare_struct('%d%s' % (product(dimensions), fmt))
+            if len(dimensions) > 1:
+                self.write('%s = _cdr.reshape(%s, %r)' % (target, values, dimensions))
+            else:
+                self.write('%s = list(%s)' % (target, values))
+            self.write('pos += %d' % (product(dimensions) * size))
+            if self.enum_members(type.type):
+                self.write('%s = _cdr.to_members(%s, %s, %d)' % (target, self.enum_members(type.type), target, len(dimensions)))
+        else:
+            self.emit_read_dimensions(type.type, dimensions, target, depth)
+
+    def emit_read_dimensions(self, type, dimensions, target, depth):
+        if not dimensions:
+            self.emit_read(type, target, depth)
+            return
+        self.write('%s = []' % target)
+        self.write('for _ in _repeat(None, %d):' % dimensions[0])
+        self.indent()
+        self.emit_read_dimensions(type, dimensions[1:], 'e%d' % depth, depth + 1)
+        self.write('%s.append(e%d)' % (target, depth))
+        self.dedent()
+
+    def emit_codec(self, name, qualified_name, write_members, read_members, result):
+        self.add_runtime_imports()
+        self.begin_bounds(qualified_name)
+        self.write('def _w_%s(buf, value, bo):' % name)
+        self.indent()
+        self.emit_write_members(write_members)
+        self.dedent()
+        self.write()
+        self.write('def _r_%s(data, pos, bo):' % name)
+        self.indent()
+        self.emit_read_members(read_members)
+        self.write('return %s, pos' % result)
+        self.dedent()
+        self.write()
+        self.write('encode_%s, decode_%s = _cdr.codec(_w_%s, _r_%s)' % (name, name, name, name))
+        self.write()
+        for template in ('_w_%s', '_r_%s', 'encode_%s', 'decode_%s'):
+            self.export(template % name)
+
+    def emit_record(self, node):
+        name = self.local_name(self.current_scope)
+        members = self.expand_members(node.members)
+        layout = self.layouts.named(self.current_scope)
+        fields = self.pack_runs and self.record_fields(layout)
+        write_members = [('value.%s' % field, type) for field, type in members]
+        read_members = [('v%d' % i, type) for i, (_, type) in enumerate(members)]
+        result = '%s(%s)' % (name, ', '.join('v%d' % i for i in range(len(members))))
+        if fields:
+            self.emit_fixed_codec(name, layout, fields, write_members, read_members, result)
+        else:
+            self.emit_codec(name, self.current_scope, write_members, read_members, result)
+        self.emit_layout(name, layout)
+        self.emit_many(name, layout)
+        self.emit_iter(name, '_r_%s' % name)
+
+    def record_fields(self, layout):
+        # (expression suffix, format, enum) of every primitive of a
+        # fixed-size record, or None if it holds arrays of primitives
+        if not layout.fixed or layout.members is None:
+            return None
+        retval = []
+        for path, fmt, count, enum in layout.leaves():
+            if count != 1:
+                return None
+            retval.append((''.join(isinstance(name, int) and '[%d]' % name or '.' + name for name in path), fmt, enum))
+        return retval or None
+
+    def record_format(self, layout):
+        # (format, size, stride, first alignment, alignment) of a record of
+        # primitives whose layout repeats every stride octets in a stream
+        fields = self.record_fields(layout)
+        if fields is None:
+            return None
+        fmt = ''
+        size = 0
+        for _, field, _ in fields:
+            field_size = format_size(field)
+            pad = -size % field_size
+            fmt += 'x' * pad + field
+            size += pad + field_size
+        stride = size + (-size % layout.first_alignment)
+        if stride % layout.alignment:
+            return None
+        return fmt + 'x' * (stride - size), size, stride, layout.first_alignment, layout.alignment
+
+    def record_constructor(self, layout, targets):
+        # rebuilds a record from the values of its primitives, taken from
+        # the targets iterator
+        if layout.format is not None:
+            target = next(targets)
+            return layout.enum and '%s._values[%s]' % (self.reference_name(layout.enum), target) or target
+        members = [self.record_constructor(member, targets) for _, member in layout.members]
+        if layout.record is None:
+            return '[%s]' % ', '.join(members)
+        return '%s(%s)' % (self.reference_name(layout.record), ', '.join(members))
+
+    def bulk_format(self, type):
+        # the record format of a named fixed-size struct whose sequences
+        # are decoded in bulk
+        if not self.pack_runs or isinstance(type, Struct):
+            return None
+        definition = isinstance(type, SimpleTypeReferenceNode) and self.symbols.resolve(type, self.current_scope)
+        if not isinstance(definition, Struct):
+            return None
+        return self.record_format(self.layouts.layout(type))
+
+    def needs_factory(self, layout):
+        # whether a record cannot be built right from its primitives
+        return any(member.format is None or member.enum for _, member in layout.members)
+
+    def record_factory(self, type):
+        # a callable taking the primitives of a record in stream order
+        return self.codec_reference(type, self.needs_factory(self.layouts.layout(type)) and '_m_%s' or '%s')
+
+    def emit_layout(self, name, layout):
+        self.write('layout_%s = _cdr.Layout(%d, %r, %r)' % (name, layout.alignment, layout.size, layout.max_size))
+        self.write()
+        self.export('layout_%s' % name)
+
+    def emit_fixed_codec(self, name, layout, fields, write_members, read_members, result):
+        # a fixed-size record goes through one Struct whenever it starts at a
+        # multiple of its alignment, which always holds for encode_X
+        self.add_runtime_imports()
+        self.begin_bounds(self.current_scope)
+        fmt = ''
+        size = 0
+        for _, field, _ in fields:
+            field_size = format_size(field)
+            fmt += 'x' * (-size % field_size) + field
+            size += -size % field_size + field_size
+        record = self.declare_struct(fmt)
+        items = ', '.join('value' + suffix for suffix, _, _ in fields)
+        targets = ['v%d' % i for i in range(len(fields))]
+        checked = layout.alignment > layout.first_alignment
+        self.write('def _w_%s(buf, value, bo):' % name)
+        self.indent()
+        if layout.first_alignment > 1:
+            self.write('buf += _ZEROS[:-len(buf) & %d]' % (layout.first_alignment - 1))
+        if checked:
+            self.write('if len(buf) & %d:' % (layout.alignment - 1))
+            self.indent()
+            self.emit_write_members(write_members)
+            self.write('return')
+            self.dedent()
+        self.write('buf += %s[bo].pack(%s)' % (record, items))
+        self.dedent()
+        self.write()
+        self.write('def _r_%s(data, pos, bo):' % name)
+        self.indent()
+        if layout.first_alignment > 1:
+            self.write('pos += -pos & %d' % (layout.first_alignment - 1))
+        if checked:
+            self.write('if pos & %d:' % (layout.alignment - 1))
+            self.indent()
+            self.emit_read_members(read_members)
+            self.write('return %s, pos' % result)
+            self.dedent()
+        self.write('%s%s = %s[bo].unpack_from(data, pos)' % (', '.join(targets), len(targets) == 1 and ',' or '', record))
+        self.write('return %s, pos + %d' % (self.record_constructor(layout, iter(targets)), layout.size))
+        self.dedent()
+        self.write()
+        self.write('decode_%s = _cdr.codec(_w_%s, _r_%s)[1]' % (name, name, name))
+        self.write()
+        self.write('def encode_%s(value, byteorder=_cdr.NATIVE):' % name)
+        self.indent()
+        self.write('try:')
+        self.indent()
+        self.write('return %s[byteorder].pack(%s)' % (record, items))
+        self.dedent()
+        self.write('except _cdr.struct.error as e:')
+        self.indent()
+        self.write('raise _cdr.MarshalError(str(e))')
+        self.dedent()
+        self.dedent()
+        self.write()
+        if self.needs_factory(layout):
+            self.write('def _m_%s(%s):' % (name, ', '.join(targets)))
+            self.indent()
+            self.write('return %s' % self.record_constructor(layout, iter(targets)))
+            self.dedent()
+            self.write()
+            self.export('_m_%s' % name)
+        for template in ('_w_%s', '_r_%s', 'encode_%s', 'decode_%s'):
+            self.export(template % name)
+
+    def emit_many(self, name, layout):
+        self.write('encode_many_%s, decode_many_%s = _cdr.many(_w_%s, _r_%s)' % (name, name, name, name))
+        self.write()
+        self.export('encode_many_%s' % name)
+        self.export('decode_many_%s' % name)
+        record_format = self.record_format(layout)
+        if record_format is None:
+            return
+        fmt, size, stride, first_alignment, alignment = record_format
+        padded = self.declare_struct(fmt)
+        record = self.declare_struct(fmt.rstrip('x'))
+        fields = self.record_fields(layout)
+        targets = ['v%d' % i for i in range(len(fields))]
+        if alignment > first_alignment:
+            # the whole batch shares one layout only when its first record
+            # is aligned to the largest member
+            self.write('_encode_many_%s, _decode_many_%s = encode_many_%s, decode_many_%s' % (name, name, name, name))
+            self.write()
+        self.write('def encode_many_%s(records, buf, byteorder=_cdr.NATIVE, pos=0):' % name)
+        self.indent()
+        self.write('start = pos + (-pos & %d)' % (first_alignment - 1))
+        if alignment > first_alignment:
+            self.write('if start & %d:' % (alignment - 1))
+            self.indent()
+            self.write('return _encode_many_%s(records, buf, byteorder, pos)' % name)
+            self.dedent()
+        self.write('if not records:')
+        self.indent()
+        self.write('return pos')
+        self.dedent()
+        self.write('end = start + len(records) * %d' % stride)
+        self.write('_cdr.reserve(buf, end)')
+        if first_alignment > 1:
+            self.write('buf[pos:start] = _ZEROS[:start - pos]')
+        self.write('pack_into = %s[byteorder].pack_into' % padded)
+        self.write('pos = start')
+        self.write('try:')
+        self.indent()
+        self.write('for value in records:')
+        self.indent()
+        self.write('pack_into(buf, pos, %s)' % ', '.join('value' + suffix for suffix, _, _ in fields))
+        self.write('pos += %d' % stride)
+        self.dedent()
+        self.dedent()
+        self.write('except _cdr.struct.error as e:')
+        self.indent()
+        self.write('raise _cdr.MarshalError(str(e))')
+        self.dedent()
+        self.write('return end - %d' % (stride - size))
+        self.dedent()
+        self.write()
+        self.write('def decode_many_%s(data, count, byteorder=_cdr.NATIVE, pos=0, copy=False):' % name)
+        self.indent()
+        self.write('start = pos + (-pos & %d)' % (first_alignment - 1))
+        if alignment > first_alignment:
+            self.write('if start & %d:' % (alignment - 1))
+            self.indent()
+            self.write('return _decode_many_%s(data, count, byteorder, pos, copy)' % name)
+            self.dedent()
+        self.write('if not count:')
+        self.indent()
+        self.write('return [], pos')
+        self.dedent()
+        self.write('pos = start')
+        self.write('_cdr.check_length(data, pos, count * %d - %d)' % (stride, stride - size))
+        self.write('unpack_from = %s[byteorder].unpack_from' % record)
+        self.write('values = []')
+        self.write('append = values.append')
+        self.write('try:')
+        self.indent()
+        self.write('for _ in _repeat(None, count):')
+        self.indent()
+        if self.needs_factory(layout):
+            self.write('%s%s = unpack_from(data, pos)' % (', '.join(targets), len(targets) == 1 and ',' or ''))
+            self.write('append(%s)' % self.record_constructor(layout, iter(targets)))
+        else:
+            self.write('append(%s(*unpack_from(data, pos)))' % name)
+        self.write('pos += %d' % stride)
+        self.dedent()
+        self.dedent()
+        self.write('except (_cdr.struct.error, IndexError) as e:')
+        self.indent()
+        self.write('raise _cdr.MarshalError(str(e))')
+        self.dedent()
+        self.write('return values, pos - %d' % (stride - size))
+        self.dedent()
+        self.write()
+
+    def emit_tuple_codec(self, name, qualified_name, members):
+        targets = ['v%d' % i for i in range(len(members))]
+        self.emit_codec(
+            name,
+            qualified_name,
+            [('value[%d]' % i, type) for i, (_, type) in enumerate(members)],
+            zip(targets, [type for _, type in members]),
+            len(targets) == 1 and '(v0, )' or '(%s)' % ', '.join(targets))
+
+    def visit_interface(self, node):
+        super(CDRGenerator, self).visit_interface(node)
+        if node.body is not None:
+            self.begin_definition(self.local_name(self.current_scope))
+        self.interface_stack.append(node)
+
+    def depart_interface(self, node):
+        self.interface_stack.pop()
+        if node.body is not None:
+            self.end_definition()
+        super(CDRGenerator, self).depart_interface(node)
+
+    def visit_struct(self, node):
+        super(CDRGenerator, self).visit_struct(node)
+        self.emit_record(node)
+
+    def visit_except_decl(self, node):
+        super(CDRGenerator, self).visit_except_decl(node)
+        self.emit_record(node)
+
+    def visit_union(self, node):
+        super(CDRGenerator, self).visit_union(node)
+        name = self.local_name(self.current_scope)
+        self.add_runtime_imports()
+        writers = []
+        readers = []
+        default = None
+        for i, case in enumerate(node.cases):
+            type = case.type
+            if isinstance(case.declarator, ArrayType):
+                type = ArrayType(type, case.declarator.dimension)
+            self.begin_bounds(self.current_scope, declarator_name(case.declarator))
+            self.write('def _w_%s_%d(buf, value, bo):' % (name, i))
+            self.indent()
+            self.emit_write(type, 'value', 0)
+            self.dedent()
+            self.write()
+            self.write('def _r_%s_%d(data, pos, bo):' % (name, i))
+            self.indent()
+            self.emit_read(type, 'value', 0)
+            self.write('return value, pos')
+            self.dedent()
+            self.write()
+            for value in case.values:
+                if value is None:
+                    default = i
+                else:
+                    writers.append('%r: _w_%s_%d' % (value, name, i))
+                    readers.append('%r: _r_%s_%d' % (value, name, i))
+        # the active branch is picked through a dict lookup on the discriminator
+        self.write('_w_%s_branches = {%s}' % (name, ', '.join(writers)))
+        self.write('_r_%s_branches = {%s}' % (name, ', '.join(readers)))
+        self.write()
+        self.write('def _w_%s(buf, value, bo):' % name)
+        self.indent()
+        self.emit_write(node.discriminator, 'value._d', 0)
+        self.write('write = _w_%s_branches.get(value._d%s)' % (name, default is not None and ', _w_%s_%d' % (name, default) or ''))
+        self.write('if write is not None:')
+        self.indent()
+        self.write('write(buf, value._v, bo)')
+        self.dedent()
+        self.dedent()
+        self.write()
+        self.write('def _r_%s(data, pos, bo):' % name)
+        self.indent()
+        self.emit_read(node.discriminator, 'd', 0)
+        self.write('read = _r_%s_branches.get(d%s)' % (name, default is not None and ', _r_%s_%d' % (name, default) or ''))
+        self.write('if read is None:')
+        self.indent()
+        self.write('return %s(d, None), pos' % name)
+        self.dedent()
+        self.write('value, pos = read(data, pos, bo)')
+        self.write('return %s(d, value), pos' % name)
+        self.dedent()
+        self.write()
+        self.write('encode_%s, decode_%s = _cdr.codec(_w_%s, _r_%s)' % (name, name, name, name))
+        self.write()
+        for template in ('_w_%s', '_r_%s', 'encode_%s', 'decode_%s'):
+            self.export(template % name)
+        self.emit_layout(name, self.layouts.named(self.current_scope, node))
+        self.emit_iter(name, '_r_%s' % name)
+
+    def element_reader(self, type):
+        fmt = self.primitive_format(type)
+        if fmt is not None:
+            if self.enum_name(type) is not None:
+                return None
+            return self.buffer.declare('_cdr.primitive_reader(%s)' % self.declare_struct(fmt), '_R')
+        elif isinstance(type, WideStringType):
+            return '_cdr.read_wstring'
+        elif isinstance(type, StringType):
+            return '_cdr.read_string'
+        elif isinstance(type, SimpleTypeReferenceNode):
+            return self.codec_reference(type, '_r_%s')
+        return None
+
+    def emit_iter(self, name, reader):
+        # decodes a sequence incrementally from a file-like source
+        self.write('def iter_%s(source, byteorder=_cdr.NATIVE, count=None, batch=None, limit=None):' % name)
+        self.indent()
+        self.write('return _cdr.iter_sequence(source, %s, byteorder, count, batch, limit=limit)' % reader)
+        self.dedent()
+        self.write()
+        self.export('iter_%s' % name)
+
+    def visit_type_def(self, node):
+        for declarator in node.declarators:
+            type = node.type
+            if isinstance(declarator, ArrayType):
+                type = ArrayType(type, declarator.dimension)
+            qualified_name = self.current_scope + (declarator_name(declarator), )
+            name = self.local_name(qualified_name)
+            self.begin_definition(name)
+            self.emit_codec(name, qualified_name, [('value', type)], [('value', type)], 'value')
+            self.emit_layout(name, self.layouts.layout(type))
+            reader = isinstance(type, SequenceType) and self.element_reader(type.type) or None
+            if reader is not None:
+                self.emit_iter(name, reader)
+            self.end_definition()
+
+    def member_operations(self, node, scope):
+        # scope is the qualified name of the interface declaring node
+        if isinstance(node, OperationDef):
+            ins = []
+            outs = []
+            if not (isinstance(node.return_type, BasicTypeNode) and node.return_type.name == 'void'):
+                outs.append(('result', node.return_type))
+            for parameter in node.parameters.items:
+                if not parameter.direction or 'in' in parameter.direction:
+                    ins.append((parameter.name.value, parameter.type))
+                if 'out' in parameter.direction:
+                    outs.append((parameter.name.value, parameter.type))
+            raises = [self.symbols.lookup(ref, scope) for ref in node.raises or []]
+            return [Operation(scope, node.name.value, ins, outs, 'oneway' in node.modifiers, raises, node.properties)]
+        elif isinstance(node, AttrDef):
+            retval = []
+            for declarator in node.declarators:
+                name = declarator.identifier.value
+                retval.append(Operation(scope, '_get_' + name, [], [('value', node.type)], raises=[
+                    self.symbols.lookup(ref, scope) for ref in declarator.getter_raises], properties=node.properties))
+                if not node.readonly:
+                    retval.append(Operation(scope, '_set_' + name, [('value', node.type)], [], raises=[
+                        self.symbols.lookup(ref, scope) for ref in declarator.setter_raises], properties=node.properties))
+            return retval
+        return []
+
+    def interface_operations(self, node, scope):
+        return sum((self.member_operations(member, scope) for member in node.body or []), [])
+
+    def all_operations(self, node, scope, seen=None):
+        # operations of an interface and all of its bases, bases first and
+        # each interface once
+        if seen is None:
+            seen = set()
+        retval = []
+        for base in node.supers or []:
+            qualified_name = self.symbols.lookup(base, scope[:-1])
+            if qualified_name not in seen:
+                seen.add(qualified_name)
+                retval.extend(self.all_operations(self.symbols.symbols[qualified_name], qualified_name, seen))
+        return retval + self.interface_operations(node, scope)
+
+    def emit_operation_codecs(self, operation):
+        prefix = self.local_name(self.current_scope)
+        qualified_name = self.current_scope + (operation.name, )
+        self.emit_tuple_codec(operation.codec('request') % prefix, qualified_name, operation.ins)
+        if not operation.oneway:
+            self.emit_tuple_codec(operation.codec('reply') % prefix, qualified_name, operation.outs)
+
+    def visit_operation_def(self, node):
+        if not self.interface_stack:
+            return
+        for operation in self.member_operations(node, self.current_scope):
+            self.emit_operation_codecs(operation)
+
+    def visit_attr_def(self, node):
+        if not self.interface_stack:
+            return
+        for operation in self.member_operations(node, self.current_scope):
+            self.emit_operation_codecs(operation)
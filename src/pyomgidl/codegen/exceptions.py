@@ -0,0 +1,6 @@
+__all__ = [
+    'CodegenError',
+    ]
+
+class CodegenError(Exception):
+    pass
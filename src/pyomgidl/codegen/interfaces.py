@@ -0,0 +1,67 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.codegen.base import PythonGenerator, render_value
+
+__all__ = [
+    'InterfaceGenerator',
+    ]
+
+class InterfaceGenerator(PythonGenerator):
+    def resolve_type(self, node):
+        scope_ref = []
+        if isinstance(node, SimpleTypeReferenceNode):
+            if node.scope.__class__ != CurrentScopeNode:
+                scope_ref = self.resolve_scope(node.scope)
+            return (scope_ref and '.'.join(scope_ref) + '.' or '') + node.name.value
+        elif isinstance(node, BasicTypeNode):
+            return node.name
+        elif isinstance(node, WideStringType):
+            return 'wstring'
+        elif isinstance(node, StringType):
+            return 'string'
+        raise Exception('Oops: %s' % node)
+
+    def resolve_scope(self, node):
+        retval = []
+        def _(node):
+            if node.name is not None:
+                retval.insert(0, node.name.value)
+            if isinstance(node.scope, NamespaceReference):
+                _(node.scope)
+        _(node)
+        return retval
+
+    def visit_interface(self, node):
+        if node.body is not None:
+            self.begin_definition(node.name.value)
+            supers = node.supers and [self.reference(base) for base in node.supers] or ['zope.interface.Interface']
+            self.add_import('import zope.interface')
+            self.write("class %s(%s):" % (node.name.value, ', '.join(supers)))
+            self.indent()
+        super(InterfaceGenerator, self).visit_interface(node)
+
+    def depart_interface(self, node):
+        if node.body is not None:
+            self.dedent()
+            self.end_definition()
+        super(InterfaceGenerator, self).depart_interface(node)
+
+    def visit_attr_def(self, node):
+        for declarator in node.declarators:
+            doc = ''
+            if node.readonly:
+                doc += '[readonly] '
+            doc += self.resolve_type(node.type)
+            self.write("%s = zope.interface.Attribute('''%s''')" % (declarator.identifier.value, doc))
+            self.write()
+
+    def visit_operation_def(self, node):
+        def gen_arg(item):
+            if item.default_value is not None:
+                return "%s = %s" % (item.name.value, render_value(item.default_value))
+            else:
+                return item.name.value
+        self.write("def %s(%s):" % (node.name.value, ", ".join(gen_arg(item) for item in node.parameters.items)))
+        self.indent()
+        self.write("pass")
+        self.dedent()
+        self.write()
@@ -0,0 +1,278 @@
+import json
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.resolver import declarator_name
+from pyomgidl.codegen.base import python_identifier
+from pyomgidl.codegen.values import ValueGenerator
+
+__all__ = [
+    'JSONGenerator',
+    ]
+
+# basic types whose Python values are JSON values already
+SIMPLE_TYPES = frozenset([
+    'short',
+    'unsigned short',
+    'long',
+    'unsigned long',
+    'long long',
+    'unsigned long long',
+    'float',
+    'double',
+    'boolean',
+    'char',
+    'wchar',
+    'octet',
+    ])
+
+class JSONGenerator(ValueGenerator):
+    def add_runtime_imports(self):
+        self.add_import('from pyomgidl.runtime import jsoncodec as _jrt')
+
+    def json_fields(self, members):
+        retval = []
+        for member in members:
+            for declarator in member.declarators:
+                type = member.type
+                if isinstance(declarator, ArrayType):
+                    type = ArrayType(type, declarator.dimension)
+                name = declarator_name(declarator)
+                retval.append((name, python_identifier(name), type))
+        return retval
+
+    def basic_name(self, type):
+        type, _ = self.dealias(type)
+        return isinstance(type, BasicTypeNode) and type.name or None
+
+    def is_simple(self, type):
+        if self.enum_name(type) is not None:
+            return False
+        type, _ = self.dealias(type)
+        return isinstance(type, StringType) or \
+            isinstance(type, BasicTypeNode) and type.name in SIMPLE_TYPES
+
+    def element_type(self, type):
+        if isinstance(type, ArrayType) and len(type.dimension) > 1:
+            return ArrayType(type.type, type.dimension[1:])
+        return type.type
+
+    def is_octets(self, type):
+        return self.basic_name(type.type) == 'octet' and \
+            (isinstance(type, SequenceType) or len(type.dimension) == 1)
+
+    def to_expr(self, type, expr, depth):
+        enum_name = self.enum_name(type)
+        if enum_name is not None:
+            return '%s._names[%s]' % (self.reference_name(enum_name), expr)
+        elif self.is_simple(type):
+            return expr
+        elif isinstance(type, (SequenceType, ArrayType)):
+            element = self.element_type(type)
+            if self.is_octets(type):
+                return '_jrt.b64encode(%s)' % expr
+            elif isinstance(type, SequenceType) and self.basic_name(element) == 'char':
+                return '_jrt.as_string(%s)' % expr
+            elif self.is_simple(element):
+                return '_jrt.as_list(%s)' % expr
+            return '[%s for e%d in %s]' % (self.to_expr(element, 'e%d' % depth, depth + 1), depth, expr)
+        function = not isinstance(type, BasicTypeNode) and self.codec_reference(type, 'to_json_%s') or None
+        if function is None:
+            return '_jrt.unsupported(%r)' % self.describe(type)
+        return '%s(%s)' % (function, expr)
+
+    def from_expr(self, type, expr, depth):
+        enum_name = self.enum_name(type)
+        if enum_name is not None:
+            return '%s._by_name[%s]' % (self.reference_name(enum_name), expr)
+        elif self.basic_name(type) == 'char':
+            return '_jrt.as_bytes(%s)' % expr
+        elif self.is_simple(type):
+            return expr
+        elif isinstance(type, (SequenceType, ArrayType)):
+            element = self.element_type(type)
+            if self.is_octets(type):
+                return '_jrt.b64decode(%s)' % expr
+            elif isinstance(type, SequenceType) and self.basic_name(element) == 'char':
+                return '_jrt.as_bytes(%s)' % expr
+            item = self.from_expr(element, 'e%d' % depth, depth + 1)
+            if item == 'e%d' % depth:
+                return expr
+            return '[%s for e%d in %s]' % (item, depth, expr)
+        function = not isinstance(type, BasicTypeNode) and self.codec_reference(type, 'from_json_%s') or None
+        if function is None:
+            return '_jrt.unsupported(%r)' % self.describe(type)
+        return '%s(%s)' % (function, expr)
+
+    def emit_dump(self, type, expr, prefix):
+        # sequences are written out in chunks, named types through their own dump functions
+        if isinstance(type, SequenceType) and not self.is_octets(type) and \
+                self.basic_name(type.type) != 'char':
+            if prefix:
+                self.write('write(%r)' % prefix)
+            convert = 'None'
+            if not self.is_simple(type.type):
+                convert = self.to_expr(type.type, 'e0', 1)
+                if convert.endswith('(e0)') and convert.count('(') == 1:
+                    convert = convert[:-4]
+                else:
+                    convert = 'lambda e0: %s' % convert
+            self.write('_jrt.dump_sequence(write, %s, %s)' % (expr, convert))
+            return
+        function = None
+        if isinstance(type, SimpleTypeReferenceNode) and self.enum_name(type) is None and not self.is_simple(type):
+            function = self.codec_reference(type, 'dump_%s')
+        if function is not None:
+            if prefix:
+                self.write('write(%r)' % prefix)
+            self.write('%s(%s, fp)' % (function, expr))
+        else:
+            self.write('write(%s_jrt.dumps(%s))' % (prefix and '%r + ' % prefix or '', self.to_expr(type, expr, 0)))
+
+    def emit_exports(self, name):
+        for template in ('to_json_%s', 'from_json_%s', 'dump_%s'):
+            self.export(template % name)
+
+    def emit_record(self, node):
+        self.add_runtime_imports()
+        name = self.local_name(self.current_scope)
+        fields = self.json_fields(node.members)
+        self.write('def to_json_%s(value):' % name)
+        self.indent()
+        self.write('return {%s}' % ', '.join(
+            '%r: %s' % (key, self.to_expr(type, 'value.%s' % field, 0)) for key, field, type in fields))
+        self.dedent()
+        self.write()
+        self.write('def from_json_%s(obj):' % name)
+        self.indent()
+        self.write('return %s(%s)' % (name, ', '.join(
+            self.from_expr(type, 'obj[%r]' % key, 0) for key, field, type in fields)))
+        self.dedent()
+        self.write()
+        self.write('def dump_%s(value, fp):' % name)
+        self.indent()
+        self.write('write = fp.write')
+        prefix = '{'
+        for key, field, type in fields:
+            self.emit_dump(type, 'value.%s' % field, prefix + json.dumps(key) + ': ')
+            prefix = ', '
+        self.write('write(%r)' % (fields and '}' or '{}'))
+        self.dedent()
+        self.write()
+        self.emit_exports(name)
+
+    def visit_struct(self, node):
+        super(JSONGenerator, self).visit_struct(node)
+        self.emit_record(node)
+
+    def visit_except_decl(self, node):
+        super(JSONGenerator, self).visit_except_decl(node)
+        self.emit_record(node)
+
+    def visit_enum(self, node):
+        super(JSONGenerator, self).visit_enum(node)
+        self.add_runtime_imports()
+        name = self.local_name(self.enum_names[id(node)])
+        self.begin_definition(name)
+        self.write('def to_json_%s(value):' % name)
+        self.indent()
+        self.write('return %s._names[value]' % name)
+        self.dedent()
+        self.write()
+        self.write('def from_json_%s(obj):' % name)
+        self.indent()
+        self.write('return %s._by_name[obj]' % name)
+        self.dedent()
+        self.write()
+        self.write('def dump_%s(value, fp):' % name)
+        self.indent()
+        self.write('fp.write(_jrt.dumps(%s._names[value]))' % name)
+        self.dedent()
+        self.write()
+        self.emit_exports(name)
+        self.end_definition()
+
+    def visit_union(self, node):
+        super(JSONGenerator, self).visit_union(node)
+        self.add_runtime_imports()
+        name = self.local_name(self.current_scope)
+        to_branches = []
+        from_branches = []
+        default = None
+        for i, case in enumerate(node.cases):
+            type = case.type
+            if isinstance(case.declarator, ArrayType):
+                type = ArrayType(type, case.declarator.dimension)
+            key = declarator_name(case.declarator)
+            self.write('def _to_json_%s_%d(value):' % (name, i))
+            self.indent()
+            self.write("return {'_d': %s, %r: %s}" % (
+                self.to_expr(node.discriminator, 'value._d', 0), key, self.to_expr(type, 'value._v', 0)))
+            self.dedent()
+            self.write()
+            self.write('def _from_json_%s_%d(obj):' % (name, i))
+            self.indent()
+            self.write('return %s' % self.from_expr(type, 'obj[%r]' % key, 0))
+            self.dedent()
+            self.write()
+            for value in case.values:
+                if value is None:
+                    default = i
+                else:
+                    to_branches.append('%r: _to_json_%s_%d' % (value, name, i))
+                    from_branches.append('%r: _from_json_%s_%d' % (value, name, i))
+        self.write('_to_json_%s_branches = {%s}' % (name, ', '.join(to_branches)))
+        self.write('_from_json_%s_branches = {%s}' % (name, ', '.join(from_branches)))
+        self.write()
+        self.write('def to_json_%s(value):' % name)
+        self.indent()
+        self.write('convert = _to_json_%s_branches.get(value._d%s)' % (name, default is not None and ', _to_json_%s_%d' % (name, default) or ''))
+        self.write('if convert is None:')
+        self.indent()
+        self.write("return {'_d': %s}" % self.to_expr(node.discriminator, 'value._d', 0))
+        self.dedent()
+        self.write('return convert(value)')
+        self.dedent()
+        self.write()
+        self.write('def from_json_%s(obj):' % name)
+        self.indent()
+        self.write("d = %s" % self.from_expr(node.discriminator, "obj['_d']", 0))
+        self.write('convert = _from_json_%s_branches.get(d%s)' % (name, default is not None and ', _from_json_%s_%d' % (name, default) or ''))
+        self.write('if convert is None:')
+        self.indent()
+        self.write('return %s(d, None)' % name)
+        self.dedent()
+        self.write('return %s(d, convert(obj))' % name)
+        self.dedent()
+        self.write()
+        self.write('def dump_%s(value, fp):' % name)
+        self.indent()
+        self.write('fp.write(_jrt.dumps(to_json_%s(value)))' % name)
+        self.dedent()
+        self.write()
+        self.emit_exports(name)
+
+    def visit_type_def(self, node):
+        self.add_runtime_imports()
+        for declarator in node.declarators:
+            type = node.type
+            if isinstance(declarator, ArrayType):
+                type = ArrayType(type, declarator.dimension)
+            name = self.local_name(self.current_scope + (declarator_name(declarator), ))
+            self.begin_definition(name)
+            self.write('def to_json_%s(value):' % name)
+            self.indent()
+            self.write('return %s' % self.to_expr(type, 'value', 0))
+            self.dedent()
+            self.write()
+            self.write('def from_json_%s(obj):' % name)
+            self.indent()
+            self.write('return %s' % self.from_expr(type, 'obj', 0))
+            self.dedent()
+            self.write()
+            self.write('def dump_%s(value, fp):' % name)
+            self.indent()
+            self.write('write = fp.write')
+            self.emit_dump(type, 'value', '')
+            self.dedent()
+            self.write()
+            self.emit_exports(name)
+            self.end_definition()
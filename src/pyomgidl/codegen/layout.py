@@ -0,0 +1,199 @@
+import struct
+from pyomgidl.reader.tree import *
+
+__all__ = [
+    'PRIMITIVES',
+    'Layout',
+    'LayoutTable',
+    'format_size',
+    ]
+
+PRIMITIVES = {
+    'short': 'h',
+    'unsigned short': 'H',
+    'long': 'i',
+    'unsigned long': 'I',
+    'long long': 'q',
+    'unsigned long long': 'Q',
+    'float': 'f',
+    'double': 'd',
+    'boolean': '?',
+    'char': 'c',
+    'octet': 'B',
+    }
+
+def format_size(fmt):
+    return struct.calcsize('<' + fmt)
+
+def product(values):
+    retval = 1
+    for value in values:
+        retval *= value
+    return retval
+
+def align(offset, alignment):
+    return offset + (-offset % alignment)
+
+class Layout(object):
+    # how a type lies in a CDR stream. alignment is that of its largest
+    # primitive and first_alignment that of its first octet. size is the
+    # encoded size when the type starts at a multiple of alignment, None if
+    # it depends on the value; max_size bounds the octets it adds to a
+    # stream at any offset, padding included, None if unbounded.
+    # primitives and arrays of them carry their struct format, enum (the
+    # qualified name of an enum) and count. fixed-size structs carry their
+    # qualified name and (name, Layout) members, fixed-size arrays of them
+    # (index, Layout) members
+    __slots__ = ('alignment', 'first_alignment', 'size', 'max_size', 'format', 'count', 'enum', 'record', 'members')
+
+    def __init__(self, alignment, first_alignment, size, max_size,
+                 format=None, count=1, enum=None, record=None, members=None):
+        self.alignment = alignment
+        self.first_alignment = first_alignment
+        self.size = size
+        self.max_size = max_size
+        self.format = format
+        self.count = count
+        self.enum = enum
+        self.record = record
+        self.members = members
+
+    @property
+    def fixed(self):
+        return self.size is not None
+
+    def leaves(self, path=()):
+        # (path, format, count, enum) of every primitive in a fixed-size
+        # record, in stream order
+        if self.format is not None:
+            return [(path, self.format, self.count, self.enum)]
+        return sum((layout.leaves(path + (name, )) for name, layout in self.members), [])
+
+    def __repr__(self):
+        return 'Layout(alignment=%d, size=%r, max_size=%r)' % (self.alignment, self.size, self.max_size)
+
+def place(leaves, start):
+    # end offset of leaves laid out from start
+    offset = start
+    for _, fmt, count, _ in leaves:
+        size = format_size(fmt)
+        offset = align(offset, size) + size * count
+    return offset
+
+def variable(alignment, max_size):
+    return Layout(alignment, alignment, None, max_size)
+
+def bounded_sum(*sizes):
+    if None in sizes:
+        return None
+    return sum(sizes)
+
+class LayoutTable(object):
+    # computes layouts from the symbol table of a generator, caching those
+    # of named types by qualified name
+    def __init__(self, generator):
+        self.generator = generator
+        self.layouts = {}
+
+    def primitive(self, fmt, count=1, enum=None):
+        size = format_size(fmt)
+        # a misaligned start costs at most size - 1 octets of padding
+        return Layout(size, size, size * count, size * count + size - 1, fmt, count, enum)
+
+    def composite(self, record, layouts):
+        if not layouts:
+            return Layout(1, 1, 0, 0, record=record, members=[])
+        alignment = max(layout.alignment for _, layout in layouts)
+        if all(layout.fixed for _, layout in layouts):
+            retval = Layout(alignment, layouts[0][1].first_alignment, None, None,
+                            record=record, members=layouts)
+            leaves = retval.leaves()
+            retval.size = place(leaves, 0)
+            retval.max_size = max(place(leaves, start) - start for start in range(8))
+            return retval
+        return variable(alignment, bounded_sum(*[layout.max_size for _, layout in layouts]))
+
+    def record(self, qualified_name, members):
+        return self.composite(qualified_name, [(name, self.layout(type, qualified_name)) for name, type in members])
+
+    def union(self, node, scope):
+        generator = self.generator
+        discriminator = self.layout(node.discriminator, scope)
+        branches = []
+        for case in node.cases:
+            type = case.type
+            if isinstance(case.declarator, ArrayType):
+                type = ArrayType(type, case.declarator.dimension)
+            branches.append(self.layout(type, scope))
+        alignment = max([discriminator.alignment] + [layout.alignment for layout in branches])
+        sizes = [layout.max_size for layout in branches]
+        if None in sizes:
+            return variable(alignment, None)
+        return variable(alignment, discriminator.max_size + max(sizes or [0]))
+
+    def named(self, qualified_name, definition=None):
+        # the layout of the definition a qualified name refers to; types
+        # declared inline are passed along as they are not in the symbols
+        retval = self.layouts.get(qualified_name)
+        if retval is not None:
+            return retval
+        generator = self.generator
+        if definition is None:
+            definition = generator.symbols.symbols[qualified_name]
+        if isinstance(definition, Enum) and definition.name.value == qualified_name[-1]:
+            retval = self.primitive('I', enum=generator.enum_names.get(id(definition), qualified_name))
+        elif isinstance(definition, (Struct, ExceptionDecl)):
+            # recursive types go through sequences and are variable
+            self.layouts[qualified_name] = variable(4, None)
+            retval = self.record(qualified_name, generator.expand_members(definition.members))
+        elif isinstance(definition, Union):
+            self.layouts[qualified_name] = variable(4, None)
+            retval = self.union(definition, qualified_name)
+        else:
+            retval = variable(1, None)
+        self.layouts[qualified_name] = retval
+        return retval
+
+    def layout(self, type, scope=None):
+        generator = self.generator
+        if scope is None:
+            scope = generator.current_scope
+        type, scope = generator.dealias(type, scope)
+        if isinstance(type, BasicTypeNode):
+            fmt = PRIMITIVES.get(type.name)
+            if fmt is not None:
+                return self.primitive(fmt)
+            elif type.name == 'wchar':
+                # written through its code point, so never part of a record
+                return variable(2, 3)
+            elif type.name == 'any':
+                # a TypeCode kind comes first
+                return variable(4, None)
+            return variable(1, None)
+        elif isinstance(type, WideStringType):
+            # up to two UTF-16 code units a character
+            return variable(4, type.size is not None and 7 + 4 * generator.evaluate(type.size, scope) or None)
+        elif isinstance(type, StringType):
+            return variable(4, type.size is not None and 8 + generator.evaluate(type.size, scope) or None)
+        elif isinstance(type, SequenceType):
+            element = self.layout(type.type, scope)
+            if type.size is None or element.max_size is None:
+                return variable(max(4, element.alignment), None)
+            return variable(max(4, element.alignment), 7 + generator.evaluate(type.size, scope) * element.max_size)
+        elif isinstance(type, ArrayType):
+            count = product(generator.evaluate(dimension, scope) for dimension in type.dimension)
+            element = self.layout(type.type, scope)
+            if element.format is not None and element.count == 1:
+                return self.primitive(element.format, count, element.enum)
+            if len(type.dimension) > 1:
+                # an array of arrays, so that members follow the indices
+                count = generator.evaluate(type.dimension[0], scope)
+                element = self.layout(ArrayType(type.type, type.dimension[1:]), scope)
+            if element.fixed:
+                return self.composite(None, [(i, element) for i in range(count)])
+            return variable(element.alignment, element.max_size is not None and element.max_size * count or None)
+        elif isinstance(type, (Struct, Enum, Union)):
+            return self.named(scope + (type.name.value, ), type)
+        elif isinstance(type, SimpleTypeReferenceNode):
+            return self.named(generator.symbols.lookup(type, scope))
+        return variable(1, None)
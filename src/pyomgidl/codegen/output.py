@@ -0,0 +1,168 @@
+import os
+import sys
+import errno
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+__all__ = [
+    'ModuleBuffer',
+    'StreamOutput',
+    'FileTreeOutput',
+    'write_if_changed',
+    ]
+
+PROLOGUE = '''# Generated by pyomgidl.  DO NOT EDIT.
+from __future__ import absolute_import
+'''
+
+class ModuleBuffer(object):
+    def __init__(self, name, package=True):
+        self.name = name
+        self.package = package
+        self.imports = []
+        self.import_set = set()
+        self.chunks = []
+        self.exports = {}
+        self.declarations = []
+        self.declaration_names = {}
+        self.definitions = set()
+
+    def declare(self, source, prefix='_C'):
+        retval = self.declaration_names.get(source)
+        if retval is None:
+            retval = self.declaration_names[source] = '%s%d' % (prefix, len(self.declarations))
+            self.declarations.append('%s = %s\n' % (retval, source))
+        return retval
+
+    def define(self, name):
+        if name in self.definitions:
+            return False
+        self.definitions.add(name)
+        return True
+
+    def export(self, name, submodule):
+        self.exports[name] = submodule
+
+    def add_import(self, line):
+        if line not in self.import_set:
+            self.import_set.add(line)
+            self.imports.append(line)
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+
+    def render_exports(self):
+        retval = ['install_lazy_module(__name__, {\n']
+        for name in sorted(self.exports):
+            retval.append('    %r: %r,\n' % (name, self.exports[name]))
+        retval.append('    })\n')
+        return retval
+
+    def getvalue(self):
+        chunks = self.chunks
+        if self.exports:
+            self.add_import('from pyomgidl.runtime.lazy import install_lazy_module')
+            chunks = chunks + self.render_exports()
+        header = [PROLOGUE]
+        if self.imports:
+            header.append('\n'.join(sorted(self.imports, key=lambda line: (line.startswith('from '), line))))
+            header.append('\n')
+        if self.declarations:
+            header.append('\n')
+            header.extend(self.declarations)
+        if chunks:
+            header.append('\n')
+        return ''.join(header + chunks)
+
+def makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+def get_umask():
+    retval = os.umask(0)
+    os.umask(retval)
+    return retval
+
+def write_if_changed(path, content, mode=0666):
+    try:
+        if os.stat(path).st_size == len(content):
+            with open(path, 'rb') as f:
+                if f.read() == content:
+                    return False
+    except (IOError, OSError) as e:
+        if e.errno != errno.ENOENT:
+            raise
+    directory = os.path.dirname(path)
+    makedirs(directory)
+    fd, tmp_path = tempfile.mkstemp(prefix='.%s.' % os.path.basename(path), dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        if sys.platform == 'win32' and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+class StreamOutput(object):
+    single_module = True
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.buffer = ModuleBuffer(None)
+
+    def module(self, name, package=True):
+        return self.buffer
+
+    def commit(self):
+        self.out.write(self.buffer.getvalue())
+        return []
+
+class FileTreeOutput(object):
+    single_module = False
+
+    def __init__(self, base_dir, jobs=None):
+        self.base_dir = base_dir
+        self.jobs = jobs
+        self.modules = {}
+        self.mode = 0666 & ~get_umask()
+
+    def module(self, name, package=True):
+        retval = self.modules.get(name)
+        if retval is None:
+            retval = self.modules[name] = ModuleBuffer(name, package)
+        return retval
+
+    def path_for(self, buffer):
+        components = buffer.name.split('.')
+        if not buffer.package:
+            return os.path.join(self.base_dir, *components) + '.py'
+        return os.path.join(self.base_dir, *(components + ['__init__.py']))
+
+    def _write(self, buffer):
+        path = self.path_for(buffer)
+        return write_if_changed(path, buffer.getvalue(), self.mode) and path or None
+
+    def commit(self):
+        for name in list(self.modules):
+            components = name.split('.')
+            for i in range(1, len(components)):
+                self.module('.'.join(components[0:i]))
+        buffers = [self.modules[name] for name in sorted(self.modules)]
+        if self.jobs == 1 or len(buffers) < 2:
+            # shutting a pool down takes as long as its workers sleep
+            written = map(self._write, buffers)
+        else:
+            pool = ThreadPool(self.jobs)
+            try:
+                written = pool.map(self._write, buffers)
+            finally:
+                pool.close()
+                pool.join()
+        return [path for path in written if path is not None]
@@ -0,0 +1,103 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.codegen.base import python_identifier
+from pyomgidl.codegen.exceptions import CodegenError
+from pyomgidl.codegen.cdr import CDRGenerator, repository_id
+
+__all__ = [
+    'SkeletonGenerator',
+    ]
+
+POLICIES = ('inline', 'threadpool', 'processpool')
+
+class SkeletonGenerator(CDRGenerator):
+    def add_skeleton_imports(self):
+        self.add_import('from pyomgidl.runtime import giop as _giop')
+
+    def execution_policy(self, properties):
+        # [threadpool(8)] or [threadpool = 8] becomes ('threadpool', 8)
+        for property in properties or []:
+            if property.key not in POLICIES:
+                continue
+            size = str(getattr(property.value, 'value', property.value) or '').strip('() ')
+            if size and not size.isdigit():
+                raise CodegenError('Invalid pool size for %s: %s' % (property.key, property.value))
+            return property.key, size and int(size) or None
+        return None
+
+    def invocation(self, operation, arguments):
+        if operation.name.startswith('_get_'):
+            return 'servant.%s' % python_identifier(operation.name[5:])
+        elif operation.name.startswith('_set_'):
+            return 'servant.%s = %s' % (python_identifier(operation.name[5:]), arguments[0])
+        return 'servant.%s(%s)' % (python_identifier(operation.name), ', '.join(arguments))
+
+    def emit_skeleton_function(self, operation):
+        # unmarshals the arguments, invokes the servant and marshals the reply
+        prefix = self.local_name(self.current_scope)
+        self.write('def _%s(servant, body, bo):' % (operation.codec('skeleton') % prefix))
+        self.indent()
+        arguments = ['a%d' % i for i in range(len(operation.ins))]
+        if arguments:
+            self.write('%s = decode_%s(body, bo)' % (
+                len(arguments) == 1 and 'a0,' or ', '.join(arguments), operation.codec('request') % prefix))
+        invocation = self.invocation(operation, arguments)
+        reply = 'encode_' + operation.codec('reply') % prefix
+        if len(operation.outs) == 1:
+            result = '(%s, )'
+        elif operation.outs:
+            result = '%s'
+        else:
+            result = None
+        if operation.oneway:
+            self.write(invocation)
+        elif operation.raises or result is None:
+            if operation.raises:
+                self.write('try:')
+                self.indent()
+            self.write(result is None and invocation or 'result = %s' % invocation)
+            if operation.raises:
+                self.dedent()
+                for qualified_name in operation.raises:
+                    self.write('except %s as e:' % self.reference_name(qualified_name))
+                    self.indent()
+                    self.write('return _giop.USER_EXCEPTION, _giop.encode_exception(%r, %s, e, bo)' % (
+                        repository_id(qualified_name), self.reference_name(qualified_name, '_w_%s')))
+                    self.dedent()
+            self.write('return _giop.NO_EXCEPTION, %s(%s, bo)' % (reply, result is None and '()' or result % 'result'))
+        else:
+            self.write('return _giop.NO_EXCEPTION, %s(%s, bo)' % (reply, result % invocation))
+        self.dedent()
+        self.write()
+
+    def depart_interface(self, node):
+        if node.body is not None:
+            self.add_skeleton_imports()
+            name = self.local_name(self.current_scope)
+            for operation in self.interface_operations(node, self.current_scope):
+                self.emit_skeleton_function(operation)
+            bases = [self.reference(base, '%sSkeleton') for base in node.supers or []] or ['_giop.Skeleton']
+            self.write('class %sSkeleton(%s):' % (name, ', '.join(bases)))
+            self.indent()
+            self.write('_repository_id = %r' % repository_id(self.current_scope))
+            # inherited operations are flattened into one table
+            self.write('_operations = {')
+            self.indent()
+            operations = self.all_operations(node, self.current_scope)
+            for operation in operations:
+                self.write('%r: %s,' % (operation.name, self.reference_name(operation.interface, '_' + operation.codec('skeleton'))))
+            self.dedent()
+            self.write('}')
+            policy = self.execution_policy(node.properties)
+            if policy is not None:
+                self.write('_policy = %r' % (policy, ))
+            policies = [(operation.name, self.execution_policy(operation.properties)) for operation in operations]
+            policies = [(name, policy) for name, policy in policies if policy is not None]
+            if policies:
+                self.write('_policies = {%s}' % ', '.join('%r: %r' % item for item in policies))
+            oneway = [operation.name for operation in operations if operation.oneway]
+            if oneway:
+                self.write('_oneway = frozenset([%s])' % ', '.join(repr(name) for name in oneway))
+            self.dedent()
+            self.write()
+            self.export('%sSkeleton' % name)
+        super(SkeletonGenerator, self).depart_interface(node)
@@ -0,0 +1,1353 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tempfile
+from StringIO import StringIO
+from distutils.spawn import find_executable
+from unittest import TestCase, skipIf
+import pyomgidl
+from pyomgidl.reader import lexer, parser
+from pyomgidl.codegen import CodegenError, InterfaceGenerator, ValueGenerator, CDRGenerator, JSONGenerator, ValidatorGenerator, AsyncStubGenerator, SkeletonGenerator, TypeCodeGenerator, StreamOutput, FileTreeOutput, write_if_changed
+from pyomgidl.runtime import cdr
+from pyomgidl.runtime.cdr import BIG_ENDIAN, LITTLE_ENDIAN, MarshalError
+from pyomgidl.runtime.bounds import BoundsError
+from pyomgidl.runtime import giop
+from pyomgidl.runtime import policies
+from pyomgidl.runtime import typecode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+IDL = '''
+module A {
+  interface Foo {
+    attribute long x;
+    void bar(in long a);
+  };
+  module B {
+    interface Baz : Foo {
+      oneway void q(in long z);
+    };
+  };
+};
+'''
+
+class CodegenTestCase(TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def parse(self, text, webidl=False):
+        return parser(webidl=webidl).parse(text, lexer=lexer(webidl=webidl))
+
+    def read(self, *components):
+        with open(os.path.join(self.base_dir, *components)) as f:
+            return f.read()
+
+class OutputTest(CodegenTestCase):
+    def testWriteIfChanged(self):
+        path = os.path.join(self.base_dir, 'a', 'b.py')
+        self.assertTrue(write_if_changed(path, 'x = 1\n'))
+        os.utime(path, (0, 0))
+        self.assertFalse(write_if_changed(path, 'x = 1\n'))
+        self.assertEqual(0, os.stat(path).st_mtime)
+        self.assertTrue(write_if_changed(path, 'x = 2\n'))
+        self.assertEqual('x = 2\n', self.read('a', 'b.py'))
+        self.assertEqual(['b.py'], os.listdir(os.path.join(self.base_dir, 'a')))
+
+    def testAncestorPackages(self):
+        output = FileTreeOutput(self.base_dir)
+        output.module('a.b.c').write('x = 1\n')
+        written = output.commit()
+        self.assertEqual(3, len(written))
+        self.assertTrue(self.read('a', 'b', 'c', '__init__.py').endswith('\nx = 1\n'))
+        self.assertEqual([], output.commit())
+
+class InterfaceGeneratorTest(CodegenTestCase):
+    def testStream(self):
+        out = StringIO()
+        InterfaceGenerator(out=out)(self.parse(IDL))
+        value = out.getvalue()
+        self.assertTrue('import zope.interface\n' in value)
+        self.assertTrue('class Foo(zope.interface.Interface):\n' in value)
+        self.assertTrue('class Baz(Foo):\n' in value)
+
+    def testPerModule(self):
+        written = InterfaceGenerator(self.base_dir, prefix='gen')(self.parse(IDL))
+        self.assertEqual(3, len(written))
+        a = self.read('gen', 'A', '__init__.py')
+        self.assertTrue('class Foo(zope.interface.Interface):\n' in a)
+        self.assertFalse('Baz' in a)
+        b = self.read('gen', 'A', 'B', '__init__.py')
+        self.assertTrue('from gen.A import Foo as _gen_A_Foo\n' in b)
+        self.assertTrue('class Baz(_gen_A_Foo):\n' in b)
+        self.assertEqual([], InterfaceGenerator(self.base_dir, prefix='gen')(self.parse(IDL)))
+
+    def testGlobalScope(self):
+        InterfaceGenerator(self.base_dir)(self.parse('interface Foo { void bar(); };'))
+        self.assertTrue('class Foo(' in self.read('_GlobalIDL', '__init__.py'))
+
+    def testLazyPackage(self):
+        InterfaceGenerator(self.base_dir, prefix='lazygen', lazy=True)(self.parse(IDL))
+        self.assertTrue("'Foo': '_Foo'" in self.read('lazygen', 'A', '__init__.py'))
+        self.assertTrue("'B': 'B'" in self.read('lazygen', 'A', '__init__.py'))
+        self.assertTrue('class Baz(_lazygen_A_Foo):\n' in self.read('lazygen', 'A', 'B', '_Baz.py'))
+        sys.path.insert(0, self.base_dir)
+        try:
+            import lazygen.A
+            self.assertFalse('lazygen.A._Foo' in sys.modules)
+            self.assertEqual(['B', 'Foo'], lazygen.A.__all__)
+            self.assertEqual('Foo', lazygen.A.Foo.__name__)
+            self.assertTrue('lazygen.A._Foo' in sys.modules)
+            self.assertFalse('lazygen.A.B' in sys.modules)
+            self.assertEqual((lazygen.A.Foo, ), lazygen.A.B.Baz.__bases__)
+        finally:
+            sys.path.remove(self.base_dir)
+            for name in list(sys.modules):
+                if name.startswith('lazygen'):
+                    del sys.modules[name]
+
+VALUE_IDL = '''
+module V {
+  struct Point { long x; long y; };
+  struct Path { sequence<Point> points; long grid[2][2]; sequence<octet> tag; };
+  enum Color { RED, GREEN, BLUE };
+  exception Oops { string why; };
+  valuetype Base { long a; };
+  valuetype Derived : Base { string b; };
+};
+'''
+
+class ValueGeneratorTest(CodegenTestCase):
+    def generate(self, text):
+        out = StringIO()
+        ValueGenerator(out=out)(self.parse(text))
+        namespace = {}
+        exec out.getvalue() in namespace
+        return out.getvalue(), namespace
+
+    def testStruct(self):
+        source, ns = self.generate(VALUE_IDL)
+        point = ns['Point'](1, 2)
+        self.assertFalse(hasattr(point, '__dict__'))
+        self.assertEqual(('x', 'y'), ns['Point']._fields)
+        self.assertEqual('Point(x=1, y=2)', repr(point))
+        self.assertEqual(ns['Point'](1, 2), point)
+        self.assertNotEqual(ns['Point'](2, 1), point)
+        self.assertEqual(hash(ns['Point'](1, 2)), hash(point))
+        self.assertEqual(1, len(set([point, ns['Point'](1, 2)])))
+        # sequences and arrays decode to lists
+        path = ns['Path']([point], [[1, 2], [3, 4]], memoryview('ab'))
+        self.assertEqual(hash(ns['Path']([point], [[1, 2], [3, 4]], 'ab')), hash(path))
+
+    def testEnum(self):
+        source, ns = self.generate(VALUE_IDL)
+        color = ns['Color']
+        self.assertTrue(ns['GREEN'] is color.GREEN)
+        self.assertTrue(color.from_ordinal(1) is color.GREEN)
+        self.assertTrue(color.from_name('BLUE') is color.BLUE)
+        self.assertEqual(2, color.BLUE)
+        self.assertEqual('Color.RED', repr(color.RED))
+        self.assertEqual(('RED', 'GREEN', 'BLUE'), color._names)
+
+    def testException(self):
+        source, ns = self.generate(VALUE_IDL)
+        oops = ns['Oops']('bad')
+        self.assertTrue(isinstance(oops, Exception))
+        self.assertEqual(('bad', ), oops.args)
+        self.assertEqual("Oops(why='bad')", repr(oops))
+
+    def testValueType(self):
+        source, ns = self.generate(VALUE_IDL)
+        derived = ns['Derived'](1, 'b')
+        self.assertTrue(isinstance(derived, ns['Base']))
+        self.assertFalse(hasattr(derived, '__dict__'))
+        self.assertEqual(('b', ), ns['Derived'].__slots__)
+        self.assertEqual(('a', 'b'), ns['Derived']._fields)
+        self.assertEqual((1, 'b'), (derived.a, derived.b))
+        self.assertNotEqual(ns['Base'](1), derived)
+
+    def testSharedOutput(self):
+        out = StringIO()
+        output = StreamOutput(out)
+        spec = self.parse(VALUE_IDL)
+        ValueGenerator(output=output)(spec)
+        CDRGenerator(output=output)(spec)
+        output.commit()
+        self.assertEqual(1, out.getvalue().count('class Point('))
+        self.assertTrue('def _w_Point(' in out.getvalue())
+
+CDR_IDL = '''
+module C {
+  const long N = 2;
+  typedef long Len;
+  typedef double Mat[N][3];
+  struct Point { long x; Len y; short z; octet flag; };
+  struct Rec {
+    Point p;
+    string name;
+    wstring wname;
+    sequence<long> ids;
+    sequence<octet> blob;
+    sequence<Point> pts;
+    Mat m;
+    octet raw[4];
+    wchar wc;
+    struct Inner { double a; } inner;
+  };
+  exception Oops { string why; long code; };
+  interface Svc {
+    attribute long count;
+    long call(in Point p, inout string s, out double d);
+    oneway void ping(in long a);
+  };
+};
+'''
+
+NUMPY_IDL = '''
+typedef long Grid[2][3];
+struct Inner { long a; long long b; };
+struct Sample { unsigned long long ts; double v; Inner inner; short q[2]; };
+struct Loose { long a; double b; };
+enum Color { RED, GREEN, BLUE };
+struct Samples { sequence<Loose> loose; sequence<Sample> items; sequence<double> ds; Grid grid; sequence<Color> colors; };
+struct Tail { long a; double b; long c; };
+struct Tails { long pad; sequence<Tail> rs; };
+'''
+
+class CDRGeneratorTest(CodegenTestCase):
+    def generate(self, text, **kwargs):
+        out = StringIO()
+        CDRGenerator(out=out, **kwargs)(self.parse(text))
+        namespace = {}
+        exec out.getvalue() in namespace
+        return out.getvalue(), namespace
+
+    def testRunPacking(self):
+        source, ns = self.generate(CDR_IDL)
+        self.assertTrue("_cdr.structs('iihB')" in source)
+        point = ns['Point'](1, 2, 3, 4)
+        self.assertEqual('\0\0\0\1\0\0\0\2\0\3\4', ns['encode_Point'](point, BIG_ENDIAN))
+        self.assertEqual('\1\0\0\0\2\0\0\0\3\0\4', ns['encode_Point'](point, LITTLE_ENDIAN))
+
+    def testRoundTrip(self):
+        source, ns = self.generate(CDR_IDL)
+        point = ns['Point'](1, -2, 3, 255)
+        rec = ns['Rec'](
+            point, 'name', u'\u3042', [1, 2, 3], 'blob', [point, point],
+            [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]], 'abcd', u'x', ns['Rec_Inner'](0.5))
+        for byteorder in (BIG_ENDIAN, LITTLE_ENDIAN):
+            data = ns['encode_Rec'](rec, byteorder)
+            value = ns['decode_Rec'](data, byteorder)
+            self.assertEqual((1, -2, 3, 255), (value.p.x, value.p.y, value.p.z, value.p.flag))
+            self.assertEqual('name', value.name)
+            self.assertEqual(u'\u3042', value.wname)
+            self.assertEqual([1, 2, 3], value.ids)
+            self.assertEqual('blob', value.blob)
+            self.assertEqual([-2, -2], [item.y for item in value.pts])
+            self.assertEqual([[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]], value.m)
+            self.assertEqual('abcd', value.raw)
+            self.assertEqual(u'x', value.wc)
+            self.assertEqual(0.5, value.inner.a)
+            self.assertRaises(MarshalError, ns['decode_Rec'], data[:-4], byteorder)
+        for raw in ('abc', 'abcde'):
+            rec.raw = raw
+            self.assertRaises(MarshalError, ns['encode_Rec'], rec)
+
+    def testZeroCopy(self):
+        source, ns = self.generate(CDR_IDL)
+        point = ns['Point'](1, 2, 3, 4)
+        rec = ns['Rec'](point, 'name', u'', [], 'blob', [], [[0.0] * 3] * 2, 'abcd', u'x', ns['Rec_Inner'](0.5))
+        data = bytearray(ns['encode_Rec'](rec))
+        value = ns['decode_Rec'](data)
+        self.assertTrue(isinstance(value.blob, memoryview))
+        self.assertTrue(isinstance(value.raw, memoryview))
+        self.assertTrue(isinstance(value.name, bytes))
+        data[data.index('blob')] = 'g'
+        self.assertEqual('glob', value.blob.tobytes())
+        value = ns['decode_Rec'](data, copy=True)
+        self.assertEqual('glob', value.blob)
+        self.assertTrue(isinstance(value.blob, bytes))
+        self.assertTrue(isinstance(value.raw, bytes))
+
+    def testOperations(self):
+        source, ns = self.generate(CDR_IDL)
+        oops = ns['decode_Oops'](ns['encode_Oops'](ns['Oops']('bad', 3)))
+        self.assertTrue(isinstance(oops, Exception))
+        self.assertEqual(('bad', 3), (oops.why, oops.code))
+        point = ns['Point'](1, 2, 3, 4)
+        request = ns['decode_Svc_call_request'](ns['encode_Svc_call_request']((point, 's')))
+        self.assertEqual(2, request[0].y)
+        self.assertEqual('s', request[1])
+        self.assertEqual((5, 't', 0.25), ns['decode_Svc_call_reply'](ns['encode_Svc_call_reply']((5, 't', 0.25))))
+        self.assertEqual((7, ), ns['decode_Svc__set_count_request'](ns['encode_Svc__set_count_request']((7, ))))
+        self.assertEqual((), ns['decode_Svc__set_count_reply'](ns['encode_Svc__set_count_reply'](())))
+        self.assertTrue('encode_Svc_ping_request' in ns)
+        self.assertFalse('encode_Svc_ping_reply' in ns)
+
+    @skipIf(numpy is None, 'numpy is not available')
+    def testNumpy(self):
+        source, ns = self.generate(NUMPY_IDL, numpy=True)
+        inner = ns['Inner']
+        samples = ns['Samples'](
+            [ns['Loose'](i, i * 2.0) for i in range(2)],
+            [ns['Sample'](i, i * 0.5, inner(i, -i), [i, i + 1]) for i in range(3)],
+            [1.5, 2.5], [[1, 2, 3], [4, 5, 6]], [ns['BLUE'], ns['RED']])
+        for byteorder in (BIG_ENDIAN, LITTLE_ENDIAN):
+            data = ns['encode_Samples'](samples, byteorder)
+            value = ns['decode_Samples'](data, byteorder)
+            self.assertEqual(['ts', 'v', 'inner', 'q'], list(value.items.dtype.names))
+            self.assertEqual([0.0, 0.5, 1.0], value.items['v'].tolist())
+            self.assertEqual([0, -1, -2], value.items['inner']['b'].tolist())
+            self.assertEqual([[0, 1], [1, 2], [2, 3]], value.items['q'].tolist())
+            # the leading count leaves the Loose records unaligned, so they are decoded one by one
+            self.assertEqual([0.0, 2.0], [item.b for item in value.loose])
+            self.assertEqual(numpy.float64, value.ds.dtype.type)
+            self.assertEqual([1.5, 2.5], value.ds.tolist())
+            self.assertEqual((2, 3), value.grid.shape)
+            self.assertEqual([True, False], (value.colors == ns['BLUE']).tolist())
+            self.assertEqual(data, ns['encode_Samples'](value, byteorder))
+
+    def testNumpyStride(self):
+        # a Tail is 20 octets and the next one starts 4-aligned, so records
+        # do not repeat every 24 octets as their largest member suggests
+        source, ns = self.generate(NUMPY_IDL, numpy=True)
+        _, plain = self.generate(NUMPY_IDL)
+        tails = ns['Tails'](7, [ns['Tail'](i, i * 0.5, -i) for i in range(3)])
+        for byteorder in (BIG_ENDIAN, LITTLE_ENDIAN):
+            data = plain['encode_Tails'](plain['Tails'](7, [plain['Tail'](i, i * 0.5, -i) for i in range(3)]), byteorder)
+            self.assertEqual(data, ns['encode_Tails'](tails, byteorder))
+            value = ns['decode_Tails'](data, byteorder)
+            self.assertEqual([(0, 0.0, 0), (1, 0.5, -1), (2, 1.0, -2)], [(item.a, item.b, item.c) for item in value.rs])
+
+    def testNumpyFallback(self):
+        source, ns = self.generate(NUMPY_IDL, numpy=True)
+        saved, cdr.numpy = cdr.numpy, None
+        try:
+            data = ns['encode_Samples'](ns['Samples']([], [], [1.5], [[1, 2, 3], [4, 5, 6]], [ns['GREEN']]))
+            value = ns['decode_Samples'](data)
+            self.assertEqual([], value.items)
+            self.assertEqual([1.5], value.ds)
+            self.assertEqual([[1, 2, 3], [4, 5, 6]], value.grid)
+            self.assertTrue(value.colors[0] is ns['GREEN'])
+        finally:
+            cdr.numpy = saved
+
+    def testEnum(self):
+        source, ns = self.generate('''
+            enum Color { RED, GREEN, BLUE };
+            typedef Color Hue;
+            struct S { short a; Hue c; long b; sequence<Color> cs; Color grid[2][2]; };
+            ''')
+        self.assertTrue("_cdr.structs('Ii')" in source)
+        color = ns['Color']
+        value = ns['decode_S'](ns['encode_S'](ns['S'](
+            1, color.BLUE, 2, [color.GREEN], [[color.RED, color.GREEN], [color.BLUE, color.RED]])))
+        self.assertTrue(value.c is color.BLUE)
+        self.assertTrue(value.cs[0] is color.GREEN)
+        self.assertTrue(value.grid[1][0] is color.BLUE)
+        self.assertRaises(MarshalError, ns['decode_Hue'], ns['encode_Hue'](3))
+
+    def testUnion(self):
+        source, ns = self.generate('''
+            const long N = 3;
+            union U switch (enum K { A, B, C }) { case A: case B: long x; case C: string s; };
+            union V switch (long) {
+              case 1: case N + 1: double d;
+              case 0: struct In { long q; } i;
+              default: boolean b;
+            };
+            union W switch (char) { case 'a': short a[2]; };
+            struct S { U u; sequence<V> vs; };
+            ''')
+        self.assertEqual({0: 'x', 1: 'x', 2: 's'}, ns['U']._branches)
+        self.assertEqual('b', ns['V']._default)
+        self.assertTrue('_r_V_branches = {1: _r_V_0, 4: _r_V_0, 0: _r_V_1}' in source)
+        union = ns['U'](ns['B'], 5)
+        value = ns['decode_U'](ns['encode_U'](union))
+        self.assertEqual(union, value)
+        self.assertTrue(value._d is ns['B'])
+        value = ns['decode_S'](ns['encode_S'](ns['S'](
+            ns['U'](ns['C'], 'text'), [ns['V'](4, 0.5), ns['V'](0, ns['V_In'](7)), ns['V'](9, True)])))
+        self.assertEqual('text', value.u._v)
+        self.assertEqual([0.5, 7, True], [value.vs[0]._v, value.vs[1]._v.q, value.vs[2]._v])
+        self.assertEqual(ns['W']('a', [1, 2]), ns['decode_W'](ns['encode_W'](ns['W']('a', [1, 2]))))
+        self.assertEqual(ns['W']('b', None), ns['decode_W'](ns['encode_W'](ns['W']('b', [1, 2]))))
+
+    def testMany(self):
+        source, ns = self.generate('''
+            enum K { A, B };
+            struct G { short s; long l; double d; };
+            struct H { long a; K k; };
+            struct F { long a; double d; short s; };
+            struct V { string s; long x; };
+            struct Seq { sequence<G> gs; sequence<H> hs; sequence<F> fs; sequence<V> vs; };
+            ''')
+        self.assertTrue('def encode_many_G(' in source)
+        self.assertFalse('def encode_many_F(' in source)
+        gs = [ns['G'](i, -i, i * 0.5) for i in range(5)]
+        hs = [ns['H'](i, ns['B']) for i in range(3)]
+        fs = [ns['F'](i, 0.25, -i) for i in range(3)]
+        vs = [ns['V']('x' * i, i) for i in range(3)]
+        for index, records in enumerate((gs, hs, fs, vs)):
+            name = 'GHFV'[index]
+            data = ns['encode_Seq'](ns['Seq'](*[i == index and records or [] for i in range(4)]))
+            # records follow the sequence count just as they follow pos
+            pos = 4 * index + 4
+            buf = bytearray(b'\xff' * 300)
+            end = ns['encode_many_' + name](records, buf, pos=pos)
+            self.assertEqual(data[pos:end], bytes(buf[pos:end]))
+            self.assertEqual((records, end), ns['decode_many_' + name](buf, len(records), pos=pos))
+            self.assertEqual((records, end), ns['decode_many_' + name](data, len(records), pos=pos))
+            self.assertEqual(([], pos), ns['decode_many_' + name](data, 0, pos=pos))
+        self.assertTrue(ns['decode_many_H'](ns['encode_Seq'](ns['Seq']([], hs, [], [])), 3, pos=8)[0][0].k is ns['B'])
+        buf = bytearray(b'\xff' * 100)
+        generic = bytearray()
+        end = ns['encode_many_G'](gs, buf)
+        self.assertEqual(end, ns['_encode_many_G'](gs, generic))
+        self.assertEqual(generic, buf[:end])
+        self.assertEqual((gs, end), ns['decode_many_G'](buf, 5))
+        # a batch picks up where the one before it ended
+        values, pos = ns['decode_many_G'](buf, 2)
+        self.assertEqual((gs[2:], end), ns['decode_many_G'](buf, 3, pos=pos))
+        self.assertEqual(0, ns['encode_many_G']([], buf))
+        self.assertRaises(MarshalError, ns['decode_many_G'], buf, 7)
+
+    def testLayout(self):
+        text = '''
+            enum Color { RED, GREEN };
+            struct Inner { octet tag; double value; };
+            struct Outer { long id; Inner inner; Color color; Inner pair[2]; };
+            struct Var { string<10> name; sequence<Inner, 4> items; };
+            struct Open { string name; };
+            struct Holder { long x; sequence<Outer> outers; };
+            struct Shifted { sequence<Inner> inners; };
+            typedef sequence<Inner> Inners;
+            union U switch (short) { case 1: long a; case 2: char b; };
+            '''
+        source, ns = self.generate(text)
+        plain = self.generate(text, pack_runs=False)[1]
+        layout = lambda name: (ns['layout_' + name].alignment, ns['layout_' + name].size, ns['layout_' + name].max_size)
+        self.assertEqual((8, 16, 16), layout('Inner'))
+        self.assertEqual((8, 48, 55), layout('Outer'))
+        self.assertEqual((8, None, 18 + 7 + 4 * 16), layout('Var'))
+        self.assertEqual((4, None, None), layout('Open'))
+        self.assertEqual((4, None, 3 + 7), layout('U'))
+        self.assertEqual((8, None, None), layout('Inners'))
+        self.assertTrue('_m_Outer' in ns)
+        self.assertFalse('_m_Inner' in ns)
+        self.assertTrue('[bo].pack(value.id, value.inner.tag, value.inner.value, value.color, '
+                        'value.pair[0].tag, value.pair[0].value, value.pair[1].tag, value.pair[1].value)\n' in source)
+        self.assertEqual(4, source.count('_cdr.read_fixed_sequence('))
+        inner = lambda i: ns['Inner'](i, i * 0.5)
+        outer = ns['Outer'](7, inner(1), ns['GREEN'], [inner(2), inner(3)])
+        for bo in (BIG_ENDIAN, LITTLE_ENDIAN):
+            data = ns['encode_Outer'](outer, bo)
+            self.assertEqual(48, len(data))
+            self.assertEqual(plain['encode_Outer'](plain['Outer'](7, plain['Inner'](1, 0.5), plain['GREEN'], [
+                plain['Inner'](2, 1.0), plain['Inner'](3, 1.5)]), bo), data)
+            value = ns['decode_Outer'](data, bo)
+            self.assertEqual(outer, value)
+            self.assertTrue(value.color is ns['GREEN'])
+            # at an offset that is not a multiple of 8 the generic path runs
+            for offset in (1, 4):
+                buf = bytearray(b'\0' * offset)
+                ns['_w_Inner'](buf, inner(5), bo)
+                generic = bytearray(b'\0' * offset)
+                plain['_w_Inner'](generic, plain['Inner'](5, 2.5), bo)
+                self.assertEqual(generic, buf)
+                self.assertEqual((inner(5), len(buf)), ns['_r_Inner'](memoryview(bytes(buf)), offset, bo))
+            holder = ns['Holder'](1, [outer] * 3)
+            data = holder_data = ns['encode_Holder'](holder, bo)
+            self.assertEqual(data, plain['encode_Holder'](plain['decode_Holder'](data, bo), bo))
+            self.assertEqual(holder, ns['decode_Holder'](data, bo))
+            # records after a count at offset 0 start misaligned
+            shifted = ns['Shifted']([inner(i) for i in range(4)])
+            data = ns['encode_Shifted'](shifted, bo)
+            self.assertEqual(shifted, ns['decode_Shifted'](data, bo))
+            inners = [inner(i) for i in range(5)]
+            self.assertEqual(inners, ns['decode_Inners'](ns['encode_Inners'](inners, bo), bo))
+        self.assertRaises(MarshalError, ns['decode_Holder'], holder_data[:-1], LITTLE_ENDIAN)
+        self.assertRaises(MarshalError, ns['encode_Inner'], ns['Inner']('x', 1.0))
+
+    def testIter(self):
+        source, ns = self.generate('''
+            struct Rec { octet tag; string name; double v; sequence<octet> blob; };
+            typedef sequence<Rec> Recs;
+            typedef sequence<double> Ds;
+            typedef sequence<string> Names;
+            ''')
+        class Trickle(object):
+            # hands out a few octets per call like a slow socket
+            def __init__(self, data):
+                self.data = StringIO(data)
+            def read(self, size):
+                return self.data.read(min(size, 5))
+        recs = [ns['Rec'](i & 255, 'r%d' % i, i * 0.5, 'x' * (i % 7)) for i in range(200)]
+        data = ns['encode_Recs'](recs)
+        self.assertEqual(recs, list(ns['iter_Recs'](Trickle(data))))
+        self.assertEqual(recs, list(ns['iter_Rec'](StringIO(data))))
+        self.assertEqual([recs[:64], recs[64:128], recs[128:192], recs[192:]], list(ns['iter_Recs'](Trickle(data), batch=64)))
+        many = bytearray()
+        ns['encode_many_Rec'](recs[:3], many)
+        self.assertEqual(recs[:3], list(ns['iter_Rec'](StringIO(bytes(many)), count=3)))
+        self.assertEqual([0.5] * 1000, list(ns['iter_Ds'](Trickle(ns['encode_Ds']([0.5] * 1000)))))
+        self.assertEqual(['a', 'bc'], list(ns['iter_Names'](Trickle(ns['encode_Names'](['a', 'bc'])))))
+        self.assertRaises(MarshalError, list, ns['iter_Recs'](Trickle(data[:-3])))
+
+    def testIterLargeElements(self):
+        source, ns = self.generate('typedef sequence<octet> Blob; typedef sequence<Blob> Blobs;')
+        class Counting(object):
+            def __init__(self, data):
+                self.data = StringIO(data)
+                self.reads = 0
+            def read(self, size):
+                self.reads += 1
+                return self.data.read(size)
+        blobs = ['a' * 2000000, 'b' * 10]
+        source = Counting(ns['encode_Blobs'](blobs))
+        self.assertEqual(blobs, list(ns['iter_Blobs'](source)))
+        # the window doubles rather than grows by a read at a time
+        self.assertTrue(source.reads < 10)
+        # a bogus length fails once the limit is buffered, not at the end
+        source = Counting(ns['encode_Blobs'](blobs)[:4] + '\xff' * 2000000)
+        self.assertRaises(MarshalError, list, ns['iter_Blobs'](source, limit=1024))
+        self.assertTrue(source.reads < 5)
+        # malformed data fails where it is, without reading on
+        source, ns = self.generate('typedef sequence<string> Names;')
+        source = Counting(ns['encode_Names'](['ab', 'cd']).replace('cd\0', 'cdx') + '\0' * 2000000)
+        self.assertRaises(MarshalError, list, ns['iter_Names'](source))
+        self.assertEqual(1, source.reads)
+
+    @skipIf(numpy is None, 'numpy is not available')
+    def testIterNumpyShortReads(self):
+        source, ns = self.generate('typedef sequence<double> Ds; typedef sequence<Ds> Dss;', numpy=True)
+        values = [[i + j * 0.5 for j in range(i)] for i in range(8)]
+        class ShortReads(object):
+            def __init__(self, data):
+                self.data = StringIO(data)
+            def read(self, size):
+                return self.data.read(min(size, 40))
+        # the arrays yielded first are not overwritten by later reads
+        arrays = list(ns['iter_Dss'](ShortReads(ns['encode_Dss'](values))))
+        self.assertEqual(values, [array.tolist() for array in arrays])
+
+    def testIterSources(self):
+        import mmap
+        import socket
+        source, ns = self.generate('struct P { long x; double y; }; typedef sequence<P> Ps;')
+        points = [ns['P'](i, i * 0.25) for i in range(1000)]
+        data = ns['encode_Ps'](points)
+        path = os.path.join(self.base_dir, 'points.cdr')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path, 'rb') as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.assertEqual(points, list(ns['iter_P'](m)))
+            finally:
+                m.close()
+        a, b = socket.socketpair()
+        try:
+            a.sendall(data)
+            a.shutdown(socket.SHUT_WR)
+            self.assertEqual(points, list(ns['iter_Ps'](b)))
+        finally:
+            a.close()
+            b.close()
+
+    def testUnsupported(self):
+        source, ns = self.generate('struct S { any a; long double d; };')
+        self.assertRaises(MarshalError, ns['encode_S'], ns['S'](None, 0.5))
+        self.assertRaises(MarshalError, ns['encode_S'], ns['S'](typecode.Any(typecode.TC_LONG, 1), 0.5))
+
+    def testPerModule(self):
+        CDRGenerator(self.base_dir, prefix='cdrgen', lazy=True)(self.parse(CDR_IDL))
+        self.assertTrue('from cdrgen.C import _r_Point as _cdrgen_C__r_Point\n' in self.read('cdrgen', 'C', '_Rec.py'))
+        sys.path.insert(0, self.base_dir)
+        try:
+            import cdrgen.C
+            point = cdrgen.C.Point(1, 2, 3, 4)
+            self.assertEqual(2, cdrgen.C.decode_Point(cdrgen.C.encode_Point(point)).y)
+        finally:
+            sys.path.remove(self.base_dir)
+            for name in list(sys.modules):
+                if name.startswith('cdrgen'):
+                    del sys.modules[name]
+
+JSON_IDL = '''
+module J {
+  enum Color { RED, GREEN };
+  typedef sequence<Color> Colors;
+  struct Point { long x; double y; };
+  union Shape switch (Color) { case RED: Point p; case GREEN: string name; };
+  struct Scene {
+    string title;
+    Colors colors;
+    sequence<Point> points;
+    sequence<long> ids;
+    sequence<octet> blob;
+    long grid[2][2];
+    Shape shape;
+    sequence<sequence<Point> > layers;
+  };
+};
+'''
+
+class JSONGeneratorTest(CodegenTestCase):
+    def generate(self, text):
+        out = StringIO()
+        JSONGenerator(out=out)(self.parse(text))
+        namespace = {}
+        exec out.getvalue() in namespace
+        return out.getvalue(), namespace
+
+    def scene(self, ns):
+        point = ns['Point'](1, 0.5)
+        return ns['Scene'](
+            'demo', [ns['GREEN'], ns['RED']], [point] * 3, range(10), '\0\1\2',
+            [[1, 2], [3, 4]], ns['Shape'](ns['RED'], point), [[point], []])
+
+    def testRoundTrip(self):
+        source, ns = self.generate(JSON_IDL)
+        self.assertFalse('getattr' in source)
+        scene = self.scene(ns)
+        obj = json.loads(json.dumps(ns['to_json_Scene'](scene)))
+        self.assertEqual(['GREEN', 'RED'], obj['colors'])
+        self.assertEqual({'x': 1, 'y': 0.5}, obj['points'][0])
+        self.assertEqual({'_d': 'GREEN', 'name': 'x'}, ns['to_json_Shape'](ns['Shape'](ns['GREEN'], 'x')))
+        value = ns['from_json_Scene'](obj)
+        self.assertEqual(scene, value)
+        self.assertTrue(value.colors[0] is ns['GREEN'])
+
+    def testCharSequence(self):
+        # the CDR codec decodes sequence<char> to a view of the message
+        source, ns = self.generate('struct Note { sequence<char> text; };')
+        note = ns['Note'](memoryview('hi'))
+        self.assertEqual('{"text": "hi"}', json.dumps(ns['to_json_Note'](note)))
+        out = StringIO()
+        ns['dump_Note'](note, out)
+        self.assertEqual({'text': 'hi'}, json.loads(out.getvalue()))
+
+    def testCharRoundTrip(self):
+        # chars read from JSON are text and have to be octets again for CDR
+        text = 'struct Note { char c; sequence<char> cs; };'
+        source, ns = self.generate(text)
+        out = StringIO()
+        CDRGenerator(out=out)(self.parse(text))
+        codecs = {}
+        exec out.getvalue() in codecs
+        note = ns['from_json_Note'](json.loads('{"c": "z", "cs": "xy"}'))
+        decoded = codecs['decode_Note'](codecs['encode_Note'](note))
+        self.assertEqual(('z', 'xy'), (decoded.c, cdr.tobytes(decoded.cs)))
+        self.assertEqual({'c': 'z', 'cs': 'xy'}, json.loads(json.dumps(ns['to_json_Note'](decoded))))
+
+    def testDump(self):
+        source, ns = self.generate(JSON_IDL)
+        scene = self.scene(ns)
+        out = StringIO()
+        ns['dump_Scene'](scene, out)
+        self.assertEqual(json.loads(json.dumps(ns['to_json_Scene'](scene))), json.loads(out.getvalue()))
+        out = StringIO()
+        ns['dump_Colors'](range(2) * 5000, out)
+        self.assertEqual(['RED', 'GREEN'] * 5000, json.loads(out.getvalue()))
+
+    def testUnsupported(self):
+        source, ns = self.generate('struct S { any a; };')
+        self.assertRaises(ValueError, ns['to_json_S'], ns['S'](None))
+
+BOUNDS_IDL = '''
+module B {
+  const long N = 4;
+  typedef string<N> Name;
+  typedef sequence<Name, 2> Names;
+  struct Point { long x; long y; };
+  struct Item { Name name; wstring<3> label; sequence<long, N * 2> ids; octet tag[2]; };
+  union Choice switch (long) { case 1: Item item; case 2: long n; default: string<1> c; };
+  struct Order {
+    Point origin;
+    Names names;
+    sequence<Item> items;
+    short grid[2][3];
+    Choice choice;
+    struct Inner { string<2> code; } inner;
+  };
+};
+'''
+
+class ValidatorGeneratorTest(CodegenTestCase):
+    def generate(self, text):
+        out = StringIO()
+        ValidatorGenerator(out=out)(self.parse(text))
+        namespace = {}
+        exec out.getvalue() in namespace
+        return out.getvalue(), namespace
+
+    def order(self, ns):
+        item = ns['Item']('abcd', u'xyz', range(8), 'ab')
+        return ns['Order'](
+            ns['Point'](1, 2), ['a', 'b'], [item], [[1, 2, 3], [4, 5, 6]],
+            ns['Choice'](1, item), ns['Order_Inner']('ab'))
+
+    def assertBounds(self, message, function, *args):
+        try:
+            function(*args)
+        except BoundsError as e:
+            self.assertEqual(message, str(e))
+        else:
+            self.fail('BoundsError not raised')
+
+    def testValidate(self):
+        source, ns = self.generate(BOUNDS_IDL)
+        self.assertTrue('if len(value.ids) > 8:\n' in source)
+        self.assertTrue('def validate_Point(value):\n    pass\n' in source)
+        self.assertFalse('validate_Point(value.origin)' in source)
+        order = self.order(ns)
+        ns['validate_Order'](order)
+        order.items[0].name = 'abcde'
+        self.assertBounds('B::Name: length 5 exceeds the bound 4', ns['validate_Order'], order)
+        order = self.order(ns)
+        order.grid[1] = [1, 2]
+        self.assertBounds('B::Order.grid[]: length 2 does not match the dimension 3', ns['validate_Order'], order)
+        order = self.order(ns)
+        order.choice = ns['Choice'](7, 'xy')
+        self.assertBounds('B::Choice.c: length 2 exceeds the bound 1', ns['validate_Order'], order)
+        order.choice = ns['Choice'](2, 12345)
+        ns['validate_Order'](order)
+        self.assertBounds('B::Item.label: length 4 exceeds the bound 3', ns['validate_Item'], ns['Item']('a', u'abcd', [], 'ab'))
+        self.assertBounds('B::Names: length 3 exceeds the bound 2', ns['validate_Names'], ['a'] * 3)
+
+    def testFused(self):
+        out = StringIO()
+        CDRGenerator(out=out, validate=True)(self.parse(BOUNDS_IDL))
+        ns = {}
+        exec out.getvalue() in ns
+        order = self.order(ns)
+        self.assertEqual(order, ns['decode_Order'](ns['encode_Order'](order)))
+        order.items[0].tag = 'abc'
+        self.assertBounds('B::Item.tag: length 3 does not match the dimension 2', ns['encode_Order'], order)
+        order = self.order(ns)
+        order.inner.code = 'abc'
+        self.assertBounds('B::Order::Inner.code: length 3 exceeds the bound 2', ns['encode_Order'], order)
+        # the validators report the same path
+        source, validators = self.generate(BOUNDS_IDL)
+        invalid = self.order(validators)
+        invalid.inner.code = 'abc'
+        self.assertBounds('B::Order::Inner.code: length 3 exceeds the bound 2', validators['validate_Order'], invalid)
+        order = self.order(ns)
+        order.items[0].ids = range(9)
+        self.assertBounds('B::Item.ids: length 9 exceeds the bound 8', ns['encode_Order'], order)
+        order = self.order(ns)
+        order.choice = ns['Choice'](0, 'xy')
+        self.assertBounds('B::Choice.c: length 2 exceeds the bound 1', ns['encode_Order'], order)
+        out = StringIO()
+        CDRGenerator(out=out)(self.parse(BOUNDS_IDL))
+        self.assertFalse('_bounds' in out.getvalue())
+
+# generated asyncio code only runs on Python 3
+PYTHON3 = find_executable('python3')
+
+STUB_IDL = '''
+module C {
+  struct Point { long x; long y; };
+  exception Oops { string why; };
+  interface Svc {
+    attribute long count;
+    long call(in Point p, inout string s, out double d) raises (Oops);
+    oneway void ping(in long a);
+    void boom();
+  };
+  interface Sub : Svc { Point twice(in Point p); };
+};
+'''
+
+POLICY_IDL = '''
+module P {
+  [threadpool(2)]
+  interface Svc {
+    [inline] long add(in long a, in long b);
+    oneway void log(in string line);
+    [processpool = 3] attribute long level;
+  };
+  interface Sub : Svc { [threadpool] void wait(); };
+};
+'''
+
+STUB_DRIVER = '''
+import asyncio
+from pyomgidl.runtime import aio
+import stubs as s
+
+state = {'count': 0, 'pings': []}
+
+async def handle(operation, body, bo):
+    if operation == 'call':
+        p, text = s.decode_Svc_call_request(body, bo)
+        # later requests are answered first
+        await asyncio.sleep(0.01 * (3 - p.x))
+        if p.x < 0:
+            return aio.USER_EXCEPTION, aio.encode_exception('IDL:C/Oops:1.0', s._w_Oops, s.Oops(b'negative'), bo)
+        return aio.NO_EXCEPTION, s.encode_Svc_call_reply((p.x + p.y, text + b'!', 0.5), bo)
+    elif operation == 'twice':
+        p, = s.decode_Sub_twice_request(body, bo)
+        return aio.NO_EXCEPTION, s.encode_Sub_twice_reply((s.Point(p.x * 2, p.y * 2), ), bo)
+
+def handler(operation, body, bo):
+    if operation == 'ping':
+        state['pings'].append(s.decode_Svc_ping_request(body, bo)[0])
+    elif operation == '_set_count':
+        state['count'], = s.decode_Svc__set_count_request(body, bo)
+        return aio.NO_EXCEPTION, s.encode_Svc__set_count_reply((), bo)
+    elif operation == '_get_count':
+        return aio.NO_EXCEPTION, s.encode_Svc__get_count_reply((state['count'], ), bo)
+    elif operation == 'boom':
+        raise ValueError('boom')
+    else:
+        return handle(operation, body, bo)
+
+async def main():
+    loop = asyncio.get_running_loop()
+    stub = s.SubStub(aio.Connection(aio.LocalTransport(handler, loop), loop=loop))
+    results = await asyncio.gather(*[stub.call(s.Point(i, 10), b'x%d' % i) for i in range(3)])
+    assert results == [(10, b'x0!', 0.5), (11, b'x1!', 0.5), (12, b'x2!', 0.5)], results
+    try:
+        await stub.call(s.Point(-1, 0), b'')
+        raise AssertionError('Oops not raised')
+    except s.Oops as e:
+        assert e.why == b'negative'
+    assert await stub.ping(5) is None
+    stub.flush()
+    await asyncio.sleep(0)
+    assert state['pings'] == [5]
+    await stub._set_count(7)
+    assert await stub._get_count() == 7
+    assert await stub.twice(s.Point(1, 2)) == s.Point(2, 4)
+    try:
+        await stub.boom()
+        raise AssertionError('RemoteError not raised')
+    except aio.RemoteError as e:
+        assert str(e) == aio.UNKNOWN
+    assert not stub._connection.pending
+
+asyncio.run(main())
+'''
+
+STREAM_DRIVER = '''
+import os
+import sys
+import asyncio
+from pyomgidl.runtime import aio, giop, policies
+import stubs as s
+import skeletons as k
+
+class Servant(k.SubSkeleton):
+    count = 0
+    def __init__(self):
+        super(Servant, self).__init__()
+        self.pings = []
+    def call(self, p, text):
+        if p.x < 0:
+            raise k.Oops(b'negative')
+        return p.x + p.y, text + b'!', 0.5
+    def ping(self, a):
+        self.pings.append(a)
+    def twice(self, p):
+        return k.Point(p.x * 2, p.y * 2)
+
+async def main(path):
+    loop = asyncio.get_running_loop()
+    servant = Servant()
+    server = giop.Server(path, policies.Dispatcher(servant, default=(policies.THREADPOOL, 2))).start()
+    transport, protocol = await loop.create_unix_connection(aio.StreamTransport, path)
+    stub = s.SubStub(aio.Connection(protocol, loop=loop))
+    results = await asyncio.gather(*[stub.call(s.Point(i, 10), b'x%d' % i) for i in range(20)])
+    assert results == [(10 + i, b'x%d!' % i, 0.5) for i in range(20)], results
+    try:
+        await stub.call(s.Point(-1, 0), b'')
+        raise AssertionError('Oops not raised')
+    except s.Oops as e:
+        assert e.why == b'negative'
+    for i in range(3):
+        await stub.ping(i)
+    await stub._set_count(7)
+    assert await stub._get_count() == 7
+    assert sorted(servant.pings) == [0, 1, 2], servant.pings
+    assert await stub.twice(s.Point(1, 2)) == s.Point(2, 4)
+    assert not stub._connection.pending
+    stub._connection.close()
+    server.close()
+
+asyncio.run(main(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'socket')))
+'''
+
+COALESCE_DRIVER = '''
+import asyncio
+from pyomgidl.runtime import aio
+import stubs as s
+
+calls = []
+writes = []
+
+class CountingTransport(aio.LocalTransport):
+    def send_requests(self, requests):
+        writes.append(len(requests))
+        aio.LocalTransport.send_requests(self, requests)
+
+def handler(operation, body, bo):
+    if operation == 'ping':
+        calls.append(s.decode_Svc_ping_request(body, bo)[0])
+    else:
+        p, text = s.decode_Svc_call_request(body, bo)
+        calls.append(operation)
+        return aio.NO_EXCEPTION, s.encode_Svc_call_reply((0, text, 0.0), bo)
+
+async def main():
+    loop = asyncio.get_running_loop()
+    def stub(**kwargs):
+        return s.SvcStub(aio.Connection(CountingTransport(handler, loop), loop=loop, **kwargs))
+    # oneways issued in one tick go out in one write, ahead of the request
+    svc = stub()
+    for i in range(100):
+        await svc.ping(i)
+    await svc.call(s.Point(0, 0), b'')
+    assert writes == [100, 1], writes
+    assert calls == list(range(100)) + ['call'], calls
+    # size threshold: each ping request is 4 octets
+    del writes[:], calls[:]
+    svc = stub(batch_size=12)
+    for i in range(7):
+        await svc.ping(i)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert writes == [3, 3, 1], writes
+    assert calls == list(range(7)), calls
+    # latency threshold and explicit flush
+    del writes[:], calls[:]
+    svc = stub(batch_delay=0.05)
+    await svc.ping(1)
+    await asyncio.sleep(0.01)
+    assert calls == []
+    await asyncio.sleep(0.1)
+    assert calls == [1], calls
+    await svc.ping(2)
+    svc.flush()
+    await asyncio.sleep(0)
+    assert calls == [1, 2], calls
+
+asyncio.run(main())
+'''
+
+LARGE_DRIVER = '''
+import os
+import asyncio
+import threading
+from pyomgidl.runtime import aio, giop
+import stubs as s
+
+reading = threading.Event()
+
+def handler(operation, body, bo):
+    reading.wait()
+    p, text = s.decode_Svc_call_request(body, bo)
+    assert text == bytes([p.x]) * p.y, (p.x, len(text))
+    return aio.NO_EXCEPTION, s.encode_Svc_call_reply((p.x, text, 0.0), bo)
+
+async def main(path):
+    loop = asyncio.get_running_loop()
+    server = giop.Server(path, handler).start()
+    transport, protocol = await loop.create_unix_connection(aio.StreamTransport, path)
+    stub = s.SvcStub(aio.Connection(protocol, loop=loop))
+    # a body larger than a fresh pool buffer
+    reading.set()
+    assert await stub.call(s.Point(1, 300), bytes([1]) * 300) == (1, bytes([1]) * 300, 0.0)
+    # while the server is not reading, the transport holds on to frames
+    # that were written from buffers since reused
+    reading.clear()
+    calls = [asyncio.ensure_future(stub.call(s.Point(i, 65536), bytes([i]) * 65536)) for i in range(32)]
+    await asyncio.sleep(0.1)
+    assert transport.get_write_buffer_size() > 0
+    reading.set()
+    results = await asyncio.gather(*calls)
+    assert [result[1] for result in results] == [bytes([i]) * 65536 for i in range(32)]
+    stub._connection.close()
+    server.close()
+
+asyncio.run(main(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'socket')))
+'''
+
+NAMES_IDL = '''
+interface N { long f(in long bo, in long connection, in long status, in long body); };
+'''
+
+NAMES_DRIVER = '''
+import asyncio
+from pyomgidl.runtime import aio
+import stubs as s
+
+def handler(operation, body, bo):
+    values = s.decode_N_f_request(body, bo)
+    return aio.NO_EXCEPTION, s.encode_N_f_reply((int(''.join(map(str, values))), ), bo)
+
+async def main():
+    loop = asyncio.get_running_loop()
+    stub = s.NStub(aio.Connection(aio.LocalTransport(handler, loop), loop=loop))
+    result = await stub.f(1, 2, 3, 4)
+    assert result == 1234, result
+
+asyncio.run(main())
+'''
+
+class AsyncStubGeneratorTest(CodegenTestCase):
+    def generate(self, text):
+        out = StringIO()
+        AsyncStubGenerator(out=out)(self.parse(text))
+        return out.getvalue()
+
+    def run_python3(self, source, driver):
+        with open(os.path.join(self.base_dir, 'stubs.py'), 'w') as f:
+            f.write(source)
+        with open(os.path.join(self.base_dir, 'driver.py'), 'w') as f:
+            f.write(driver)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([self.base_dir, os.path.dirname(os.path.dirname(os.path.abspath(pyomgidl.__file__)))])
+        process = subprocess.Popen([PYTHON3, os.path.join(self.base_dir, 'driver.py')], env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = process.communicate()[0]
+        self.assertEqual(0, process.returncode, output)
+        return output
+
+    def testSource(self):
+        source = self.generate(STUB_IDL)
+        self.assertTrue('class SubStub(SvcStub):\n' in source)
+        self.assertTrue("_Svc_call_raises = {'IDL:C/Oops:1.0': _r_Oops}\n" in source)
+        self.assertTrue('    async def _set_count(self, value):\n' in source)
+        self.assertTrue("        _connection.send_oneway('ping', encode_Svc_ping_request((a, ), _bo))\n" in source)
+
+    @skipIf(PYTHON3 is None, 'python3 is not available')
+    def testParameterNames(self):
+        # parameters may be named like the locals of the stub methods
+        self.run_python3(self.generate(NAMES_IDL), NAMES_DRIVER)
+
+    @skipIf(PYTHON3 is None, 'python3 is not available')
+    def testPipelining(self):
+        self.run_python3(self.generate(STUB_IDL), STUB_DRIVER)
+
+    @skipIf(PYTHON3 is None, 'python3 is not available')
+    def testCoalescing(self):
+        self.run_python3(self.generate(STUB_IDL), COALESCE_DRIVER)
+
+    @skipIf(PYTHON3 is None, 'python3 is not available')
+    def testStreamTransport(self):
+        out = StringIO()
+        SkeletonGenerator(out=out)(self.parse(STUB_IDL))
+        with open(os.path.join(self.base_dir, 'skeletons.py'), 'w') as f:
+            f.write(out.getvalue())
+        self.run_python3(self.generate(STUB_IDL), STREAM_DRIVER)
+
+    @skipIf(PYTHON3 is None, 'python3 is not available')
+    def testLargeRequests(self):
+        self.run_python3(self.generate(STUB_IDL), LARGE_DRIVER)
+
+class SkeletonGeneratorTest(CodegenTestCase):
+    def generate(self, text):
+        out = StringIO()
+        SkeletonGenerator(out=out)(self.parse(text))
+        namespace = {}
+        exec out.getvalue() in namespace
+        return out.getvalue(), namespace
+
+    def testDispatch(self):
+        source, ns = self.generate(STUB_IDL)
+        self.assertFalse('getattr' in source)
+        pings = []
+        class Servant(ns['SubSkeleton']):
+            count = 3
+            def call(self, p, s):
+                if p.x < 0:
+                    raise ns['Oops']('negative')
+                return p.x + p.y, s + '!', 0.5
+            def ping(self, a):
+                pings.append(a)
+            def twice(self, p):
+                return ns['Point'](p.x * 2, p.y * 2)
+        servant = Servant()
+        self.assertEqual(sorted(['_get_count', '_set_count', 'call', 'ping', 'boom', 'twice']), sorted(Servant._operations))
+        self.assertTrue(Servant._operations['call'] is ns['SvcSkeleton']._operations['call'])
+        status, body = servant._dispatch('call', ns['encode_Svc_call_request']((ns['Point'](1, 2), 'x')), cdr.NATIVE)
+        self.assertEqual((giop.NO_EXCEPTION, (3, 'x!', 0.5)), (status, ns['decode_Svc_call_reply'](body)))
+        status, body = servant._dispatch('call', ns['encode_Svc_call_request']((ns['Point'](-1, 2), 'x'), BIG_ENDIAN), BIG_ENDIAN)
+        self.assertEqual(giop.USER_EXCEPTION, status)
+        try:
+            giop.raise_reply(status, body, BIG_ENDIAN, {'IDL:C/Oops:1.0': ns['_r_Oops']})
+        except ns['Oops'] as e:
+            self.assertEqual('negative', e.why)
+        self.assertEqual(None, servant._dispatch('ping', ns['encode_Svc_ping_request']((5, )), cdr.NATIVE))
+        self.assertEqual([5], pings)
+        servant._dispatch('_set_count', ns['encode_Svc__set_count_request']((7, )), cdr.NATIVE)
+        status, body = servant._dispatch('_get_count', b'', cdr.NATIVE)
+        self.assertEqual((7, ), ns['decode_Svc__get_count_reply'](body))
+        status, body = servant._dispatch('twice', ns['encode_Sub_twice_request']((ns['Point'](1, 2), )), cdr.NATIVE)
+        self.assertEqual((ns['Point'](2, 4), ), ns['decode_Sub_twice_reply'](body))
+        status, body = servant._dispatch('missing', b'', cdr.NATIVE)
+        self.assertEqual(giop.SYSTEM_EXCEPTION, status)
+        self.assertRaises(giop.RemoteError, giop.raise_reply, status, body, cdr.NATIVE)
+
+    def testDelegate(self):
+        source, ns = self.generate(STUB_IDL)
+        class Servant(object):
+            count = 1
+        skeleton = ns['SvcSkeleton'](Servant())
+        status, body = skeleton._dispatch('_get_count', b'', cdr.NATIVE)
+        self.assertEqual((1, ), ns['decode_Svc__get_count_reply'](body))
+
+    def testPolicies(self):
+        source, ns = self.generate(POLICY_IDL)
+        self.assertEqual(('threadpool', 2), ns['SvcSkeleton']._policy)
+        self.assertEqual({'add': ('inline', None), '_get_level': ('processpool', 3), '_set_level': ('processpool', 3)},
+                         ns['SvcSkeleton']._policies)
+        self.assertEqual(frozenset(['log']), ns['SvcSkeleton']._oneway)
+        # the interface default is inherited like the operation table
+        self.assertEqual(('threadpool', 2), ns['SubSkeleton']._policy)
+        self.assertEqual(('threadpool', None), ns['SubSkeleton']._policies['wait'])
+        self.assertEqual(('inline', None), ns['SubSkeleton']._policies['add'])
+        self.assertEqual(None, giop.Skeleton._policy)
+        self.assertRaises(CodegenError, self.generate, 'interface X { [threadpool(many)] void f(); };')
+
+    def testDispatcher(self):
+        source, ns = self.generate(POLICY_IDL)
+        lines = []
+        class Servant(ns['SvcSkeleton']):
+            level = 0
+            def add(self, a, b):
+                return a + b
+            def log(self, line):
+                lines.append(line)
+        dispatcher = policies.Dispatcher(Servant(), {'IDL:P/Svc:1.0': {'_set_level': (policies.THREADPOOL, 1)}})
+        try:
+            self.assertEqual(None, dispatcher.executor(('inline', None)))
+            result = dispatcher('add', ns['encode_Svc_add_request']((1, 2)), cdr.NATIVE)
+            self.assertEqual(tuple, type(result))
+            self.assertEqual((3, ), ns['decode_Svc_add_reply'](result[1]))
+            self.assertEqual(None, dispatcher('log', ns['encode_Svc_log_request'](('hello', )), cdr.NATIVE))
+            future = dispatcher('_set_level', ns['encode_Svc__set_level_request']((4, )), cdr.NATIVE)
+            self.assertEqual(giop.NO_EXCEPTION, future.result(5)[0])
+            dispatcher.shutdown()
+            self.assertEqual(['hello'], lines)
+            metrics = dispatcher.metrics()
+            self.assertEqual(1, metrics['add']['completed'])
+            self.assertEqual(1, metrics['log']['completed'])
+            self.assertEqual(0, dispatcher.queue_depth())
+            self.assertTrue(metrics['_set_level']['wait_max'] >= 0)
+        finally:
+            dispatcher.shutdown()
+
+    def testProcessPool(self):
+        source, ns = self.generate(POLICY_IDL)
+        # the workers unpickle the servant and the skeleton functions, so
+        # both have to live in an importable module
+        with open(os.path.join(self.base_dir, 'policysvc.py'), 'w') as f:
+            f.write(source + '\nclass Servant(SvcSkeleton):\n    level = 5\n    def add(self, a, b):\n        return a + b\n')
+        sys.path.insert(0, self.base_dir)
+        try:
+            import policysvc
+            # a setter would only change the worker's copy of the servant
+            self.assertRaises(ValueError, policies.Dispatcher, policysvc.Servant())
+            dispatcher = policies.Dispatcher(policysvc.Servant(), {'IDL:P/Svc:1.0': {
+                '_set_level': (policies.INLINE, None), 'add': (policies.PROCESSPOOL, 1)}})
+            try:
+                self.assertTrue(dispatcher.routes['add'][1] is dispatcher.executors[('processpool', 1)])
+                future = dispatcher('add', ns['encode_Svc_add_request']((1, 2)), cdr.NATIVE)
+                self.assertEqual((3, ), ns['decode_Svc_add_reply'](future.result(30)[1]))
+                future = dispatcher('_get_level', b'', cdr.NATIVE)
+                self.assertEqual((5, ), ns['decode_Svc__get_level_reply'](future.result(30)[1]))
+                self.assertEqual(1, dispatcher.metrics()['add']['completed'])
+            finally:
+                dispatcher.shutdown()
+        finally:
+            sys.path.remove(self.base_dir)
+            sys.modules.pop('policysvc', None)
+
+    def testPolicyConfig(self):
+        self.assertEqual(('threadpool', 8), policies.parse_policy('threadpool(8)'))
+        self.assertEqual(('inline', None), policies.parse_policy(' inline '))
+        self.assertRaises(ValueError, policies.parse_policy, 'greenlet(2)')
+        path = os.path.join(self.base_dir, 'policies.ini')
+        with open(path, 'w') as f:
+            f.write('[IDL:P/Svc:1.0]\n* = inline\n_set_level = threadpool(1)\n')
+        config = policies.load_policies(path)
+        self.assertEqual({'IDL:P/Svc:1.0': {'*': ('inline', None), '_set_level': ('threadpool', 1)}}, config)
+        source, ns = self.generate(POLICY_IDL)
+        dispatcher = policies.Dispatcher(ns['SvcSkeleton'](object()), config)
+        try:
+            # operations in the file win over the IDL, the file's interface
+            # default over the IDL interface policy
+            self.assertEqual(None, dispatcher.routes['log'][1])
+            self.assertEqual(None, dispatcher.routes['add'][1])
+            self.assertTrue(dispatcher.routes['_set_level'][1] is dispatcher.executors[('threadpool', 1)])
+            self.assertTrue(dispatcher.routes['_get_level'][1] is dispatcher.executors[('processpool', 3)])
+        finally:
+            dispatcher.shutdown()
+
+class GIOPTest(CodegenTestCase):
+    def skeleton(self):
+        out = StringIO()
+        SkeletonGenerator(out=out)(self.parse(STUB_IDL))
+        ns = {}
+        exec out.getvalue() in ns
+        class Servant(ns['SubSkeleton']):
+            count = 0
+            pings = []
+            def call(self, p, s):
+                return p.x + p.y, s + '!', 0.5
+            def ping(self, a):
+                self.pings.append(a)
+            def boom(self):
+                raise ValueError('secret')
+        return ns, Servant()
+
+    def testFraming(self):
+        pool = giop.BufferPool()
+        for byteorder in (BIG_ENDIAN, LITTLE_ENDIAN):
+            buf = pool.acquire()
+            end = giop.write_request(buf, 7, 'call', b'\1\2\3', byteorder)
+            message = buf[:end]
+            self.assertEqual(b'GIOP\1\2', bytes(message[:6]))
+            self.assertEqual((giop.REQUEST, byteorder, end - 12), giop.read_header(message))
+            request_id, response_expected, operation, body = giop.read_request(message, byteorder)
+            self.assertEqual((7, True, 'call', b'\1\2\3'), (request_id, response_expected, operation, body.tobytes()))
+            self.assertEqual(0, (end - len(body)) % 8)
+            # a shorter message over the same buffer
+            end = giop.write_request(buf, 8, 'ping', b'', byteorder, False)
+            self.assertEqual((8, False, 'ping', b''), giop.read_request(buf[:end], byteorder)[:3] + (b'', ))
+            end = giop.write_reply(buf, 7, giop.USER_EXCEPTION, b'\4' * 9, byteorder)
+            request_id, status, body = giop.read_reply(buf[:end], byteorder)
+            self.assertEqual((giop.REPLY, byteorder, 21), giop.read_header(buf))
+            self.assertEqual((7, giop.USER_EXCEPTION, b'\4' * 9), (request_id, status, body.tobytes()))
+            pool.release(buf)
+        self.assertEqual((1, 1), (pool.allocated, pool.reused))
+        self.assertRaises(giop.ProtocolError, giop.read_header, b'IIOP\1\2\0\0\0\0\0\0')
+        self.assertRaises(giop.ProtocolError, giop.read_header, b'GIOP')
+        pool = giop.BufferPool(size=1, max_octets=1024)
+        pool.release(bytearray(2048))
+        pool.release(bytearray(16))
+        pool.release(bytearray(16))
+        self.assertEqual(1, len(pool.free))
+
+    def testLoopback(self):
+        ns, servant = self.skeleton()
+        client = giop.loopback(servant._dispatch, BIG_ENDIAN)
+        try:
+            status, body = client.call('call', ns['encode_Svc_call_request']((ns['Point'](1, 2), 'x'), BIG_ENDIAN))
+            self.assertEqual((giop.NO_EXCEPTION, (3, 'x!', 0.5)), (status, ns['decode_Svc_call_reply'](body, BIG_ENDIAN)))
+            self.assertEqual(None, client.call('ping', ns['encode_Svc_ping_request']((5, ), BIG_ENDIAN), False))
+            status, body = client.call('_get_count', b'')
+            self.assertEqual((0, ), ns['decode_Svc__get_count_reply'](body, BIG_ENDIAN))
+            self.assertEqual([5], servant.pings)
+            status, body = client.call('missing', b'')
+            self.assertEqual(giop.SYSTEM_EXCEPTION, status)
+            self.assertRaises(giop.RemoteError, giop.raise_reply, status, body, BIG_ENDIAN)
+            # the message of an unmapped exception stays on the server
+            status, body = client.call('boom', b'')
+            self.assertEqual(giop.SYSTEM_EXCEPTION, status)
+            self.assertEqual(giop.UNKNOWN, cdr.read_string(memoryview(body), 0, BIG_ENDIAN)[0])
+            self.assertTrue(client.channel.pool.reused > 0)
+        finally:
+            client.close()
+
+    def testServer(self):
+        ns, servant = self.skeleton()
+        dispatcher = policies.Dispatcher(servant, default=(policies.THREADPOOL, 2))
+        server = giop.Server(os.path.join(self.base_dir, 'socket'), dispatcher).start()
+        clients = [giop.connect(server.path) for _ in range(3)]
+        try:
+            for i, client in enumerate(clients):
+                status, body = client.call('call', ns['encode_Svc_call_request']((ns['Point'](i, 1), 'x')))
+                self.assertEqual((i + 1, 'x!', 0.5), ns['decode_Svc_call_reply'](body))
+            status, body = clients[0].call('boom', b'')
+            self.assertEqual(giop.UNKNOWN, cdr.read_string(memoryview(body), 0, cdr.NATIVE)[0])
+        finally:
+            for client in clients:
+                client.close()
+            server.close()
+            dispatcher.shutdown()
+        self.assertFalse(os.path.exists(server.path))
+        self.assertEqual(3, dispatcher.metrics()['call']['completed'])
+
+TYPECODE_IDL = '''
+module T {
+  enum Color { RED, GREEN };
+  struct Node { long value; sequence<Node> children; };
+  union U switch (Color) { case RED: long n; default: string s; };
+  typedef sequence<Node> Nodes;
+  struct Holder { any a; Nodes nodes; struct Inner { double d; } inner; };
+};
+'''
+
+class TypeCodeGeneratorTest(CodegenTestCase):
+    def generate(self, text):
+        out = StringIO()
+        TypeCodeGenerator(out=out)(self.parse(text))
+        namespace = {}
+        exec out.getvalue() in namespace
+        return out.getvalue(), namespace
+
+    def tearDown(self):
+        super(TypeCodeGeneratorTest, self).tearDown()
+        typecode.REGISTRY.clear()
+        typecode.DECODED.clear()
+
+    def testTypeCodes(self):
+        source, ns = self.generate(TYPECODE_IDL)
+        tc = ns['tc_Node']
+        self.assertEqual(('IDL:T/Node:1.0', 'Node'), (tc.id, tc.name))
+        self.assertTrue(tc.members[1][1].content is tc)
+        self.assertEqual([(0, 'n', typecode.TC_LONG), (None, 's', typecode.TC_STRING)], ns['tc_U'].members)
+        self.assertTrue(ns['tc_U'].discriminator is ns['tc_Color'])
+        self.assertTrue(ns['tc_Nodes'].content.content is tc)
+        self.assertEqual(['d'], [name for name, _ in ns['tc_Holder_Inner'].members])
+        for byteorder in (BIG_ENDIAN, LITTLE_ENDIAN):
+            encoded = tc.encode(byteorder)
+            self.assertTrue(encoded is tc.encode(byteorder))
+            # the recursive member is an indirection back to the start
+            self.assertTrue(cdr.structs('I')[byteorder].pack(0xffffffff) in encoded)
+            self.assertEqual(-(len(encoded) - 8), cdr.structs('i')[byteorder].unpack_from(encoded, len(encoded) - 8)[0])
+            typecode.REGISTRY.clear()
+            typecode.DECODED.clear()
+            decoded, end = typecode.decode_typecode(encoded, 0, byteorder)
+            self.assertEqual(len(encoded), end)
+            self.assertFalse(decoded is tc)
+            self.assertTrue(decoded.members[1][1].content is decoded)
+            self.assertEqual(tc, decoded)
+            self.assertTrue(decoded is typecode.decode_typecode(encoded, 0, byteorder)[0])
+
+    def testAny(self):
+        source, ns = self.generate(TYPECODE_IDL)
+        node = ns['Node'](1, [ns['Node'](2, [])])
+        values = [
+            typecode.Any(ns['tc_Node'], node),
+            typecode.Any(ns['tc_U'], ns['U'](ns['GREEN'], 'x')),
+            typecode.Any(ns['tc_Color'], ns['GREEN']),
+            typecode.Any(typecode.sequence(typecode.TC_SHORT), [1, 2]),
+            typecode.Any(typecode.TC_ANY, typecode.Any(typecode.TC_STRING, 'nested')),
+            ]
+        for byteorder in (BIG_ENDIAN, LITTLE_ENDIAN):
+            for value in values:
+                holder = ns['decode_Holder'](ns['encode_Holder'](ns['Holder'](value, [node], ns['Holder_Inner'](0.5)), byteorder), byteorder)
+                self.assertTrue(holder.a.typecode is value.typecode or holder.a.typecode == value.typecode)
+                self.assertEqual(2, holder.nodes[0].children[0].value)
+            holder = ns['decode_Holder'](ns['encode_Holder'](ns['Holder'](values[0], [], ns['Holder_Inner'](0.5)), byteorder), byteorder)
+            self.assertTrue(holder.a.typecode is ns['tc_Node'])
+            self.assertTrue(isinstance(holder.a.value, ns['Node']))
+            self.assertEqual(2, holder.a.value.children[0].value)
+        self.assertEqual(repr(ns['GREEN']), repr(ns['decode_Holder'](ns['encode_Holder'](ns['Holder'](values[2], [], ns['Holder_Inner'](0.5)))).a.value))
+        # without the generated types values come back as tuples
+        data = ns['encode_Holder'](ns['Holder'](values[0], [], ns['Holder_Inner'](0.5)))
+        typecode.REGISTRY.clear()
+        typecode.DECODED.clear()
+        self.assertEqual((1, [(2, [])]), ns['decode_Holder'](data).a.value)
@@ -0,0 +1,136 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.resolver import declarator_name
+from pyomgidl.codegen.exceptions import CodegenError
+from pyomgidl.codegen.cdr import CDRGenerator, repository_id
+
+__all__ = [
+    'TypeCodeGenerator',
+    ]
+
+BASIC = {
+    'short': '_tc.TC_SHORT',
+    'unsigned short': '_tc.TC_USHORT',
+    'long': '_tc.TC_LONG',
+    'unsigned long': '_tc.TC_ULONG',
+    'long long': '_tc.TC_LONGLONG',
+    'unsigned long long': '_tc.TC_ULONGLONG',
+    'float': '_tc.TC_FLOAT',
+    'double': '_tc.TC_DOUBLE',
+    'long double': '_tc.TC_LONGDOUBLE',
+    'boolean': '_tc.TC_BOOLEAN',
+    'char': '_tc.TC_CHAR',
+    'wchar': '_tc.TC_WCHAR',
+    'octet': '_tc.TC_OCTET',
+    'any': '_tc.TC_ANY',
+    'Object': '_tc.TC_OBJECT',
+    'void': '_tc.TC_VOID',
+    }
+
+class TypeCodeGenerator(CDRGenerator):
+    # CDR codecs along with a tc_X TypeCode for every named type, registered
+    # so that anys holding one decode to the generated class. members are
+    # assigned once the nested definitions are out, which lets a type refer
+    # to itself
+    def add_typecode_imports(self):
+        self.add_import('from pyomgidl.runtime import typecode as _tc')
+
+    def typecode(self, type, scope=None):
+        if scope is None:
+            scope = self.current_scope
+        if isinstance(type, BasicTypeNode):
+            retval = BASIC.get(type.name)
+            if retval is None:
+                raise CodegenError('No TypeCode for %s' % type.name)
+            return retval
+        elif isinstance(type, WideStringType):
+            return type.size is None and '_tc.TC_WSTRING' or '_tc.wstring(%d)' % self.evaluate(type.size, scope)
+        elif isinstance(type, StringType):
+            return type.size is None and '_tc.TC_STRING' or '_tc.string(%d)' % self.evaluate(type.size, scope)
+        elif isinstance(type, SequenceType):
+            return '_tc.sequence(%s, %d)' % (
+                self.typecode(type.type, scope), type.size is not None and self.evaluate(type.size, scope) or 0)
+        elif isinstance(type, ArrayType):
+            retval = self.typecode(type.type, scope)
+            for dimension in reversed(type.dimension):
+                retval = '_tc.array(%s, %d)' % (retval, self.evaluate(dimension, scope))
+            return retval
+        elif isinstance(type, (Struct, Enum, Union)):
+            return self.reference_name(scope + (type.name.value, ), 'tc_%s')
+        qualified_name = self.symbols.lookup(type, scope)
+        definition = self.symbols.symbols[qualified_name]
+        if isinstance(definition, Interface):
+            return '_tc.objref(%r, %r)' % (repository_id(qualified_name), qualified_name[-1])
+        elif isinstance(definition, (Struct, Enum, Union, ExceptionDecl, TypeDef)):
+            return self.reference_name(qualified_name, 'tc_%s')
+        raise CodegenError('No TypeCode for %s' % '::'.join(qualified_name))
+
+    def emit_typecode(self, kind, qualified_name, codecs=True, **params):
+        self.add_typecode_imports()
+        name = self.local_name(qualified_name)
+        arguments = [kind, repr(repository_id(qualified_name)), repr(qualified_name[-1])]
+        arguments.extend('%s=%s' % item for item in sorted(params.items()))
+        if codecs:
+            arguments.extend(['write=_w_%s' % name, 'read=_r_%s' % name])
+        self.write('tc_%s = _tc.register(_tc.TypeCode(%s))' % (name, ', '.join(arguments)))
+        self.write()
+        self.export('tc_%s' % name)
+
+    def emit_typecode_members(self, node):
+        members = ['(%r, %s)' % (field, self.typecode(type)) for field, type in self.expand_members(node.members)]
+        self.write('tc_%s.members = [%s]' % (self.local_name(self.current_scope), ', '.join(members)))
+        self.write()
+
+    def visit_struct(self, node):
+        super(TypeCodeGenerator, self).visit_struct(node)
+        self.emit_typecode('_tc.TK_STRUCT', self.current_scope)
+
+    def depart_struct(self, node):
+        self.emit_typecode_members(node)
+        super(TypeCodeGenerator, self).depart_struct(node)
+
+    def visit_except_decl(self, node):
+        super(TypeCodeGenerator, self).visit_except_decl(node)
+        self.emit_typecode('_tc.TK_EXCEPT', self.current_scope)
+
+    def depart_except_decl(self, node):
+        self.emit_typecode_members(node)
+        super(TypeCodeGenerator, self).depart_except_decl(node)
+
+    def visit_enum(self, node):
+        super(TypeCodeGenerator, self).visit_enum(node)
+        qualified_name = self.enum_names[id(node)]
+        name = self.local_name(qualified_name)
+        self.begin_definition(name)
+        self.emit_typecode('_tc.TK_ENUM', qualified_name, False,
+                           members=repr([enumerator.value for enumerator in node.enumerators]),
+                           read='_tc.enum_reader(%s)' % name)
+        self.end_definition()
+
+    def visit_union(self, node):
+        super(TypeCodeGenerator, self).visit_union(node)
+        self.emit_typecode('_tc.TK_UNION', self.current_scope)
+
+    def depart_union(self, node):
+        members = []
+        for case in node.cases:
+            type = case.type
+            if isinstance(case.declarator, ArrayType):
+                type = ArrayType(type, case.declarator.dimension)
+            for value in case.values:
+                members.append('(%r, %r, %s)' % (value, declarator_name(case.declarator), self.typecode(type)))
+        name = self.local_name(self.current_scope)
+        self.write('tc_%s.discriminator = %s' % (name, self.typecode(node.discriminator)))
+        self.write('tc_%s.members = [%s]' % (name, ', '.join(members)))
+        self.write()
+        super(TypeCodeGenerator, self).depart_union(node)
+
+    def visit_type_def(self, node):
+        super(TypeCodeGenerator, self).visit_type_def(node)
+        for declarator in node.declarators:
+            type = node.type
+            if isinstance(declarator, ArrayType):
+                type = ArrayType(type, declarator.dimension)
+            qualified_name = self.current_scope + (declarator_name(declarator), )
+            self.begin_definition(self.local_name(qualified_name))
+            self.emit_typecode('_tc.TK_ALIAS', qualified_name, content=self.typecode(type))
+            self.end_definition()
@@ -0,0 +1,78 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.resolver import declarator_name
+from pyomgidl.codegen.values import ValueGenerator
+
+__all__ = [
+    'ValidatorGenerator',
+    ]
+
+class ValidatorGenerator(ValueGenerator):
+    def add_runtime_imports(self):
+        self.add_import('from pyomgidl.runtime import bounds as _bounds')
+
+    def begin_validator(self, name, qualified_name=None):
+        self.add_runtime_imports()
+        self.begin_bounds(qualified_name or self.current_scope)
+        self.write('def validate_%s(value):' % name)
+        self.indent()
+
+    def end_validator(self, name):
+        self.dedent()
+        self.write()
+        self.export('validate_%s' % name)
+
+    def emit_record(self, node):
+        name = self.local_name(self.current_scope)
+        members = [(field, type) for field, type in self.expand_members(node.members) if self.needs_bounds(type)]
+        self.begin_validator(name)
+        for field, type in members:
+            self.emit_bounds(type, 'value.%s' % field, 0)
+        if not members:
+            self.write('pass')
+        self.end_validator(name)
+
+    def visit_struct(self, node):
+        super(ValidatorGenerator, self).visit_struct(node)
+        self.emit_record(node)
+
+    def visit_except_decl(self, node):
+        super(ValidatorGenerator, self).visit_except_decl(node)
+        self.emit_record(node)
+
+    def visit_union(self, node):
+        super(ValidatorGenerator, self).visit_union(node)
+        name = self.local_name(self.current_scope)
+        labels = tuple(value for case in node.cases for value in case.values if value is not None)
+        self.begin_validator(name)
+        keyword = 'if'
+        for case, (branch, type) in zip(node.cases, self.bounded_members(node)):
+            if not self.needs_bounds(type):
+                continue
+            self.element_paths['value._v'] = '%s.%s' % (self.bound_name, branch)
+            if None in case.values:
+                self.write('%s value._d not in %r:' % (keyword, labels))
+            else:
+                self.write('%s value._d in %r:' % (keyword, tuple(case.values)))
+            self.indent()
+            self.emit_bounds(type, 'value._v', 0)
+            self.dedent()
+            keyword = 'elif'
+        if keyword == 'if':
+            self.write('pass')
+        self.end_validator(name)
+
+    def visit_type_def(self, node):
+        for declarator in node.declarators:
+            type = node.type
+            if isinstance(declarator, ArrayType):
+                type = ArrayType(type, declarator.dimension)
+            qualified_name = self.current_scope + (declarator_name(declarator), )
+            name = self.local_name(qualified_name)
+            self.begin_definition(name)
+            self.begin_validator(name, qualified_name)
+            if self.needs_bounds(type):
+                self.emit_bounds(type, 'value', 0)
+            else:
+                self.write('pass')
+            self.end_validator(name)
+            self.end_definition()
@@ -0,0 +1,339 @@
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.resolver import declarator_name, evaluate_const
+from pyomgidl.codegen.base import PythonGenerator, python_identifier
+
+__all__ = [
+    'ValueGenerator',
+    ]
+
+class ValueGenerator(PythonGenerator):
+    def __init__(self, *args, **kwargs):
+        super(ValueGenerator, self).__init__(*args, **kwargs)
+        # qualified names of enums, which may be declared inline
+        self.enum_names = {}
+        # whether named types carry bounds, by qualified name
+        self.bounded = {}
+        # bound checks report paths relative to this name
+        self.bound_name = None
+        self.element_paths = {}
+
+    def expand_members(self, members):
+        retval = []
+        for member in members:
+            if not isinstance(member, FieldDef):
+                continue
+            for declarator in member.declarators:
+                type = member.type
+                if isinstance(declarator, ArrayType):
+                    type = ArrayType(type, declarator.dimension)
+                retval.append((python_identifier(declarator_name(declarator)), type))
+        return retval
+
+    def evaluate(self, expr, scope=None):
+        if scope is None:
+            scope = self.current_scope
+        return evaluate_const(expr, self.symbols, scope)
+
+    def dealias(self, type, scope=None):
+        if scope is None:
+            scope = self.current_scope
+        while isinstance(type, SimpleTypeReferenceNode):
+            qualified_name = self.symbols.lookup(type, scope)
+            definition = self.symbols.symbols[qualified_name]
+            if not isinstance(definition, TypeDef):
+                break
+            scope = qualified_name[:-1]
+            for declarator in definition.declarators:
+                if declarator_name(declarator) == qualified_name[-1]:
+                    break
+            if isinstance(declarator, ArrayType):
+                return ArrayType(definition.type, declarator.dimension), scope
+            type = definition.type
+        return type, scope
+
+    def enum_name(self, type, scope=None):
+        type, scope = self.dealias(type, scope)
+        if isinstance(type, Enum):
+            return self.enum_names[id(type)]
+        elif isinstance(type, SimpleTypeReferenceNode):
+            qualified_name = self.symbols.lookup(type, scope)
+            definition = self.symbols.symbols[qualified_name]
+            if isinstance(definition, Enum) and definition.name.value == qualified_name[-1]:
+                return qualified_name
+        return None
+
+    def codec_reference(self, type, template):
+        if isinstance(type, (Struct, Enum, Union)):
+            return self.reference_name(self.current_scope + (type.name.value, ), template)
+        definition = self.symbols.resolve(type, self.current_scope)
+        if not isinstance(definition, (Struct, Enum, Union, TypeDef)):
+            return None
+        return self.reference(type, template)
+
+    def describe(self, type):
+        if isinstance(type, BasicTypeNode):
+            return type.name
+        elif isinstance(type, SimpleTypeReferenceNode):
+            return '::'.join(self.symbols.lookup(type, self.current_scope))
+        return type.__class__.__name__
+
+    def bounded_members(self, node):
+        if isinstance(node, Union):
+            retval = []
+            for case in node.cases:
+                type = case.type
+                if isinstance(case.declarator, ArrayType):
+                    type = ArrayType(type, case.declarator.dimension)
+                retval.append((python_identifier(declarator_name(case.declarator)), type))
+            return retval
+        return self.expand_members(node.members)
+
+    def needs_bounds(self, type, scope=None):
+        if scope is None:
+            scope = self.current_scope
+        if isinstance(type, StringType):
+            return type.size is not None
+        elif isinstance(type, ArrayType):
+            return True
+        elif isinstance(type, SequenceType):
+            return type.size is not None or self.needs_bounds(type.type, scope)
+        elif isinstance(type, (Struct, Union)):
+            scope = scope + (type.name.value, )
+            return any(self.needs_bounds(member, scope) for _, member in self.bounded_members(type))
+        elif isinstance(type, SimpleTypeReferenceNode):
+            qualified_name = self.symbols.lookup(type, scope)
+            if qualified_name not in self.bounded:
+                # recursive types see False until their members are known
+                self.bounded[qualified_name] = False
+                definition = self.symbols.symbols[qualified_name]
+                if isinstance(definition, TypeDef):
+                    retval = self.needs_bounds(*self.dealias(type, scope))
+                elif isinstance(definition, (Struct, Union, ExceptionDecl)):
+                    retval = any(self.needs_bounds(member, qualified_name) for _, member in self.bounded_members(definition))
+                else:
+                    retval = False
+                self.bounded[qualified_name] = retval
+            return self.bounded[qualified_name]
+        return False
+
+    def begin_bounds(self, qualified_name, member=None):
+        # checks report paths from the IDL name of what they check, so the
+        # validators and the checks fused into the codecs read the same
+        self.bound_name = '::'.join(qualified_name)
+        if member is not None:
+            self.bound_name += '.' + member
+        self.element_paths = {}
+
+    def bound_path(self, expr):
+        if expr in self.element_paths:
+            return self.element_paths[expr]
+        elif expr.startswith('value'):
+            return self.bound_name + expr[5:]
+        return self.bound_name
+
+    def emit_bounds(self, type, expr, depth, deep=True):
+        # straight-line checks with folded bounds; named types are checked
+        # by their own validate_X unless deep is off
+        path = self.bound_path(expr)
+        if isinstance(type, StringType):
+            if type.size is not None:
+                bound = self.evaluate(type.size)
+                self.write('if len(%s) > %d:' % (expr, bound))
+                self.indent()
+                self.write('_bounds.too_long(%r, %d, %s)' % (path, bound, expr))
+                self.dedent()
+        elif isinstance(type, SequenceType):
+            if type.size is not None:
+                bound = self.evaluate(type.size)
+                self.write('if len(%s) > %d:' % (expr, bound))
+                self.indent()
+                self.write('_bounds.too_long(%r, %d, %s)' % (path, bound, expr))
+                self.dedent()
+            if deep and self.needs_bounds(type.type):
+                self.element_paths['e%d' % depth] = path + '[]'
+                self.write('for e%d in %s:' % (depth, expr))
+                self.indent()
+                self.emit_bounds(type.type, 'e%d' % depth, depth + 1, deep)
+                self.dedent()
+        elif isinstance(type, ArrayType):
+            dimension = self.evaluate(type.dimension[0])
+            self.write('if len(%s) != %d:' % (expr, dimension))
+            self.indent()
+            self.write('_bounds.wrong_length(%r, %d, %s)' % (path, dimension, expr))
+            self.dedent()
+            element = type.type
+            if len(type.dimension) > 1:
+                element = ArrayType(type.type, type.dimension[1:])
+            if len(type.dimension) > 1 or deep and self.needs_bounds(element):
+                self.element_paths['e%d' % depth] = path + '[]'
+                self.write('for e%d in %s:' % (depth, expr))
+                self.indent()
+                self.emit_bounds(element, 'e%d' % depth, depth + 1, deep)
+                self.dedent()
+        elif deep and self.needs_bounds(type):
+            self.write('%s(%s)' % (self.codec_reference(type, 'validate_%s'), expr))
+
+    def inherited_fields(self, node, scope):
+        if node.super is None:
+            return []
+        qualified_name = self.symbols.lookup(node.super, scope)
+        definition = self.symbols.symbols[qualified_name]
+        if not isinstance(definition, ValueType):
+            return []
+        return self.inherited_fields(definition, qualified_name[:-1]) + \
+            [field for field, _ in self.expand_members(definition.body or [])]
+
+    def emit_value_class(self, name, base, fields, own_fields=None):
+        if own_fields is None:
+            own_fields = fields
+        self.write('class %s(%s):' % (name, base))
+        self.indent()
+        self.write('__slots__ = (%s)' % ''.join('%r, ' % field for field in own_fields).rstrip(' '))
+        self.write('_fields = (%s)' % ''.join('%r, ' % field for field in fields).rstrip(' '))
+        self.write()
+        self.write('def __init__(%s):' % ', '.join(['self'] + fields))
+        self.indent()
+        if base == 'Exception':
+            self.write('Exception.__init__(%s)' % ', '.join(['self'] + fields))
+        for field in fields:
+            self.write('self.%s = %s' % (field, field))
+        if not fields and base != 'Exception':
+            self.write('pass')
+        self.dedent()
+        self.write()
+        self.write('def __eq__(self, other):')
+        self.indent()
+        self.write('return %s' % ' and '.join(
+            ['self.__class__ is other.__class__'] +
+            ['self.%s == other.%s' % (field, field) for field in fields]))
+        self.dedent()
+        self.write()
+        self.write('def __ne__(self, other):')
+        self.indent()
+        self.write('return not self == other')
+        self.dedent()
+        self.write()
+        self.write('def __hash__(self):')
+        self.indent()
+        if fields:
+            self.add_import('from pyomgidl.runtime import values as _values')
+            self.write('return hash(_values.hashable((%s)))' % ''.join('self.%s, ' % field for field in fields).rstrip(' '))
+        else:
+            self.write('return hash(())')
+        self.dedent()
+        self.write()
+        self.write('def __repr__(self):')
+        self.indent()
+        self.write('return %r %% (%s)' % (
+            '%s(%s)' % (name, ', '.join('%s=%%r' % field for field in fields)),
+            ''.join('self.%s, ' % field for field in fields).rstrip(' ')))
+        self.dedent()
+        self.dedent()
+        self.write()
+
+    def emit_enum_class(self, name, enumerators, constants):
+        if not self.buffer.define(name):
+            return
+        self.write('class %s(int):' % name)
+        self.indent()
+        self.write('__slots__ = ()')
+        self.write('_names = (%s)' % ''.join('%r, ' % enumerator for enumerator in enumerators).rstrip(' '))
+        self.write()
+        self.write('def __repr__(self):')
+        self.indent()
+        self.write('return %r + self._names[self]' % (name + '.'))
+        self.dedent()
+        self.write()
+        self.write('@classmethod')
+        self.write('def from_name(cls, name):')
+        self.indent()
+        self.write('return cls._by_name[name]')
+        self.dedent()
+        self.write()
+        self.write('@classmethod')
+        self.write('def from_ordinal(cls, ordinal):')
+        self.indent()
+        self.write('return cls._values[ordinal]')
+        self.dedent()
+        self.dedent()
+        self.write()
+        self.write('%s._values = (%s)' % (name, ''.join('%s(%d), ' % (name, i) for i in range(len(enumerators))).rstrip(' ')))
+        self.write('%s._by_name = dict(zip(%s._names, %s._values))' % (name, name, name))
+        for i, (enumerator, constant) in enumerate(zip(enumerators, constants)):
+            self.write('%s = %s.%s = %s._values[%d]' % (constant, name, python_identifier(enumerator), name, i))
+            self.export(constant)
+        self.write()
+
+    def visit_enum(self, node):
+        super(ValueGenerator, self).visit_enum(node)
+        self.enum_names[id(node)] = self.current_scope + (node.name.value, )
+        name = self.local_name(self.enum_names[id(node)])
+        enumerators = [enumerator.value for enumerator in node.enumerators]
+        self.begin_definition(name)
+        self.emit_enum_class(name, enumerators, [python_identifier(self.local_name(self.current_scope + (enumerator, ))) for enumerator in enumerators])
+        self.end_definition()
+
+    def begin_value(self, node, base):
+        name = self.local_name(self.current_scope)
+        self.begin_definition(name)
+        if self.buffer.define(name):
+            self.emit_value_class(name, base, [field for field, _ in self.expand_members(node.members)])
+        return name
+
+    def visit_struct(self, node):
+        super(ValueGenerator, self).visit_struct(node)
+        self.begin_value(node, 'object')
+
+    def depart_struct(self, node):
+        self.end_definition()
+        super(ValueGenerator, self).depart_struct(node)
+
+    def visit_except_decl(self, node):
+        super(ValueGenerator, self).visit_except_decl(node)
+        self.begin_value(node, 'Exception')
+
+    def depart_except_decl(self, node):
+        self.end_definition()
+        super(ValueGenerator, self).depart_except_decl(node)
+
+    def visit_union(self, node):
+        super(ValueGenerator, self).visit_union(node)
+        name = self.local_name(self.current_scope)
+        self.begin_definition(name)
+        if not self.buffer.define(name):
+            return
+        self.emit_value_class(name, 'object', ['_d', '_v'])
+        branches = []
+        default = None
+        for case in node.cases:
+            branch = python_identifier(declarator_name(case.declarator))
+            for value in case.values:
+                if value is None:
+                    default = branch
+                else:
+                    branches.append('%r: %r' % (value, branch))
+        self.write('%s._branches = {%s}' % (name, ', '.join(branches)))
+        self.write('%s._default = %r' % (name, default))
+        self.write()
+
+    def depart_union(self, node):
+        self.end_definition()
+        super(ValueGenerator, self).depart_union(node)
+
+    def visit_value_type(self, node):
+        super(ValueGenerator, self).visit_value_type(node)
+        if node.body is None:
+            return
+        name = self.local_name(self.current_scope)
+        self.begin_definition(name)
+        base = 'object'
+        if node.super is not None:
+            base = self.reference(node.super)
+        own_fields = [field for field, _ in self.expand_members(node.body)]
+        if self.buffer.define(name):
+            self.emit_value_class(name, base, self.inherited_fields(node, self.current_scope[:-1]) + own_fields, own_fields)
+
+    def depart_value_type(self, node):
+        if node.body is not None:
+            self.end_definition()
+        super(ValueGenerator, self).depart_value_type(node)
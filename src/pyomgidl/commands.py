@@ -1,4 +1,240 @@
-from pyomgidl.parser import parser, lexer
-from ply.cpp import Preprocessor
+import os
+import sys
+import time
+import hashlib
+import cPickle as pickle
+from multiprocessing import Pool
+from argparse import ArgumentParser
+from pyomgidl.reader import parse_into_ast, IDLSyntaxError
+from pyomgidl.reader.tree import Specification
+from pyomgidl.reader.memory import definition_name
+from pyomgidl.codegen import *
 
-def 
+__all__ = [
+    'BACKENDS',
+    'argument_parser',
+    'compile_file',
+    'parse_files',
+    'generate',
+    'run',
+    'merge_specifications',
+    'write_depfile',
+    'main',
+    ]
+
+BACKENDS = {
+    'interfaces': InterfaceGenerator,
+    'values': ValueGenerator,
+    'cdr': CDRGenerator,
+    'json': JSONGenerator,
+    'validators': ValidatorGenerator,
+    'aio': AsyncStubGenerator,
+    'skeletons': SkeletonGenerator,
+    'typecodes': TypeCodeGenerator,
+    }
+
+# bumped whenever the pickled trees change shape
+CACHE_VERSION = 1
+
+def find_sources(paths):
+    retval = []
+    for path in paths:
+        if not os.path.isdir(path):
+            retval.append(path)
+            continue
+        for dir, dirs, files in os.walk(path):
+            dirs.sort()
+            retval.extend(os.path.join(dir, name) for name in sorted(files) if name.endswith('.idl'))
+    return retval
+
+def fingerprint(paths):
+    retval = []
+    for path in paths:
+        st = os.stat(path)
+        retval.append((os.path.abspath(path), st.st_mtime, st.st_size))
+    return retval
+
+def cache_path(cache_dir, path, webidl, include_path, defines):
+    key = repr((CACHE_VERSION, sys.version_info[:2], os.path.abspath(path), webidl,
+                [os.path.abspath(dir) for dir in include_path], list(defines)))
+    return os.path.join(cache_dir, hashlib.sha1(key).hexdigest() + '.pickle')
+
+def load_cached(path):
+    # (dependencies, spec), or None if a dependency changed since. a
+    # header added to an earlier include directory goes unnoticed
+    try:
+        with open(path, 'rb') as f:
+            fingerprints, dependencies, spec = pickle.load(f)
+        if fingerprint(dependencies) != fingerprints:
+            return None
+    except (EnvironmentError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+    return dependencies, spec
+
+def store_cached(path, dependencies, spec):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    temp = '%s.%d' % (path, os.getpid())
+    with open(temp, 'wb') as f:
+        pickle.dump((fingerprint(dependencies), dependencies, spec), f, pickle.HIGHEST_PROTOCOL)
+    os.rename(temp, path)
+
+def compile_file(path, webidl=False, include_path=(), defines=(), cache_dir=None, timings=False, parse=parse_into_ast):
+    # parses a single file into (spec, dependencies, error, stats, cached);
+    # spec is None when error is set
+    cache = cache_dir and cache_path(cache_dir, path, webidl, include_path, defines)
+    if cache:
+        cached = load_cached(cache)
+        if cached is not None:
+            return cached[1], cached[0], None, None, True
+    dependencies = [path]
+    try:
+        with open(path) as f:
+            spec = parse(f, path, webidl=webidl, stats=timings, include_path=include_path,
+                         defines=defines, dependencies=dependencies)
+    except IDLSyntaxError as e:
+        # the preprocessor tells which file, included or not, it failed in
+        return None, dependencies, '%s: %s' % (getattr(e, 'source', None) or path, e), None, False
+    except EnvironmentError as e:
+        return None, dependencies, '%s: %s' % (path, e.strerror or e), None, False
+    stats = spec.__dict__.pop('stats', None)
+    if cache:
+        try:
+            store_cached(cache, dependencies, spec)
+        except EnvironmentError:
+            pass
+    return spec, dependencies, None, stats, False
+
+def compile_task(args):
+    path, kwargs = args
+    # (path, spec, dependencies, error, stats, cached, seconds)
+    start = time.time()
+    retval = compile_file(path, **kwargs)
+    return (path, ) + retval + (time.time() - start, )
+
+def merge_specifications(specs):
+    # the definitions of every spec in one; a definition that several
+    # files pulled in from the same header is kept once
+    definitions = []
+    seen = {}
+    for spec in specs:
+        for definition in spec.definitions:
+            same = seen.setdefault((definition.__class__, definition_name(definition)), [])
+            if any(definition == other for other in same):
+                continue
+            same.append(definition)
+            definitions.append(definition)
+    return Specification(definitions)
+
+def escape_make(path):
+    return path.replace('$', '$$').replace(' ', '\\ ').replace('#', '\\#')
+
+def write_depfile(f, target, sources, dependencies):
+    # make rules in the form gcc -MD -MP writes them: one for the target
+    # and an empty one for every header so that removing it is no error
+    headers = [path for path in dependencies if path not in sources]
+    f.write('%s:' % escape_make(target))
+    for path in sources + headers:
+        f.write(' \\\n  %s' % escape_make(path))
+    f.write('\n')
+    for path in headers:
+        f.write('\n%s:\n' % escape_make(path))
+
+def report_timings(out, results, phases):
+    out.write('%-40s %6s %10s %10s %10s %10s %8s %10s\n' % (
+        'file', 'cache', 'preprocess', 'lex', 'parse', 'build', 'tokens', 'total (ms)'))
+    for path, spec, dependencies, error, stats, cached, seconds in results:
+        row = [path, cached and 'hit' or 'miss']
+        if stats is None:
+            row.extend(['-'] * 5)
+        else:
+            row.extend(phase in stats.phases and '%.2f' % (stats.phases[phase][0] * 1000) or '-'
+                       for phase in ('preprocess', 'lex', 'parse', 'build'))
+            row.append(str(sum(stats.tokens.values())))
+        row.append('%.2f' % (seconds * 1000))
+        out.write('%-40s %6s %10s %10s %10s %10s %8s %10s\n' % tuple(row))
+    out.write('\n')
+    for phase, seconds in phases:
+        out.write('%-40s %10.2f\n' % (phase + ' (ms)', seconds * 1000))
+
+def argument_parser():
+    argparser = ArgumentParser(prog='pyomgidl', description='Compiles OMG IDL into Python modules')
+    argparser.add_argument('idl', nargs='+', help='IDL files, or directories to look for *.idl in')
+    argparser.add_argument('-o', '--output', help='base directory of the generated modules (default: standard output)')
+    argparser.add_argument('-b', '--backend', choices=sorted(BACKENDS), default='interfaces')
+    argparser.add_argument('-I', dest='include_path', action='append', default=[], metavar='DIR')
+    argparser.add_argument('-D', dest='defines', action='append', default=[], metavar='NAME[=VALUE]')
+    argparser.add_argument('--webidl', action='store_true')
+    argparser.add_argument('--prefix', help='package the generated modules go into')
+    argparser.add_argument('--lazy', action='store_true', help='one module per definition, imported on first use')
+    argparser.add_argument('-j', '--jobs', type=int, default=1, help='files parsed in parallel')
+    argparser.add_argument('--cache-dir', help='keeps parsed files here between runs')
+    argparser.add_argument('--depfile', help='writes the files read as make rules to this file')
+    argparser.add_argument('--depfile-target', help='target of the make rule (default: the output directory)')
+    argparser.add_argument('--timings', action='store_true', help='reports the time spent by phase and by file')
+    return argparser
+
+def parse_files(sources, options):
+    # a compile_task result for every source
+    kwargs = dict(webidl=options.webidl, include_path=options.include_path, defines=options.defines,
+                  cache_dir=options.cache_dir, timings=options.timings)
+    tasks = [(path, kwargs) for path in sources]
+    if options.jobs > 1 and len(tasks) > 1:
+        pool = Pool(min(options.jobs, len(tasks)))
+        try:
+            return pool.map(compile_task, tasks)
+        finally:
+            pool.terminate()
+    return map(compile_task, tasks)
+
+def generate(specs, options, phases):
+    # the output the backend rendered the specs into, not yet committed
+    start = time.time()
+    spec = merge_specifications(specs)
+    phases.append(('merge', time.time() - start))
+    if options.output is not None:
+        output = FileTreeOutput(options.output, options.jobs)
+    else:
+        output = StreamOutput(sys.stdout)
+    start = time.time()
+    BACKENDS[options.backend](prefix=options.prefix, lazy=options.lazy, output=output)(spec)
+    phases.append(('generate', time.time() - start))
+    return output
+
+def run(options, parse_files=parse_files, generate=generate):
+    phases = []
+    start = time.time()
+    sources = find_sources(options.idl)
+    results = parse_files(sources, options)
+    phases.append(('parse', time.time() - start))
+
+    errors = [error for _, _, _, error, _, _, _ in results if error is not None]
+    dependencies = []
+    for _, _, paths, _, _, _, _ in results:
+        dependencies.extend(path for path in paths if path not in dependencies)
+
+    if not errors:
+        try:
+            output = generate([spec for _, spec, _, _, _, _, _ in results], options, phases)
+            start = time.time()
+            output.commit()
+            phases.append(('write', time.time() - start))
+        except (IDLSyntaxError, CodegenError) as e:
+            errors.append(str(e))
+        except EnvironmentError as e:
+            errors.append('%s: %s' % (e.filename, e.strerror))
+
+    if options.depfile:
+        with open(options.depfile, 'w') as f:
+            write_depfile(f, options.depfile_target or options.output or options.depfile, sources, dependencies)
+    if options.timings:
+        report_timings(sys.stderr, results, phases)
+    for error in errors:
+        sys.stderr.write('%s\n' % error)
+    return errors and 1 or 0
+
+def main(argv=sys.argv[1:]):
+    return run(argument_parser().parse_args(argv))
+
+if __name__ == '__main__':
+    sys.exit(main())
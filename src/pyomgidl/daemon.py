@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import socket
+import traceback
+from collections import OrderedDict
+import ply.cpp
+import ply.lex
+from StringIO import StringIO
+from argparse import ArgumentParser
+from SocketServer import UnixStreamServer, StreamRequestHandler
+from pyomgidl.reader import lexer, parser, preprocess, count_nodes, ParseStats
+from pyomgidl.commands import argument_parser, compile_file, fingerprint, generate, run
+from pyomgidl.client import default_socket
+
+__all__ = [
+    'FileCache',
+    'CompileServer',
+    'main',
+    ]
+
+class FileCache(object):
+    # contents of the files read through it, as long as their mtime and
+    # size stay the same
+    def __init__(self):
+        self.files = {}
+
+    def read(self, path):
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise IOError(e.errno, e.strerror, path)
+        entry = self.files.get(path)
+        if entry is None or entry[:2] != (st.st_mtime, st.st_size):
+            with open(path) as f:
+                entry = self.files[path] = (st.st_mtime, st.st_size, f.read())
+        return entry[2]
+
+    def poll(self):
+        for path, entry in self.files.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is None or entry[:2] != (st.st_mtime, st.st_size):
+                self.files.pop(path, None)
+
+class RequestHandler(StreamRequestHandler):
+    def setup(self):
+        # requests are served one at a time, so a client that stalls is
+        # dropped rather than waited for
+        self.timeout = self.server.request_timeout
+        StreamRequestHandler.setup(self)
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except (ValueError, socket.error):
+            return
+        try:
+            self.wfile.write(json.dumps(self.server.dispatch(request)) + '\n')
+        except socket.error:
+            pass
+
+def decoded(value):
+    return isinstance(value, unicode) and value or value.decode('utf-8', 'replace')
+
+class CompileServer(UnixStreamServer):
+    # runs pyomgidl commands sent by pyomgidl-client, one at a time, with
+    # the lexers and parsers built once and the parsed files, the files
+    # they include and the generated modules kept between requests. the
+    # files parsed are polled for changes whenever the server is idle for
+    # poll_interval seconds, and checked again before they are reused. at
+    # most max_entries specs and outputs each are kept, the least recently
+    # used going first. a client gets request_timeout seconds to send its
+    # request and to read the response
+    def __init__(self, path, poll_interval=1.0, max_entries=256, request_timeout=10.0):
+        # the socket is created private rather than made so after binding
+        mask = os.umask(0177)
+        try:
+            UnixStreamServer.__init__(self, path, RequestHandler)
+        finally:
+            os.umask(mask)
+        self.timeout = poll_interval
+        self.request_timeout = request_timeout
+        self.running = True
+        self.polled = time.time()
+        self.files = FileCache()
+        self.cpp_lexer = ply.lex.lex(ply.cpp)
+        self.lexer = lexer()
+        self.parsers = {}
+        self.max_entries = max_entries
+        # (cwd, file, options) -> (fingerprints, dependencies, spec)
+        self.specs = OrderedDict()
+        # (cwd, options) -> (specs, output)
+        self.outputs = OrderedDict()
+
+    def serve(self):
+        while self.running:
+            self.handle_request()
+            if time.time() - self.polled >= self.timeout:
+                self.poll()
+
+    def handle_timeout(self):
+        self.poll()
+
+    def poll(self):
+        for key, (fingerprints, _, _) in self.specs.items():
+            if not self.unchanged(fingerprints):
+                self.specs.pop(key, None)
+        self.files.poll()
+        self.polled = time.time()
+
+    def lookup(self, cache, key):
+        entry = cache.pop(key, None)
+        if entry is not None:
+            cache[key] = entry
+        return entry
+
+    def store(self, cache, key, entry):
+        cache.pop(key, None)
+        cache[key] = entry
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def unchanged(self, fingerprints):
+        try:
+            return fingerprint(path for path, _, _ in fingerprints) == fingerprints
+        except OSError:
+            return False
+
+    def dispatch(self, request):
+        command = request.get('command')
+        if command == 'compile':
+            return self.compile([arg.encode('utf-8') for arg in request.get('argv', [])],
+                                request.get('cwd') or '/')
+        elif command == 'stop':
+            self.running = False
+            return {'status': 0}
+        return {'status': 2, 'stderr': 'Unknown command: %r\n' % (command, )}
+
+    def compile(self, argv, cwd):
+        # runs the command as pyomgidl would, in cwd and with its output
+        # captured
+        stdout, stderr, previous = sys.stdout, sys.stderr, os.getcwd()
+        sys.stdout, sys.stderr = out, err = StringIO(), StringIO()
+        try:
+            os.chdir(cwd)
+            status = run(argument_parser().parse_args(argv), self.parse_files, self.generate)
+        except SystemExit as e:
+            status = e.code is None and 0 or isinstance(e.code, int) and e.code or 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            os.chdir(previous)
+        return {'status': status, 'stdout': decoded(out.getvalue()), 'stderr': decoded(err.getvalue())}
+
+    def parse_files(self, sources, options):
+        # as commands.parse_files, in this process; -j only applies to
+        # writing the output
+        retval = []
+        cwd = os.getcwd()
+        for path in sources:
+            start = time.time()
+            key = (cwd, path, options.webidl, tuple(options.include_path), tuple(options.defines))
+            entry = self.lookup(self.specs, key)
+            if entry is not None and self.unchanged(entry[0]):
+                retval.append((path, entry[2], entry[1], None, None, True, time.time() - start))
+                continue
+            spec, dependencies, error, stats, cached = compile_file(
+                path, options.webidl, options.include_path, options.defines, options.cache_dir,
+                options.timings, self.parse)
+            if error is None:
+                try:
+                    self.store(self.specs, key, (fingerprint(dependencies), dependencies, spec))
+                except OSError:
+                    self.specs.pop(key, None)
+            retval.append((path, spec, dependencies, error, stats, cached, time.time() - start))
+        return retval
+
+    def parse(self, f, source=None, webidl=False, stats=None, include_path=(), defines=(), dependencies=None):
+        # parse_into_ast with the warm lexers and parser. the grammar
+        # actions are shared between requests, so they are not timed
+        if stats is True:
+            stats = ParseStats()
+        if stats:
+            stats.begin('preprocess')
+        text = preprocess(f, source, stats or None, include_path, defines, dependencies,
+                          self.files, self.cpp_lexer.clone())
+        if stats:
+            stats.end('preprocess')
+            stats.begin('parse')
+        yacc = self.parsers.get(webidl)
+        if yacc is None:
+            yacc = self.parsers[webidl] = parser(webidl=webidl)
+        lex = self.lexer.clone()
+        lex.webidl = webidl
+        lex.pragma = {}
+        lex.input(text)
+        retval = yacc.parse(lexer=lex, tokenfunc=stats and stats.counting_lexer(lex) or None)
+        if stats:
+            stats.end('parse')
+            count_nodes(retval, stats.nodes)
+            retval.stats = stats
+        return retval
+
+    def generate(self, specs, options, phases):
+        # the files are rendered again only when some spec was parsed
+        # again; writing them still checks what is on disk
+        if options.output is None:
+            return generate(specs, options, phases)
+        key = (os.getcwd(), options.output, options.backend, options.prefix, options.lazy, options.jobs)
+        entry = self.lookup(self.outputs, key)
+        if entry is not None and len(entry[0]) == len(specs) and \
+                all(spec is other for spec, other in zip(specs, entry[0])):
+            return entry[1]
+        output = generate(specs, options, phases)
+        self.store(self.outputs, key, (specs, output))
+        return output
+
+def main(argv=sys.argv[1:]):
+    argparser = ArgumentParser(prog='pyomgidl-daemon', description='Serves pyomgidl-client with warm caches')
+    argparser.add_argument('--socket', default=default_socket(), help='path of the Unix socket to listen on')
+    argparser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between checks for changed files')
+    argparser.add_argument('--max-entries', type=int, default=256, help='parsed files and outputs kept, each')
+    argparser.add_argument('--request-timeout', type=float, default=10.0, help='seconds a client may stall while sending a request or reading the response')
+    options = argparser.parse_args(argv)
+
+    if os.path.exists(options.socket):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(options.socket)
+        except socket.error:
+            # left behind by a daemon that did not exit cleanly
+            os.unlink(options.socket)
+        else:
+            argparser.error('A daemon is already listening on %s' % options.socket)
+        finally:
+            probe.close()
+    server = CompileServer(options.socket, options.poll_interval, options.max_entries, options.request_timeout)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(options.socket)
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,34 @@ from pyomgidl.reader.lexer import *
 from pyomgidl.reader.parser import *
 from pyomgidl.reader.tree import pp
 from pyomgidl.reader.preprocessor import preprocess
+from pyomgidl.reader.resolver import *
+from pyomgidl.reader.stats import *
+from pyomgidl.reader.memory import *
 from pyomgidl.reader.exceptions import *
 
 def initializePLY():
     lexer()
     parser()
 
-def parse_into_ast(f, source=None, webidl=False, **kwargs):
-    return parser(webidl=webidl).parse(preprocess(f, source), lexer(webidl=webidl))
+def parse_into_ast(f, source=None, webidl=False, stats=None, profile=None,
+                   include_path=(), defines=(), dependencies=None, **kwargs):
+    if not stats:
+        text = preprocess(f, source, None, include_path, defines, dependencies)
+        return parser(webidl=webidl, profile=profile).parse(text, lexer(webidl=webidl))
+    # stats=True or a ParseStats to accumulate into; it ends up in the
+    # stats attribute of the Specification
+    if stats is True:
+        stats = ParseStats()
+    stats.begin('preprocess')
+    text = preprocess(f, source, stats, include_path, defines, dependencies)
+    stats.end('preprocess')
+    stats.begin('parse')
+    yacc = parser(webidl=webidl, profile=profile)
+    stats.count_reductions(yacc)
+    lex = lexer(webidl=webidl)
+    lex.input(text)
+    retval = yacc.parse(lexer=lex, tokenfunc=stats.counting_lexer(lex))
+    stats.end('parse')
+    count_nodes(retval, stats.nodes)
+    retval.stats = stats
+    return retval
@@ -16,3 +16,6 @@ class IDLSyntaxError(Exception):
 
     def __init__(self, message, lineno=None):
         super(IDLSyntaxError, self).__init__(message, lineno)
+
+class IDLNameError(IDLSyntaxError):
+    pass
@@ -61,3 +61,9 @@ class INodeVisitor(Interface):
     def visit_const_decl(node):
         pass
 
+    def visit_except_decl(node):
+        pass
+
+    def depart_except_decl(node):
+        pass
+
@@ -101,6 +101,7 @@ tokens = [
     'TOK_LPAREN',
     'TOK_RPAREN',
     'TOK_CARET',
+    'TOK_PIPE',
     'TOK_AMPERSAND',
     'TOK_PLUS',
     'TOK_MINUS',
@@ -140,6 +141,7 @@ t_TOK_RBRACE = r'\}'
 t_TOK_LPAREN = r'\('
 t_TOK_RPAREN = r'\)'
 t_TOK_CARET = r'\^'
+t_TOK_PIPE = r'\|'
 t_TOK_AMPERSAND = r'&'
 t_TOK_PLUS = r'\+'
 t_TOK_MINUS = r'-'
@@ -0,0 +1,141 @@
+import sys
+from functools import wraps
+from pyomgidl.reader.lexer import lexer
+from pyomgidl.reader.parser import parser
+from pyomgidl.reader.tree import *
+from pyomgidl.reader.resolver import declarator_name
+from pyomgidl.reader.stats import rebind_actions
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+__all__ = [
+    'MemoryReport',
+    'measure_memory',
+    'trace_actions',
+    ]
+
+GLOBAL = '<global>'
+SYMBOLS = '<symbols>'
+
+LEAVES = (basestring, int, long, float)
+
+def definition_name(node):
+    if isinstance(node, TypeDef):
+        return ','.join(declarator_name(declarator) for declarator in node.declarators)
+    name = getattr(node, 'name', None)
+    return isinstance(name, Identifier) and name.value or node.__class__.__name__
+
+class MemoryReport(object):
+    # shallow sizes of everything a Specification retains. each object is
+    # counted once, where it is first reached, so identifiers shared
+    # between nodes are not counted twice; lists, dicts and strings are
+    # charged to the node holding them
+    def __init__(self):
+        self.total = 0
+        self.objects = 0
+        self.by_class = {}
+        self.by_module = {}
+        self.by_definition = {}
+
+    def add(self, size, owner, module, definition):
+        self.total += size
+        self.objects += 1
+        for table, key in ((self.by_class, owner), (self.by_module, module), (self.by_definition, definition)):
+            entry = table.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += size
+
+    def report(self, out=sys.stdout, limit=20):
+        out.write('%d objects, %d octets\n' % (self.objects, self.total))
+        for title, table in (('node class', self.by_class), ('module', self.by_module),
+                             ('definition', self.by_definition)):
+            out.write('\n%-48s %10s %12s %7s\n' % (title, 'objects', 'octets', 'share'))
+            for key, (count, size) in sorted(table.items(), key=lambda item: (-item[1][1], item[0]))[:limit]:
+                out.write('%-48s %10d %12d %6.1f%%\n' % (key, count, size, size * 100.0 / (self.total or 1)))
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'objects': self.objects,
+            'by_class': self.by_class,
+            'by_module': self.by_module,
+            'by_definition': self.by_definition,
+            }
+
+def measure_memory(spec, symbols=None):
+    # symbols is the SymbolTable built from spec, if it is kept as well
+    retval = MemoryReport()
+    seen = set()
+    # (object, owning node class, module, top-level definition)
+    pending = [(spec, None, GLOBAL, GLOBAL)]
+    while pending:
+        value, owner, module, definition = pending.pop()
+        if id(value) in seen or value is None or isinstance(value, bool):
+            continue
+        seen.add(id(value))
+        if isinstance(value, ASTNode):
+            owner = value.__class__.__name__
+            retval.add(sys.getsizeof(value) + sys.getsizeof(value.__dict__), owner, module, definition)
+            if isinstance(value, DefinitionContainer):
+                if isinstance(value, Module):
+                    module = module == GLOBAL and value.name.value or '%s::%s' % (module, value.name.value)
+                    definition = module
+                for child in value.definitions:
+                    # modules are containers; anything else in one is a
+                    # top-level definition
+                    name = isinstance(child, Module) and definition or \
+                        (module == GLOBAL and definition_name(child) or '%s::%s' % (module, definition_name(child)))
+                    pending.append((child, owner, module, name))
+            for name, child in value.__dict__.items():
+                if name != 'definitions' or not isinstance(value, DefinitionContainer):
+                    pending.append((child, owner, module, definition))
+        elif isinstance(value, (list, tuple)):
+            retval.add(sys.getsizeof(value), owner, module, definition)
+            pending.extend((child, owner, module, definition) for child in value)
+        elif isinstance(value, dict):
+            retval.add(sys.getsizeof(value), owner, module, definition)
+            pending.extend((child, owner, module, definition) for child in value.values())
+        elif isinstance(value, LEAVES):
+            retval.add(sys.getsizeof(value), owner, module, definition)
+    if symbols is not None:
+        # its dict and qualified names; the nodes it maps them to are
+        # those of spec
+        retval.add(sys.getsizeof(symbols.symbols), 'SymbolTable', GLOBAL, SYMBOLS)
+        for qualified_name in symbols.symbols:
+            for value in (qualified_name, ) + qualified_name:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    retval.add(sys.getsizeof(value), 'SymbolTable', GLOBAL, SYMBOLS)
+    return retval
+
+def trace_actions(text, webidl=False):
+    # parses text and returns the Specification along with, by grammar
+    # action, [calls, octets] of memory the action left allocated
+    if tracemalloc is None:
+        raise RuntimeError('tracemalloc is not available')
+    retval = {}
+    def traced(action):
+        entry = retval.setdefault(action.__name__, [0, 0])
+        @wraps(action)
+        def wrapper(p):
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                return action(p)
+            finally:
+                entry[0] += 1
+                entry[1] += tracemalloc.get_traced_memory()[0] - before
+        return wrapper
+    yacc = parser(webidl=webidl)
+    rebind_actions(yacc, traced)
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        spec = yacc.parse(text, lexer=lexer(webidl=webidl))
+    finally:
+        if started:
+            tracemalloc.stop()
+    return spec, retval
@@ -239,6 +239,7 @@ def p_struct_type(p):
     '''
     struct_type : modifiers_and_props TOK_STRUCT z_ident_catch TOK_LBRACE struct_member_list TOK_RBRACE
     ''' 
+    p[0] = Struct(name=p[3], members=p[5], properties=p[1][1])
 
 def p_valuetype_decl(p):
     '''
@@ -255,9 +256,9 @@ def p_z_value_inheritance_spec(p):
 
 def p_value_inheritance_spec(p):
     '''
-    value_inheritance_spec : type_spec
+    value_inheritance_spec : TOK_COLON type_spec
     '''
-    p[0] = p[1]
+    p[0] = p[2]
 
 def p_z_valuetype_body(p):
     '''
@@ -276,7 +277,7 @@ def p_valuetype_member_list(p):
     else:
         if p[2] is not None:
             p[1].append(p[2])
-            p[0] = p[1]
+        p[0] = p[1]
 
 def p_valuetype_member(p):
     '''
@@ -294,6 +295,7 @@ def p_union_type(p):
     '''
     union_type : modifiers_and_props TOK_UNION z_ident_catch TOK_SWITCH TOK_LPAREN switch_type_spec TOK_RPAREN TOK_LBRACE switch_body TOK_RBRACE
     '''
+    p[0] = Union(name=p[3], discriminator=p[6], cases=p[9], properties=p[1][1])
 
 def p_switch_type_spec(p):
     '''
@@ -309,40 +311,55 @@ def p_switch_body(p):
     '''
     switch_body : case_stmt_list
     '''
+    p[0] = p[1]
 
 def p_case_stmt_list(p):
     '''
     case_stmt_list : case_stmt
         | case_stmt_list case_stmt
     '''
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[2])
+        p[0] = p[1]
 
 def p_case_stmt(p):
     '''
     case_stmt : case_label_list element_spec TOK_SEMICOLON
     '''
+    p[0] = Case(labels=p[1], type=p[2][0], declarator=p[2][1])
 
 def p_element_spec(p):
     '''
     element_spec : type_spec declarator
     '''
+    p[0] = (p[1], p[2])
 
 def p_case_label_list(p):
     '''
     case_label_list : case_label
         | case_label_list case_label
     '''
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[2])
+        p[0] = p[1]
 
 def p_case_label(p):
     '''
-    case_label : TOK_CASE const_exp ':'
-        | TOK_DEFAULT ':'
+    case_label : TOK_CASE const_exp TOK_COLON
+        | TOK_DEFAULT TOK_COLON
     '''
+    # the default label is represented by None
+    p[0] = len(p) == 4 and p[2] or None
 
 def p_const_decl(p):
     '''
     const_decl : modifiers_and_props TOK_CONST const_type ident TOK_EQUAL const_exp
     '''
-    p[0] = ConstDecl(name=p[4], type=p[3], value=p[6], properties=p[1])
+    p[0] = ConstDecl(name=p[4], type=p[3], value=p[6], properties=p[1][1])
 
 def p_except_decl(p):
     '''
@@ -674,6 +691,7 @@ def p_const_type(p):
         | fixed_pt_const_type
         | scoped_name
     '''
+    p[0] = p[1]
 
 def p_const_exp(p):
     '''
@@ -684,12 +702,12 @@ def p_const_exp(p):
 def p_or_expr(p):
     '''
     or_expr : xor_expr
-        | or_expr '|' xor_expr
+        | or_expr TOK_PIPE xor_expr
     '''
     if len(p) == 2:
         p[0] = p[1]
     else:
-        p[0] = OrOp(p[0], p[2])
+        p[0] = OrOp(p[1], p[3])
 
 def p_xor_expr(p):
     '''
@@ -699,7 +717,7 @@ def p_xor_expr(p):
     if len(p) == 2:
         p[0] = p[1]
     else:
-        p[0] = XorOp(p[0], p[2])
+        p[0] = XorOp(p[1], p[3])
 
 def p_and_expr(p):
     '''
@@ -709,7 +727,7 @@ def p_and_expr(p):
     if len(p) == 2:
         p[0] = p[1]
     else:
-        p[0] = AndOp(p[0], p[2])
+        p[0] = AndOp(p[1], p[3])
 
 def p_shift_expr(p):
     '''
@@ -721,23 +739,23 @@ def p_shift_expr(p):
         p[0] = p[1]
     else:
         if p[2] == '>>':
-            p[0] = RightShiftOp(p[0], p[2])
+            p[0] = RightShiftOp(p[1], p[3])
         else:
-            p[0] = LeftShiftOp(p[0], p[2])
+            p[0] = LeftShiftOp(p[1], p[3])
 
 def p_add_expr(p):
     '''
     add_expr : mult_expr
-        | add_expr '+' mult_expr
-        | add_expr '-' mult_expr
+        | add_expr TOK_PLUS mult_expr
+        | add_expr TOK_MINUS mult_expr
     '''
     if len(p) == 2:
         p[0] = p[1]
     else:
         if p[2] == '+':
-            p[0] = AddOp(p[0], p[2])
+            p[0] = AddOp(p[1], p[3])
         else:
-            p[0] = SubOp(p[0], p[2])
+            p[0] = SubOp(p[1], p[3])
 
 def p_mult_expr(p):
     '''
@@ -750,11 +768,11 @@ def p_mult_expr(p):
         p[0] = p[1]
     else:
         if p[2] == '*':
-            p[0] = MulOp(p[0], p[2])
-        elif [2] == '/':
-            p[0] = DivOp(p[0], p[2])
+            p[0] = MulOp(p[1], p[3])
+        elif p[2] == '/':
+            p[0] = DivOp(p[1], p[3])
         else:
-            p[0] = ModOp(p[0], p[2])
+            p[0] = ModOp(p[1], p[3])
 
 def p_unary_expr(p):
     '''
@@ -776,7 +794,7 @@ def p_unary_op(p):
         p[0] = NegateOp
     elif p[1] == '+':
         p[0] = PlusOp
-    elif p[2] == '~':
+    elif p[1] == '~':
         p[0] = InvertOp
 
 def p_primary_expr(p):
@@ -805,6 +823,7 @@ def p_enum_type(p):
     '''
     enum_type : modifiers_and_props TOK_ENUM z_ident_catch TOK_LBRACE enumerator_list TOK_RBRACE
     '''
+    p[0] = Enum(name=p[3], enumerators=p[5], properties=p[1][1])
 
 def p_scoped_name(p):
     '''
@@ -848,7 +867,7 @@ def p_enumerator_list(p):
         | enumerator_list TOK_COMMA ident
     '''
     if len(p) == 2:
-        p[0] = p[1]
+        p[0] = [p[1]]
     else:
         p[1].append(p[3])
         p[0] = p[1]
@@ -898,7 +917,7 @@ def p_sequence_type(p):
     sequence_type : TOK_SEQUENCE TOK_LT simple_type_spec TOK_COMMA positive_int_const TOK_GT
         | TOK_SEQUENCE TOK_LT simple_type_spec TOK_GT
     '''
-    p[0] = SequenceType(type=p[3], size=len(p) > 5 and p[7] or None)
+    p[0] = SequenceType(type=p[3], size=len(p) > 5 and p[5] or None)
 
 def p_floating_pt_type(p):
     '''
@@ -1018,33 +1037,39 @@ def p_octet_type(p):
     '''
     octet_type : TOK_OCTET
     '''
+    p[0] = BasicTypeNode('octet')
 
 def p_any_type(p):
     '''
     any_type : TOK_ANY
     '''
+    p[0] = BasicTypeNode('any')
 
 def p_object_type(p):
     '''
     object_type : TOK_OBJECT
     '''
+    p[0] = BasicTypeNode('Object')
 
 def p_typecode_type(p):
     '''
     typecode_type : TOK_TYPECODE
     '''
+    p[0] = BasicTypeNode('TypeCode')
 
 def p_string_type(p):
     '''
     string_type : TOK_STRING TOK_LT positive_int_const TOK_GT
         | TOK_STRING
     '''
+    p[0] = StringType(size=len(p) > 2 and p[3] or None)
 
 def p_wide_string_type(p):
     '''
     wide_string_type : TOK_WSTRING TOK_LT positive_int_const TOK_GT
         | TOK_WSTRING
     '''
+    p[0] = WideStringType(size=len(p) > 2 and p[3] or None)
 
 def p_declarator_list(p):
     '''
@@ -1186,6 +1211,7 @@ def p_positive_int_const(p):
     '''
     positive_int_const : const_exp
     '''
+    p[0] = p[1]
 
 def p_enter_prop(p):
     '''
@@ -1262,7 +1288,7 @@ def p_sqstring(p):
     '''
     sqstring : TOK_SQSTRING
     '''
-    p[0] = StringValue(p[2])
+    p[0] = StringValue(p[1])
 
 def p_optional_trailing_comma(p):
     '''
@@ -1279,7 +1305,10 @@ def p_error(p):
 def raise_syntax_error(p, msg):
     raise IDLSyntaxError(msg, p.lexer.lineno)
 
-def parser(webidl=False, **kwargs):
+def parser(webidl=False, profile=None, **kwargs):
+    # profile is a RuleProfile the grammar actions are timed into
     retval = yacc.yacc(tabmodule='parsertab', outputdir=os.path.dirname(__file__), **kwargs)
     retval.webidl = webidl
+    if profile is not None:
+        profile.instrument(retval)
     return retval
@@ -31,10 +31,12 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
+import os
 import ply.cpp
 import ply.lex
 import re
 import copy
+from pyomgidl.reader.exceptions import IDLSyntaxError
 
 __all__ = [
     'preprocess',
@@ -61,6 +63,64 @@ def litescape(s):
     return re.sub(ur"[\x00-\x1f\\\xff]", lambda m: escape_Char(m.groups(0)), s)
 
 class CustomizedPreprocessor(ply.cpp.Preprocessor):
+    def __init__(self, files=None, **kwargs):
+        ply.cpp.Preprocessor.__init__(self, **kwargs)
+        # the files pulled in by #include, as they were found
+        self.included = []
+        # anything with a read(path) that raises IOError, used instead of
+        # opening included files
+        self.files = files
+
+    def read(self, path):
+        if self.files is not None:
+            return self.files.read(path)
+        with open(path) as f:
+            return f.read()
+
+    def error(self, file, line, msg):
+        e = IDLSyntaxError(msg, line)
+        e.source = file
+        raise e
+
+    def include(self, tokens):
+        # as ply.cpp does, except that only a file that cannot be opened
+        # moves on to the next directory and the files found are recorded
+        if not tokens:
+            return
+        if tokens[0].value != '<' and tokens[0].type != self.t_STRING:
+            tokens = self.expand_macros(tokens)
+        if tokens[0].value == '<':
+            i = 1
+            while i < len(tokens):
+                if tokens[i].value == '>':
+                    break
+                i += 1
+            else:
+                self.error(self.source, tokens[0].lineno, "Malformed #include <...>")
+            filename = "".join([x.value for x in tokens[1:i]])
+            path = self.path + [""] + self.temp_path
+        elif tokens[0].type == self.t_STRING:
+            filename = tokens[0].value[1:-1]
+            path = self.temp_path + [""] + self.path
+        else:
+            self.error(self.source, tokens[0].lineno, "Malformed #include statement")
+        for p in path:
+            iname = os.path.join(p, filename)
+            try:
+                data = self.read(iname)
+            except IOError:
+                continue
+            self.included.append(iname)
+            dname = os.path.dirname(iname)
+            if dname:
+                self.temp_path.insert(0, dname)
+            for tok in self.parsegen(data, filename):
+                yield tok
+            if dname:
+                del self.temp_path[0]
+            return
+        self.error(self.source, tokens[0].lineno, "Couldn't find '%s'" % filename)
+
     def evalexpr(self, tokens):
         # tokens = tokenize(line)
         # Search for defined macros
@@ -128,7 +188,9 @@ class CustomizedPreprocessor(ply.cpp.Preprocessor):
                 lines[j] = ""
                 j += 1
 
-        input = "\n".join(lines)
+        # a directive on the last line needs its newline too, or the
+        # directive name ends up in the output
+        input = "\n".join(lines) + "\n"
         lex.input(input)
         lex.lineno = 1
 
@@ -281,10 +343,42 @@ class CustomizedPreprocessor(ply.cpp.Preprocessor):
             yield tok
         chunk = []
 
+class CountingPreprocessor(CustomizedPreprocessor):
+    # feeds the octets read, the files and the macro expansions to a
+    # ParseStats
+    def __init__(self, stats, **kwargs):
+        CustomizedPreprocessor.__init__(self, **kwargs)
+        self.stats = stats
+
+    def parsegen(self, input, source=None):
+        self.stats.octets_read += len(input)
+        self.stats.files += 1
+        return CustomizedPreprocessor.parsegen(self, input, source)
+
+    def expand_macros(self, tokens, expanded=None):
+        for t in tokens:
+            if t.type == self.t_ID and t.value in self.macros and (expanded is None or t.value not in expanded):
+                self.stats.macro_expansions += 1
+        return CustomizedPreprocessor.expand_macros(self, tokens, expanded)
+
 class PreprocessorTokenGenerator(object):
-    def __init__(self, f, source=None):
-        self.pp = CustomizedPreprocessor(lexer=ply.lex.lex(ply.cpp))
-        self.pp.parse(f.read(), source or hasattr(f, 'name') and f.name or None)
+    def __init__(self, f, source=None, stats=None, include_path=(), defines=(), files=None, lexer=None):
+        lexer = lexer or ply.lex.lex(ply.cpp)
+        if stats is None:
+            self.pp = CustomizedPreprocessor(files=files, lexer=lexer)
+        else:
+            self.pp = CountingPreprocessor(stats, files=files, lexer=lexer)
+        source = source or hasattr(f, 'name') and f.name or None
+        if source and os.path.dirname(source):
+            # quoted includes are looked up next to the including file
+            self.pp.temp_path.append(os.path.dirname(source))
+        for path in include_path:
+            self.pp.add_path(path)
+        for define in defines:
+            # NAME or NAME=VALUE, as with -D
+            name, sep, value = define.partition('=')
+            self.pp.define('%s %s' % (name, sep and value or '1'))
+        self.pp.parse(f.read(), source)
         self.lineno = 1
         self.lexpos = 0
 
@@ -337,6 +431,12 @@ def insert_line_directive(token_generator):
             need_insertion = False
         yield t
 
-def preprocess(f, source=None):
-    return ''.join(t.value for t in insert_line_directive(PreprocessorTokenGenerator(f, source)))
+def preprocess(f, source=None, stats=None, include_path=(), defines=(), dependencies=None, files=None, lexer=None):
+    # the files included are appended to dependencies if it is given.
+    # lexer is a ply.cpp lexer of the caller's own, to save building one
+    token_generator = PreprocessorTokenGenerator(f, source, stats, include_path, defines, files, lexer)
+    retval = ''.join(t.value for t in insert_line_directive(token_generator))
+    if dependencies is not None:
+        dependencies.extend(token_generator.pp.included)
+    return retval
 
@@ -0,0 +1,217 @@
+from zope.interface import implements
+from pyomgidl.reader.interfaces import INodeVisitor
+from pyomgidl.reader.exceptions import IDLSyntaxError, IDLNameError
+from pyomgidl.reader.tree import *
+
+__all__ = [
+    'SymbolTable',
+    'build_symbol_table',
+    'declarator_name',
+    'evaluate_const',
+    'reference_path',
+    ]
+
+def declarator_name(declarator):
+    if isinstance(declarator, ArrayType):
+        declarator = declarator.type
+    return declarator.value
+
+def reference_path(ref):
+    names = [ref.name.value]
+    scope = ref.scope
+    while isinstance(scope, NamespaceReference) and scope.name is not None:
+        names.insert(0, scope.name.value)
+        scope = scope.scope
+    return tuple(names), isinstance(scope, NamespaceReference)
+
+def integer_value(value):
+    return int(value, 0)
+
+def divide(a, b):
+    if isinstance(a, (int, long)) and isinstance(b, (int, long)):
+        # truncates toward zero as C does
+        retval = abs(a) // abs(b)
+        return (a < 0) != (b < 0) and -retval or retval
+    return a / b
+
+BINARY_OPS = {
+    OrOp: lambda a, b: a | b,
+    XorOp: lambda a, b: a ^ b,
+    AndOp: lambda a, b: a & b,
+    LeftShiftOp: lambda a, b: a << b,
+    RightShiftOp: lambda a, b: a >> b,
+    AddOp: lambda a, b: a + b,
+    SubOp: lambda a, b: a - b,
+    MulOp: lambda a, b: a * b,
+    DivOp: divide,
+    ModOp: lambda a, b: a % b,
+    }
+
+UNARY_OPS = {
+    NegateOp: lambda a: -a,
+    PlusOp: lambda a: a,
+    InvertOp: lambda a: ~a,
+    }
+
+def evaluate_const(node, symbols, scope=()):
+    if isinstance(node, IntegerValue):
+        return integer_value(node.value)
+    elif isinstance(node, FloatValue):
+        return float(node.value)
+    elif isinstance(node, BooleanValue):
+        return node.value
+    elif isinstance(node, CharValue):
+        return node.value.value[1:-1].decode('string_escape')
+    elif isinstance(node, BinaryOpNode):
+        return BINARY_OPS[node.__class__](
+            evaluate_const(node.lhs, symbols, scope),
+            evaluate_const(node.rhs, symbols, scope))
+    elif isinstance(node, UnaryOpNode):
+        return UNARY_OPS[node.__class__](evaluate_const(node.expr, symbols, scope))
+    elif isinstance(node, SimpleTypeReferenceNode):
+        qualified_name = symbols.lookup(node, scope)
+        definition = symbols.symbols[qualified_name]
+        if isinstance(definition, ConstDecl):
+            return evaluate_const(definition.value, symbols, qualified_name[:-1])
+        elif isinstance(definition, Enum) and definition.name.value != qualified_name[-1]:
+            # enumerators fold to their ordinals
+            return [enumerator.value for enumerator in definition.enumerators].index(qualified_name[-1])
+    raise IDLSyntaxError('Not a constant expression: %r' % (node, ))
+
+class SymbolTable(object):
+    implements(INodeVisitor)
+
+    def __init__(self):
+        self.symbols = {}
+        self.scope_stack = [()]
+
+    @property
+    def current_scope(self):
+        return self.scope_stack[-1]
+
+    def declare(self, name, node):
+        qualified_name = self.current_scope + (name, )
+        existing = self.symbols.get(qualified_name)
+        # forward declarations never replace the full one
+        if existing is not None and getattr(node, 'body', True) is None:
+            return qualified_name
+        self.symbols[qualified_name] = node
+        return qualified_name
+
+    def enter(self, name, node):
+        self.scope_stack.append(self.declare(name, node))
+
+    def leave(self):
+        self.scope_stack.pop()
+
+    def _search(self, scope, names, seen):
+        qualified_name = scope + names
+        if qualified_name in self.symbols:
+            return qualified_name
+        node = self.symbols.get(scope)
+        if isinstance(node, Interface) and node.supers and scope not in seen:
+            seen.add(scope)
+            for super in node.supers:
+                retval = self._search(self.lookup(super, scope[:-1]), names, seen)
+                if retval is not None:
+                    return retval
+        return None
+
+    def lookup(self, ref, scope=None):
+        if scope is None:
+            scope = self.current_scope
+        names, absolute = reference_path(ref)
+        if absolute:
+            if names in self.symbols:
+                return names
+        else:
+            for i in range(len(scope), -1, -1):
+                retval = self._search(scope[:i], names, set())
+                if retval is not None:
+                    return retval
+        raise IDLNameError("Unresolved name `%s'" % '::'.join(names))
+
+    def resolve(self, ref, scope=None):
+        return self.symbols[self.lookup(ref, scope)]
+
+    def visit_specification(self, node):
+        pass
+
+    def depart_specification(self, node):
+        pass
+
+    def visit_module(self, node):
+        self.enter(node.name.value, node)
+
+    def depart_module(self, node):
+        self.leave()
+
+    def visit_interface(self, node):
+        self.enter(node.name.value, node)
+
+    def depart_interface(self, node):
+        self.leave()
+
+    def visit_value_type(self, node):
+        self.enter(node.name.value, node)
+
+    def depart_value_type(self, node):
+        self.leave()
+
+    def visit_struct(self, node):
+        self.enter(node.name.value, node)
+
+    def depart_struct(self, node):
+        self.leave()
+
+    def visit_enum(self, node):
+        self.declare(node.name.value, node)
+        for enumerator in node.enumerators:
+            self.declare(enumerator.value, node)
+
+    def depart_enum(self, node):
+        pass
+
+    def visit_union(self, node):
+        # case labels are folded in the scope enclosing the union
+        seen = set()
+        for case in node.cases:
+            case.values = [evaluate_const(label, self, self.current_scope) if label is not None else None for label in case.labels]
+            for value in case.values:
+                if value in seen:
+                    raise IDLSyntaxError('Duplicate case label %r in union %s' % (value, node.name.value))
+                seen.add(value)
+        self.enter(node.name.value, node)
+
+    def depart_union(self, node):
+        self.leave()
+
+    def visit_type_def(self, node):
+        for declarator in node.declarators:
+            self.declare(declarator_name(declarator), node)
+
+    def visit_native_decl(self, node):
+        self.declare(node.declarator.value, node)
+
+    def visit_attr_def(self, node):
+        pass
+
+    def visit_operation_def(self, node):
+        pass
+
+    def visit_field_def(self, node):
+        pass
+
+    def visit_const_decl(self, node):
+        self.declare(node.name.value, node)
+
+    def visit_except_decl(self, node):
+        self.enter(node.name.value, node)
+
+    def depart_except_decl(self, node):
+        self.leave()
+
+def build_symbol_table(spec):
+    retval = SymbolTable()
+    walk_ast_nodes(spec, retval)
+    return retval
@@ -0,0 +1,163 @@
+import sys
+import json
+import time
+from functools import wraps
+from collections import Counter
+from pyomgidl.reader.tree import ASTNode
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__all__ = [
+    'ParseStats',
+    'RuleProfile',
+    'count_nodes',
+    'rebind_actions',
+    ]
+
+def cpu_time():
+    if resource is None:
+        return time.clock()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def rebind_actions(parser, wrap):
+    # replaces the grammar actions of a parser instance, which has its own
+    # productions, with wrap(action)
+    for production in parser.productions:
+        if production.callable is not None:
+            production.callable = wrap(production.callable)
+
+def count_nodes(node, counts=None):
+    # AST nodes reachable from node by class name, each counted once
+    if counts is None:
+        counts = Counter()
+    seen = set()
+    pending = [node]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, ASTNode) and id(value) not in seen:
+            seen.add(id(value))
+            counts[value.__class__.__name__] += 1
+            pending.extend(value.__dict__.values())
+    return counts
+
+class ParseStats(object):
+    # filled in by parse_into_ast(..., stats=True) and attached to the
+    # Specification it returns. phases maps a phase to [wall, cpu] seconds;
+    # lex and build (the grammar actions) happen while parsing, so they
+    # have no CPU time of their own and parse covers them
+    def __init__(self):
+        self.phases = {}
+        self.octets_read = 0
+        self.files = 0
+        self.macro_expansions = 0
+        self.tokens = Counter()
+        self.reductions = 0
+        self.nodes = Counter()
+
+    @property
+    def includes(self):
+        return max(self.files - 1, 0)
+
+    def begin(self, phase):
+        self.phases[phase] = [-time.time(), -cpu_time()]
+
+    def end(self, phase):
+        times = self.phases[phase]
+        times[0] += time.time()
+        times[1] += cpu_time()
+
+    def add(self, phase, wall):
+        times = self.phases.setdefault(phase, [0.0, None])
+        times[0] += wall
+
+    def counting_lexer(self, lexer):
+        # a tokenfunc for the parser that counts tokens by type and the
+        # time spent lexing them
+        tokens = self.tokens
+        token = lexer.token
+        def next_token():
+            start = time.time()
+            retval = token()
+            self.add('lex', time.time() - start)
+            if retval is not None:
+                tokens[retval.type] += 1
+            return retval
+        return next_token
+
+    def count_reductions(self, parser):
+        rebind_actions(parser, self.counted)
+
+    def counted(self, action):
+        @wraps(action)
+        def wrapper(p):
+            start = time.time()
+            try:
+                return action(p)
+            finally:
+                self.reductions += 1
+                self.add('build', time.time() - start)
+        return wrapper
+
+    def as_dict(self):
+        return {
+            'phases': dict((phase, list(times)) for phase, times in self.phases.items()),
+            'octets_read': self.octets_read,
+            'includes': self.includes,
+            'macro_expansions': self.macro_expansions,
+            'tokens': dict(self.tokens),
+            'reductions': self.reductions,
+            'nodes': dict(self.nodes),
+            }
+
+    def __repr__(self):
+        return 'ParseStats(%s)' % ', '.join(
+            '%s=%.3fms' % (phase, times[0] * 1000) for phase, times in sorted(self.phases.items()))
+
+class RuleProfile(object):
+    # call counts and cumulative seconds of the p_* grammar actions, over
+    # every parser instrumented with it
+    def __init__(self, rules=None):
+        self.rules = rules or {}
+
+    def instrument(self, parser):
+        rebind_actions(parser, self.timed)
+        return parser
+
+    def timed(self, action):
+        entry = self.rules.setdefault(action.__name__, [0, 0.0])
+        @wraps(action)
+        def wrapper(p):
+            start = time.time()
+            try:
+                return action(p)
+            finally:
+                entry[0] += 1
+                entry[1] += time.time() - start
+        return wrapper
+
+    def ranking(self):
+        return sorted(self.rules.items(), key=lambda item: (-item[1][1], item[0]))
+
+    def report(self, out=sys.stdout, limit=None):
+        total = sum(seconds for _, seconds in self.rules.values()) or 1.0
+        out.write('%-40s %10s %12s %14s %7s\n' % ('action', 'calls', 'total (ms)', 'per call (us)', 'share'))
+        for name, (calls, seconds) in self.ranking()[:limit]:
+            out.write('%-40s %10d %12.3f %14.2f %6.1f%%\n' % (
+                name, calls, seconds * 1000, calls and seconds * 1e6 / calls or 0.0, seconds * 100 / total))
+
+    def dump(self, f):
+        # one action per line, in name order, so that dumps diff cleanly
+        f.write('{\n')
+        f.write(',\n'.join('  %s: {"calls": %d, "seconds": %.9f}' % (json.dumps(name), calls, seconds)
+                            for name, (calls, seconds) in sorted(self.rules.items())))
+        f.write('\n}\n')
+
+    @classmethod
+    def load(cls, f):
+        return cls(dict((name, [entry['calls'], entry['seconds']]) for name, entry in json.load(f).items()))
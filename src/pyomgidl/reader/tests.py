@@ -1,5 +1,9 @@
-from unittest import TestCase
-from pyomgidl.reader import lexer, parser, tree, IDLSyntaxError
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+from unittest import TestCase, skipIf
+from pyomgidl.reader import memory, lexer, parser, tree, preprocess, parse_into_ast, build_symbol_table, evaluate_const, RuleProfile, measure_memory, trace_actions, IDLSyntaxError, IDLNameError
 
 class TokenizerTest(TestCase):
     def setUp(self):
@@ -672,3 +676,207 @@ class ParserTest(TestCase):
         except IDLSyntaxError:
             self.assertTrue(True)
 
+    def testStruct(self):
+        self.assertEqual(
+            tree.Struct(
+                name=tree.Identifier('S'),
+                members=[
+                    tree.FieldDef(
+                        type=tree.BasicTypeNode('long'),
+                        declarators=[tree.Identifier('a'), tree.Identifier('b')],
+                        properties=[]),
+                    tree.FieldDef(
+                        type=tree.StringType(),
+                        declarators=[tree.Identifier('c')],
+                        properties=[]),
+                    ]),
+            self.parse('''struct S { long a, b; string c; };''').definitions[0])
+
+    def testEnum(self):
+        self.assertEqual(
+            tree.Enum(
+                name=tree.Identifier('Color'),
+                enumerators=[tree.Identifier('RED'), tree.Identifier('GREEN')]),
+            self.parse('''enum Color { RED, GREEN };''').definitions[0])
+
+    def testUnion(self):
+        union = self.parse('''union U switch (long) { case 1: case 2: long a; default: string b; };''').definitions[0]
+        self.assertEqual(
+            tree.Union(
+                name=tree.Identifier('U'),
+                discriminator=tree.BasicTypeNode('long'),
+                cases=[
+                    tree.Case(
+                        labels=[tree.IntegerValue('1'), tree.IntegerValue('2')],
+                        type=tree.BasicTypeNode('long'),
+                        declarator=tree.Identifier('a')),
+                    tree.Case(
+                        labels=[None],
+                        type=tree.StringType(),
+                        declarator=tree.Identifier('b')),
+                    ]),
+            union)
+
+    def testProfile(self):
+        profile = RuleProfile()
+        text = 'interface I { oneway void f(in long a); [x] void g(); long h(); };'
+        for _ in range(2):
+            parser(profile=profile).parse(text, lexer=lexer())
+        self.assertEqual(2 * 6, profile.rules['p_modifiers_and_props'][0])
+        self.assertEqual(2 * 3, profile.rules['p_op_decl'][0])
+        self.assertEqual(0, profile.rules['p_union_type'][0])
+        ranking = profile.ranking()
+        self.assertTrue(ranking[0][1][1] >= ranking[-1][1][1])
+        out = StringIO()
+        profile.report(out, limit=3)
+        self.assertEqual(4, len(out.getvalue().splitlines()))
+        out = StringIO()
+        profile.dump(out)
+        self.assertEqual(len(profile.rules) + 2, len(out.getvalue().splitlines()))
+        out.seek(0)
+        self.assertEqual(profile.rules['p_op_decl'][0], RuleProfile.load(out).rules['p_op_decl'][0])
+
+    def testMemory(self):
+        text = '''
+            const long N = 1;
+            module A { module B { interface I { void f(in long a); }; struct S { long x; }; }; };
+            '''
+        report = measure_memory(self.parse(text))
+        self.assertEqual(set(['<global>', 'A', 'A::B']), set(report.by_module))
+        self.assertEqual(set(['<global>', 'N', 'A', 'A::B', 'A::B::I', 'A::B::S']), set(report.by_definition))
+        self.assertEqual(set(['Specification', 'Module', 'Interface', 'Struct']), set(report.by_class) & set(['Specification', 'Module', 'Interface', 'Struct', 'Union']))
+        self.assertEqual(report.total, sum(size for _, size in report.by_class.values()))
+        self.assertEqual(report.total, sum(size for _, size in report.by_definition.values()))
+        self.assertTrue(report.by_definition['A::B::I'][1] > report.by_definition['A::B::S'][1])
+        # a shared identifier is counted once
+        spec = self.parse(text)
+        interface = spec.definitions[1].definitions[0].definitions[0]
+        struct = spec.definitions[1].definitions[0].definitions[1]
+        struct.name = interface.name
+        shared = measure_memory(spec)
+        self.assertEqual(report.by_class['Identifier'][0] - 2, shared.by_class['Identifier'][0])
+        # the symbol table is charged to a definition of its own
+        spec = self.parse(text)
+        resolved = measure_memory(spec, build_symbol_table(spec))
+        self.assertEqual(report.total, resolved.total - resolved.by_definition['<symbols>'][1])
+        self.assertEqual(resolved.by_definition['<symbols>'], resolved.by_class['SymbolTable'])
+
+    @skipIf(memory.tracemalloc is None, 'tracemalloc is not available')
+    def testTraceActions(self):
+        spec, actions = trace_actions('interface I { void f(in long a); };')
+        self.assertEqual(1, actions['p_op_decl'][0])
+        self.assertTrue(sum(size for _, size in actions.values()) > 0)
+
+class SymbolTableTest(TestCase):
+    def parse(self, text):
+        return parser().parse(text, lexer=lexer())
+
+    def ref(self, text):
+        return self.parse('typedef %s x;' % text).definitions[0].type
+
+    def testLookup(self):
+        symbols = build_symbol_table(self.parse('''
+            module A {
+                typedef long T;
+                interface Foo { typedef short U; };
+                module B {
+                    interface Bar : Foo {};
+                    typedef long T;
+                };
+            };
+            '''))
+        self.assertEqual(('A', 'T'), symbols.lookup(self.ref('T'), ('A', )))
+        self.assertEqual(('A', 'B', 'T'), symbols.lookup(self.ref('T'), ('A', 'B')))
+        self.assertEqual(('A', 'T'), symbols.lookup(self.ref('::A::T'), ('A', 'B')))
+        self.assertEqual(('A', 'B', 'T'), symbols.lookup(self.ref('B::T'), ('A', )))
+        self.assertEqual(('A', 'Foo', 'U'), symbols.lookup(self.ref('U'), ('A', 'B', 'Bar')))
+        self.assertRaises(IDLNameError, symbols.lookup, self.ref('U'), ('A', 'B'))
+
+    def testUnionLabels(self):
+        spec = self.parse('''
+            const long N = 2;
+            union U switch (enum K { A, B, C }) { case A: case C: long a; default: string b; };
+            union V switch (long) { case N * 2: long a; case -1: case 0: long b; };
+            union W switch (char) { case 'x': long a; };
+            ''')
+        build_symbol_table(spec)
+        self.assertEqual([[0, 2], [None]], [case.values for case in spec.definitions[1].cases])
+        self.assertEqual([[4], [-1, 0]], [case.values for case in spec.definitions[2].cases])
+        self.assertEqual([['x']], [case.values for case in spec.definitions[3].cases])
+        self.assertRaises(IDLSyntaxError, build_symbol_table, self.parse('''
+            union U switch (long) { case 1: long a; case 1: long b; };'''))
+
+    def testEvaluateConst(self):
+        spec = self.parse('''
+            module A {
+                const long N = 4;
+                const long M = (N * 3 + 1) << 1 | 1;
+                const long D = -7 / 2;
+                const double F = N / 2.0;
+                typedef long T[M][~(-2)];
+                enum Color { RED, GREEN };
+            };
+            ''')
+        symbols = build_symbol_table(spec)
+        self.assertEqual(27, evaluate_const(symbols.symbols[('A', 'M')].value, symbols, ('A', )))
+        self.assertEqual(-3, evaluate_const(symbols.symbols[('A', 'D')].value, symbols, ('A', )))
+        self.assertEqual(2.0, evaluate_const(symbols.symbols[('A', 'F')].value, symbols, ('A', )))
+        dimension = spec.definitions[0].definitions[4].declarators[0].dimension
+        self.assertEqual(1, evaluate_const(self.ref('GREEN'), symbols, ('A', )))
+        self.assertEqual([27, 1], [evaluate_const(expr, symbols, ('A', )) for expr in dimension])
+
+class PreprocessorTest(TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.base_dir, name), 'w') as f:
+            f.write(text)
+        return os.path.join(self.base_dir, name)
+
+    def testIncludeGuards(self):
+        self.write('base.idl', '#ifndef BASE\n#define BASE\n#define N 4\nstruct S { long x[N]; };\n#endif')
+        path = self.write('main.idl', '#include "base.idl"\n#include "base.idl"\ninterface I { S f(); };\n')
+        with open(path) as f:
+            text = preprocess(f)
+        self.assertEqual(1, text.count('struct S'))
+        self.assertFalse('endif' in text)
+        spec = parser().parse(text, lexer=lexer())
+        self.assertEqual(['S', 'I'], [definition.name.value for definition in spec.definitions])
+
+    def testIncludePathAndDefines(self):
+        os.mkdir(os.path.join(self.base_dir, 'inc'))
+        self.write('inc/base.idl', 'struct S { long x[N]; };\n')
+        path = self.write('main.idl', '#include <base.idl>\n#ifdef WIDE\ninterface I { S f(); };\n#endif\n')
+        dependencies = []
+        with open(path) as f:
+            text = preprocess(f, include_path=[os.path.join(self.base_dir, 'inc')],
+                              defines=['N=3', 'WIDE'], dependencies=dependencies)
+        self.assertTrue('long x[3]' in text)
+        self.assertTrue('interface I' in text)
+        self.assertEqual([os.path.join(self.base_dir, 'inc', 'base.idl')], dependencies)
+        path = self.write('broken.idl', '#include "missing.idl"\n')
+        with open(path) as f:
+            self.assertRaises(IDLSyntaxError, preprocess, f)
+
+    def testStats(self):
+        self.write('base.idl', '#ifndef BASE\n#define BASE\n#define N 4\nstruct S { long x[N]; };\n#endif\n')
+        path = self.write('main.idl', '#include "base.idl"\n#include "base.idl"\ninterface I { S f(in long a); };\n')
+        with open(path) as f:
+            self.assertFalse(hasattr(parse_into_ast(f), 'stats'))
+        with open(path) as f:
+            spec = parse_into_ast(f, stats=True)
+        stats = spec.stats
+        self.assertEqual(2, stats.includes)
+        self.assertEqual(sum(os.path.getsize(os.path.join(self.base_dir, name)) for name in ('main.idl', 'base.idl', 'base.idl')), stats.octets_read)
+        self.assertEqual(1, stats.macro_expansions)
+        self.assertEqual(2, stats.tokens['TOK_LONG'])
+        self.assertEqual(1, stats.nodes['Interface'])
+        self.assertEqual(1, stats.nodes['Specification'])
+        self.assertTrue(stats.reductions > 0)
+        self.assertEqual(set(['preprocess', 'lex', 'parse', 'build']), set(stats.phases))
+        self.assertTrue(stats.phases['parse'][0] >= stats.phases['lex'][0])
+        self.assertEqual(None, stats.as_dict()['phases']['lex'][1])
@@ -69,13 +69,55 @@ class ValueType(Definition):
                self.body == that.body
 
 class Struct(Definition):
-    pass
+    def __init__(self, name, members=[], properties=[]):
+        self.name = name
+        self.members = members
+        self.properties = properties
+
+    def __eq__(self, that):
+        return isinstance(that, Struct) and \
+               self.name == that.name and \
+               self.members == that.members and \
+               self.properties == that.properties
 
 class Enum(Definition):
-    pass
+    def __init__(self, name, enumerators, properties=[]):
+        self.name = name
+        self.enumerators = enumerators
+        self.properties = properties
+
+    def __eq__(self, that):
+        return isinstance(that, Enum) and \
+               self.name == that.name and \
+               self.enumerators == that.enumerators and \
+               self.properties == that.properties
 
 class Union(Definition):
-    pass
+    def __init__(self, name, discriminator, cases, properties=[]):
+        self.name = name
+        self.discriminator = discriminator
+        self.cases = cases
+        self.properties = properties
+
+    def __eq__(self, that):
+        return isinstance(that, Union) and \
+               self.name == that.name and \
+               self.discriminator == that.discriminator and \
+               self.cases == that.cases and \
+               self.properties == that.properties
+
+class Case(ASTNode):
+    def __init__(self, labels, type, declarator):
+        self.labels = labels
+        self.type = type
+        self.declarator = declarator
+        self.values = None
+
+    def __eq__(self, that):
+        return isinstance(that, Case) and \
+               self.labels == that.labels and \
+               self.type == that.type and \
+               self.declarator == that.declarator
 
 class Identifier(ValueNode):
     pass
@@ -205,6 +247,17 @@ class FixedPTypeNode(TypeNode):
                self.precision == that.precision and \
                self.scale == that.scale
 
+class StringType(TypeNode):
+    def __init__(self, size=None):
+        self.size = size
+
+    def __eq__(self, that):
+        return isinstance(that, self.__class__) and \
+            self.size == that.size
+
+class WideStringType(StringType):
+    pass
+
 class CompoundTypeNode(TypeNode):
     pass
 
@@ -284,7 +337,7 @@ class UnaryOpNode(ASTNode):
 
     def __eq__(self, that):
         return isinstance(that, self.__class__) and \
-            self.lhs == that.expr
+            self.expr == that.expr
 
 class NegateOp(UnaryOpNode):
     pass
@@ -394,6 +447,11 @@ def is_non_string_iterable(value):
 def walk_ast_nodes(node, visitor):
     verifyObject(INodeVisitor, visitor)
     depart = None
+    if isinstance(node, (TypeDef, FieldDef, Case)) and \
+            isinstance(node.type, (Struct, Enum, Union)):
+        walk_ast_nodes(node.type, visitor)
+    elif isinstance(node, Union) and isinstance(node.discriminator, Enum):
+        walk_ast_nodes(node.discriminator, visitor)
     if isinstance(node, Specification):
         visitor.visit_specification(node)
         depart = visitor.depart_specification
@@ -427,6 +485,9 @@ def walk_ast_nodes(node, visitor):
         visitor.visit_field_def(node)
     elif isinstance(node, ConstDecl):
         visitor.visit_const_decl(node)
+    elif isinstance(node, ExceptionDecl):
+        visitor.visit_except_decl(node)
+        depart = visitor.depart_except_decl
 
     if isinstance(node, DefinitionContainer):
         for definition in node.definitions:
@@ -440,14 +501,14 @@ def walk_ast_nodes(node, visitor):
             for member in node.body:
                 walk_ast_nodes(member, visitor)
     elif isinstance(node, Struct):
-        for member in node.body:
+        for member in node.members:
             walk_ast_nodes(member, visitor)
-    elif isinstance(node, Enum):
-        for member in node.body:
+    elif isinstance(node, ExceptionDecl):
+        for member in node.members:
             walk_ast_nodes(member, visitor)
     elif isinstance(node, Union):
-        for member in node.body:
-            walk_ast_nodes(member, visitor)
+        for case in node.cases:
+            walk_ast_nodes(case, visitor)
         
 
     if depart is not None:
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+from concurrent import futures
+from pyomgidl.runtime import cdr, giop
+from pyomgidl.runtime.giop import NO_EXCEPTION, USER_EXCEPTION, SYSTEM_EXCEPTION, UNKNOWN, RemoteError, encode_exception, raise_reply
+
+__all__ = [
+    'NO_EXCEPTION',
+    'USER_EXCEPTION',
+    'SYSTEM_EXCEPTION',
+    'UNKNOWN',
+    'Connection',
+    'LocalTransport',
+    'RemoteError',
+    'StreamTransport',
+    'Stub',
+    'encode_exception',
+    'raise_reply',
+    ]
+
+class Connection(object):
+    # client end of a transport; replies are matched to outstanding requests
+    # by request id, so any number of calls may be in flight at once.
+    # oneway requests are queued and written out together once batch_size
+    # octets are waiting or batch_delay seconds have passed
+    def __init__(self, transport, byteorder=cdr.NATIVE, loop=None, batch_size=65536, batch_delay=0):
+        self.transport = transport
+        self.byteorder = byteorder
+        self.loop = loop or asyncio.get_event_loop()
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.request_ids = itertools.count(1)
+        self.pending = {}
+        self.batch = []
+        self.batch_octets = 0
+        self.flush_handle = None
+        transport.connect(self)
+
+    def request(self, operation, body, response_expected=True):
+        if not response_expected:
+            return self.send_oneway(operation, body)
+        # queued oneways go first so that requests leave in call order
+        if self.batch:
+            self.flush()
+        request_id = next(self.request_ids)
+        future = self.pending[request_id] = self.loop.create_future()
+        self.transport.send_requests([(request_id, operation, body, self.byteorder, True)])
+        return future
+
+    def send_oneway(self, operation, body):
+        self.batch.append((next(self.request_ids), operation, body, self.byteorder, False))
+        self.batch_octets += len(body)
+        if self.batch_octets >= self.batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            if self.batch_delay:
+                self.flush_handle = self.loop.call_later(self.batch_delay, self.flush)
+            else:
+                self.flush_handle = self.loop.call_soon(self.flush)
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.batch:
+            batch, self.batch = self.batch, []
+            self.batch_octets = 0
+            self.transport.send_requests(batch)
+
+    def reply_received(self, request_id, status, body):
+        future = self.pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result((status, body))
+
+    def connection_lost(self, exc=None):
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc or ConnectionError('Connection closed'))
+
+    def close(self):
+        self.flush()
+        self.transport.close()
+        self.connection_lost()
+
+class LocalTransport(object):
+    # hands requests to handler(operation, body, byteorder) in the same
+    # process; the handler returns (status, body), an awaitable of it or a
+    # concurrent.futures.Future such as those of a policies.Dispatcher
+    def __init__(self, handler, loop=None):
+        self.handler = handler
+        self.loop = loop or asyncio.get_event_loop()
+        self.connection = None
+
+    def connect(self, connection):
+        self.connection = connection
+
+    def send_requests(self, requests):
+        self.loop.call_soon(self.dispatch_all, [
+            (request_id, operation, bytes(body), byteorder, response_expected)
+            for request_id, operation, body, byteorder, response_expected in requests])
+
+    def dispatch_all(self, requests):
+        for request in requests:
+            self.dispatch(*request)
+
+    def dispatch(self, request_id, operation, body, byteorder, response_expected):
+        try:
+            result = self.handler(operation, body, byteorder)
+        except Exception as e:
+            result = SYSTEM_EXCEPTION, encode_exception(UNKNOWN, None, None, byteorder)
+        if isinstance(result, futures.Future):
+            result = asyncio.wrap_future(result, loop=self.loop)
+        if not response_expected:
+            if result is not None and not isinstance(result, tuple):
+                asyncio.ensure_future(result, loop=self.loop)
+            return
+        if isinstance(result, tuple):
+            self.reply(request_id, byteorder, result)
+        else:
+            asyncio.ensure_future(result, loop=self.loop).add_done_callback(
+                lambda future: self.reply(request_id, byteorder, future.exception() or future.result()))
+
+    def reply(self, request_id, byteorder, result):
+        if isinstance(result, Exception):
+            result = SYSTEM_EXCEPTION, encode_exception(UNKNOWN, None, None, byteorder)
+        if self.connection is not None:
+            self.connection.reply_received(request_id, *result)
+
+    def close(self):
+        self.connection = None
+
+class StreamTransport(asyncio.Protocol):
+    # sends requests as GIOP messages over a stream socket, for instance
+    # one made by loop.create_unix_connection(StreamTransport, path) and
+    # served by giop.Server
+    def __init__(self, pool=None):
+        self.pool = pool or giop.BufferPool()
+        self.transport = None
+        self.connection = None
+        self.incoming = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connect(self, connection):
+        self.connection = connection
+
+    def send_requests(self, requests):
+        # a batch of oneway requests leaves in a single write. the transport
+        # may keep what it is given until it can be sent, so the frames are
+        # copied out of the pooled buffer
+        frames = []
+        buf = self.pool.acquire()
+        try:
+            for request_id, operation, body, byteorder, response_expected in requests:
+                end = giop.write_request(buf, request_id, operation, body, byteorder, response_expected)
+                frames.append(bytes(memoryview(buf)[:end]))
+        finally:
+            self.pool.release(buf)
+        self.transport.writelines(frames)
+
+    def data_received(self, data):
+        incoming = self.incoming
+        incoming += data
+        pos = 0
+        while len(incoming) - pos >= giop.HEADER_SIZE:
+            message_type, byteorder, size = giop.read_header(incoming[pos:pos + giop.HEADER_SIZE])
+            end = pos + giop.HEADER_SIZE + size
+            if len(incoming) < end:
+                break
+            if message_type == giop.REPLY and self.connection is not None:
+                request_id, status, body = giop.read_reply(bytes(incoming[pos:end]), byteorder)
+                self.connection.reply_received(request_id, status, body.tobytes())
+            pos = end
+        del incoming[:pos]
+
+    def connection_lost(self, exc):
+        if self.connection is not None:
+            self.connection.connection_lost(exc)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+class Stub(object):
+    def __init__(self, connection):
+        self._connection = connection
+
+    def flush(self):
+        self._connection.flush()
@@ -0,0 +1,14 @@
+__all__ = [
+    'BoundsError',
+    'too_long',
+    'wrong_length',
+    ]
+
+class BoundsError(ValueError):
+    pass
+
+def too_long(path, bound, value):
+    raise BoundsError('%s: length %d exceeds the bound %d' % (path, len(value), bound))
+
+def wrong_length(path, dimension, value):
+    raise BoundsError('%s: length %d does not match the dimension %d' % (path, len(value), dimension))
@@ -0,0 +1,429 @@
+import sys
+import struct
+from itertools import repeat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = [
+    'BIG_ENDIAN',
+    'LITTLE_ENDIAN',
+    'NATIVE',
+    'Layout',
+    'MarshalError',
+    'RecordLayout',
+    'Stream',
+    'TruncatedError',
+    'codec',
+    'iter_sequence',
+    'many',
+    'structs',
+    'tobytes',
+    ]
+
+if sys.version_info[0] >= 3:
+    unicode = str
+    unichr = chr
+    xrange = range
+
+BIG_ENDIAN = 0
+LITTLE_ENDIAN = 1
+NATIVE = sys.byteorder == 'little' and LITTLE_ENDIAN or BIG_ENDIAN
+
+ORDER = '><'
+ZEROS = b'\0' * 8
+UTF16 = ('utf-16-be', 'utf-16-le')
+
+class MarshalError(Exception):
+    pass
+
+class TruncatedError(MarshalError):
+    # the data ends before the value being read does
+    pass
+
+class Layout(object):
+    # computed by the code generator for every type it emits codecs for;
+    # size is None when it depends on the value and max_size, which covers
+    # leading padding, is None when unbounded
+    __slots__ = ('alignment', 'size', 'max_size')
+
+    def __init__(self, alignment, size, max_size):
+        self.alignment = alignment
+        self.size = size
+        self.max_size = max_size
+
+    @property
+    def fixed(self):
+        return self.size is not None
+
+    def __repr__(self):
+        return 'Layout(alignment=%d, size=%r, max_size=%r)' % (self.alignment, self.size, self.max_size)
+
+def structs(fmt):
+    return (struct.Struct(ORDER[BIG_ENDIAN] + fmt), struct.Struct(ORDER[LITTLE_ENDIAN] + fmt))
+
+ULONG = structs('I')
+USHORT = structs('H')
+
+def codec(write, read):
+    def encode(value, byteorder=NATIVE):
+        buf = bytearray()
+        try:
+            write(buf, value, byteorder)
+        except struct.error as e:
+            raise MarshalError(str(e))
+        return bytes(buf)
+    def decode(data, byteorder=NATIVE, copy=False):
+        # octet sequences and arrays are sliced out of data, so they are
+        # views into the message unless a private copy is asked for
+        if copy:
+            data = tobytes(data)
+        else:
+            data = memoryview(data)
+        try:
+            return read(data, 0, byteorder)[0]
+        except (struct.error, IndexError) as e:
+            raise MarshalError(str(e))
+    return encode, decode
+
+def many(write, read):
+    # records go back to back as in a CDR stream that starts at offset
+    # zero of buf, so alignment is kept relative to the buffer
+    def encode_many(records, buf, byteorder=NATIVE, pos=0):
+        reserve(buf, pos)
+        chunk = bytearray(pos & 7)
+        try:
+            for value in records:
+                write(chunk, value, byteorder)
+        except struct.error as e:
+            raise MarshalError(str(e))
+        end = pos - (pos & 7) + len(chunk)
+        buf[pos:end] = chunk[pos & 7:]
+        return end
+    def decode_many(data, count, byteorder=NATIVE, pos=0, copy=False):
+        if copy:
+            data = tobytes(data)
+        else:
+            data = memoryview(data)
+        values = []
+        append = values.append
+        try:
+            for _ in repeat(None, count):
+                value, pos = read(data, pos, byteorder)
+                append(value)
+        except (struct.error, IndexError) as e:
+            raise MarshalError(str(e))
+        return values, pos
+    return encode_many, decode_many
+
+# what a Stream buffers for one element before it gives up on it
+STREAM_LIMIT = 1 << 26
+
+class Stream(object):
+    # pulls octets from a file, socket or mmap on demand. the source must
+    # be positioned at a multiple of 8 octets into the CDR stream: the
+    # window always starts at one too, so readers see the same alignment
+    # as over the whole message
+    def __init__(self, source, size=65536, limit=None):
+        self.source_read = getattr(source, 'read', None) or source.recv
+        self.size = size
+        self.limit = limit or STREAM_LIMIT
+        self.data = bytearray()
+        self.pos = 0
+
+    def fill(self, size):
+        # the window is replaced rather than resized: the ndarrays decoded
+        # so far are views into it
+        buffered = len(self.data) - self.pos
+        if buffered >= self.limit:
+            raise MarshalError('No element within %d octets at %d' % (self.limit, self.pos))
+        chunk = self.source_read(min(size, self.limit - buffered))
+        if not chunk:
+            return False
+        drop = self.pos - (self.pos & 7)
+        self.data = self.data[drop:] + chunk
+        self.pos -= drop
+        return True
+
+    def decode(self, read, bo):
+        # an element cut off by the end of the window fails to decode and
+        # is read again once more data is there; any other error is the
+        # data's. every retry asks for as much again as is buffered, so a
+        # large element is decoded a logarithmic number of times
+        while True:
+            try:
+                value, pos = read(self.data, self.pos, bo)
+            except (struct.error, TruncatedError) as e:
+                if not self.fill(max(self.size, len(self.data) - self.pos)):
+                    raise MarshalError('Unexpected end of stream at %d: %s' % (self.pos, e))
+                continue
+            self.pos = pos
+            return value
+
+def iter_sequence(source, read, byteorder=NATIVE, count=None, batch=None, size=65536, limit=None):
+    # yields the elements of a sequence, or of count consecutive elements
+    # when the count is known, one by one or in lists of batch elements;
+    # no element may take more than limit octets
+    stream = Stream(source, size, limit)
+    if count is None:
+        count = stream.decode(read_count, byteorder)
+    if batch is None:
+        for _ in repeat(None, count):
+            yield stream.decode(read, byteorder)
+        return
+    for start in range(0, count, batch):
+        yield [stream.decode(read, byteorder) for _ in repeat(None, min(batch, count - start))]
+
+def primitive_reader(structs):
+    size = structs[0].size
+    def read(data, pos, bo):
+        pos += -pos & (size - 1)
+        return structs[bo].unpack_from(data, pos)[0], pos + size
+    return read
+
+def reserve(buf, end):
+    if len(buf) < end:
+        buf += bytearray(end - len(buf))
+
+def tobytes(value):
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return bytes(value)
+
+def check_length(data, pos, n):
+    if len(data) < pos + n:
+        raise TruncatedError('Unexpected end of data at %d (%d more octets needed)' % (pos, pos + n - len(data)))
+
+def write_string(buf, value, bo):
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    buf += ZEROS[:-len(buf) & 3]
+    buf += ULONG[bo].pack(len(value) + 1)
+    buf += value
+    buf += b'\0'
+
+def read_string(data, pos, bo):
+    pos += -pos & 3
+    n, = ULONG[bo].unpack_from(data, pos)
+    pos += 4
+    end = pos + n - 1
+    check_length(data, pos, n)
+    if n == 0 or data[end:end + 1] != b'\0':
+        raise MarshalError('String at %d is not terminated' % pos)
+    return tobytes(data[pos:end]), end + 1
+
+def write_wstring(buf, value, bo):
+    value = value.encode(UTF16[bo])
+    buf += ZEROS[:-len(buf) & 3]
+    buf += ULONG[bo].pack(len(value))
+    buf += value
+
+def read_wstring(data, pos, bo):
+    pos += -pos & 3
+    n, = ULONG[bo].unpack_from(data, pos)
+    pos += 4
+    check_length(data, pos, n)
+    return tobytes(data[pos:pos + n]).decode(UTF16[bo]), pos + n
+
+def write_wchar(buf, value, bo):
+    buf += ZEROS[:-len(buf) & 1]
+    buf += USHORT[bo].pack(ord(value))
+
+def read_wchar(data, pos, bo):
+    pos += pos & 1
+    return unichr(USHORT[bo].unpack_from(data, pos)[0]), pos + 2
+
+def write_octets(buf, value, bo):
+    buf += ZEROS[:-len(buf) & 3]
+    buf += ULONG[bo].pack(len(value))
+    buf += value
+
+def read_octets(data, pos, bo):
+    pos += -pos & 3
+    n, = ULONG[bo].unpack_from(data, pos)
+    pos += 4
+    check_length(data, pos, n)
+    return data[pos:pos + n], pos + n
+
+def write_fixed_octets(buf, value, n):
+    # octet and char arrays are written as they are, so their length is
+    # checked here, as struct.pack checks the other arrays
+    if len(value) != n:
+        raise MarshalError('Array of %d octets expected, got %d' % (n, len(value)))
+    buf += value
+
+def write_sequence(buf, fmt, size, values, bo):
+    n = len(values)
+    buf += ZEROS[:-len(buf) & 3]
+    buf += ULONG[bo].pack(n)
+    if n:
+        buf += ZEROS[:-len(buf) & (size - 1)]
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            buf += values.astype(NDTYPES[fmt][bo], copy=False).tobytes()
+        else:
+            buf += struct.pack('%s%d%s' % (ORDER[bo], n, fmt), *values)
+
+def read_sequence(data, pos, fmt, size, bo):
+    pos += -pos & 3
+    n, = ULONG[bo].unpack_from(data, pos)
+    pos += 4
+    if not n:
+        return [], pos
+    pos += -pos & (size - 1)
+    return list(struct.unpack_from('%s%d%s' % (ORDER[bo], n, fmt), data, pos)), pos + n * size
+
+def read_fixed_sequence(data, pos, bo, structs, stride, first_alignment, alignment, make, read):
+    # when the first record is aligned to its largest member every record
+    # has the same layout, so all of them are unpacked with one Struct
+    n, pos = read_count(data, pos, bo)
+    if not n:
+        return [], pos
+    start = pos + (-pos & (first_alignment - 1))
+    if start & (alignment - 1):
+        values = []
+        for _ in repeat(None, n):
+            value, pos = read(data, pos, bo)
+            values.append(value)
+        return values, pos
+    unpack_from = structs[bo].unpack_from
+    end = start + (n - 1) * stride + structs[bo].size
+    check_length(data, start, end - start)
+    return [make(*unpack_from(data, pos)) for pos in xrange(start, end, stride)], end
+
+def unsupported(name):
+    raise MarshalError('%s cannot be marshaled' % name)
+
+def read_count(data, pos, bo):
+    pos += -pos & 3
+    return ULONG[bo].unpack_from(data, pos)[0], pos + 4
+
+def flatten(values, depth):
+    for _ in range(depth - 1):
+        values = [item for row in values for item in row]
+    return values
+
+def to_members(members, values, depth):
+    if depth == 1:
+        return [members[value] for value in values]
+    return [to_members(members, row, depth - 1) for row in values]
+
+def reshape(values, dimensions):
+    values = list(values)
+    for dimension in reversed(dimensions[1:]):
+        values = [values[i:i + dimension] for i in range(0, len(values), dimension)]
+    return values
+
+DTYPES = {
+    'h': 'i2',
+    'H': 'u2',
+    'i': 'i4',
+    'I': 'u4',
+    'q': 'i8',
+    'Q': 'u8',
+    'f': 'f4',
+    'd': 'f8',
+    '?': 'b1',
+    'c': 'S1',
+    'B': 'u1',
+    }
+
+def dtype(spec, bo):
+    # spec is a struct format character, a (spec, shape) pair for
+    # subarrays, or a ([(name, spec, offset), ...], itemsize) pair for records
+    if isinstance(spec, str):
+        return numpy.dtype(ORDER[bo] + DTYPES[spec])
+    elif isinstance(spec[1], tuple):
+        return numpy.dtype((dtype(spec[0], bo), spec[1]))
+    fields, itemsize = spec
+    return numpy.dtype({
+        'names': [field[0] for field in fields],
+        'formats': [dtype(field[1], bo) for field in fields],
+        'offsets': [field[2] for field in fields],
+        'itemsize': itemsize,
+        })
+
+if numpy is not None:
+    NDTYPES = dict((fmt, (dtype(fmt, BIG_ENDIAN), dtype(fmt, LITTLE_ENDIAN))) for fmt in DTYPES)
+
+def ndbuffer(data):
+    # numpy on Python 2 only accepts memoryviews through the array interface
+    if isinstance(data, memoryview):
+        return numpy.asarray(data)
+    return data
+
+class RecordLayout(object):
+    def __init__(self, spec, alignment, first_alignment, size, stride):
+        self.alignment = alignment
+        self.first_alignment = first_alignment
+        self.size = size
+        self.stride = stride
+        if numpy is not None:
+            fields = spec[0]
+            self.dtypes = (dtype(spec, BIG_ENDIAN), dtype(spec, LITTLE_ENDIAN))
+            self.padded = (dtype((fields, stride), BIG_ENDIAN), dtype((fields, stride), LITTLE_ENDIAN))
+
+def read_ndsequence(data, pos, fmt, size, bo, members=None):
+    # enums stay ordinals in the ndarray; only the fallback maps them to members
+    if numpy is None:
+        values, pos = read_sequence(data, pos, fmt, size, bo)
+        return members and to_members(members, values, 1) or values, pos
+    n, pos = read_count(data, pos, bo)
+    if not n:
+        return numpy.empty(0, NDTYPES[fmt][bo]), pos
+    pos += -pos & (size - 1)
+    check_length(data, pos, n * size)
+    return numpy.frombuffer(ndbuffer(data), NDTYPES[fmt][bo], n, pos), pos + n * size
+
+def write_ndarray(buf, structs, fmt, depth, value, bo):
+    s = structs[bo]
+    size = struct.calcsize(fmt)
+    buf += ZEROS[:-len(buf) & (size - 1)]
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        if value.size * size != s.size:
+            raise MarshalError('Array of %d elements expected' % (s.size // size))
+        buf += value.astype(NDTYPES[fmt][bo], copy=False).tobytes()
+    else:
+        buf += s.pack(*flatten(value, depth))
+
+def read_ndarray(data, pos, structs, fmt, shape, bo, members=None):
+    s = structs[bo]
+    size = struct.calcsize(fmt)
+    pos += -pos & (size - 1)
+    if numpy is None:
+        values = s.unpack_from(data, pos)
+        values = len(shape) > 1 and reshape(values, shape) or list(values)
+        return members and to_members(members, values, len(shape)) or values, pos + s.size
+    check_length(data, pos, s.size)
+    return numpy.frombuffer(ndbuffer(data), NDTYPES[fmt][bo], s.size // size, pos).reshape(shape), pos + s.size
+
+def write_records(buf, layout, write, values, bo):
+    n = len(values)
+    buf += ZEROS[:-len(buf) & 3]
+    buf += ULONG[bo].pack(n)
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        pad = -len(buf) & (layout.first_alignment - 1)
+        if n and not (len(buf) + pad) % layout.alignment:
+            # zero filled so that padding does not leak uninitialized memory
+            records = numpy.zeros(n, layout.padded[bo])
+            records[...] = values
+            buf += ZEROS[:pad]
+            buf += memoryview(records.tobytes())[:n * layout.stride - layout.stride + layout.size]
+            return
+        values = values.view(numpy.recarray)
+    for value in values:
+        write(buf, value, bo)
+
+def read_records(data, pos, layout, read, bo):
+    n, pos = read_count(data, pos, bo)
+    start = pos + (-pos & (layout.first_alignment - 1))
+    if numpy is not None and n and not start % layout.alignment:
+        end = start + (n - 1) * layout.stride + layout.size
+        check_length(data, start, end - start)
+        return numpy.ndarray((n, ), layout.dtypes[bo], ndbuffer(data), start, (layout.stride, )), end
+    values = []
+    for _ in repeat(None, n):
+        value, pos = read(data, pos, bo)
+        values.append(value)
+    return values, pos
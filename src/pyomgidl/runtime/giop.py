@@ -0,0 +1,368 @@
+import os
+import socket
+import struct
+import threading
+import itertools
+from pyomgidl.runtime import cdr
+from pyomgidl.runtime.cdr import ULONG, tobytes
+
+__all__ = [
+    'NO_EXCEPTION',
+    'USER_EXCEPTION',
+    'SYSTEM_EXCEPTION',
+    'BAD_OPERATION',
+    'UNKNOWN',
+    'REQUEST',
+    'REPLY',
+    'BufferPool',
+    'Channel',
+    'Client',
+    'ProtocolError',
+    'RemoteError',
+    'Server',
+    'Skeleton',
+    'connect',
+    'encode_exception',
+    'loopback',
+    'raise_reply',
+    'read_header',
+    'read_reply',
+    'read_request',
+    'serve',
+    'write_reply',
+    'write_request',
+    ]
+
+NO_EXCEPTION = 0
+USER_EXCEPTION = 1
+SYSTEM_EXCEPTION = 2
+
+BAD_OPERATION = 'IDL:omg.org/CORBA/BAD_OPERATION:1.0'
+# what the client sees of an exception the handler did not map
+UNKNOWN = 'IDL:omg.org/CORBA/UNKNOWN:1.0'
+
+REQUEST = 0
+REPLY = 1
+
+# magic, version 1.2, flags (bit 0 is the byte order) and message type,
+# followed by the size of the rest of the message in that byte order
+MAGIC = b'GIOP'
+HEADER = struct.Struct('>4sBBBB')
+HEADER_SIZE = 12
+RESPONSE_EXPECTED = (b'\0\0\0\0', b'\3\0\0\0')
+
+class RemoteError(Exception):
+    pass
+
+class ProtocolError(Exception):
+    pass
+
+# messages are written over the start of buf, which is grown as needed but
+# never shrunk, and the end of the message is returned. bodies start at a
+# multiple of 8, so alignment within them is the same as in a body encoded
+# on its own
+
+def write_header(buf, message_type, byteorder, end):
+    HEADER.pack_into(buf, 0, MAGIC, 1, 2, byteorder, message_type)
+    ULONG[byteorder].pack_into(buf, 8, end - HEADER_SIZE)
+
+def write_body(buf, pos, body):
+    start = pos + (-pos & 7)
+    end = start + len(body)
+    cdr.reserve(buf, end)
+    buf[pos:start] = cdr.ZEROS[:start - pos]
+    buf[start:end] = body
+    return end
+
+def write_request(buf, request_id, operation, body, byteorder, response_expected=True):
+    if not isinstance(operation, bytes):
+        operation = operation.encode('ascii')
+    n = len(operation) + 1
+    cdr.reserve(buf, 24 + n)
+    ULONG[byteorder].pack_into(buf, 12, request_id)
+    buf[16:20] = RESPONSE_EXPECTED[bool(response_expected)]
+    ULONG[byteorder].pack_into(buf, 20, n)
+    buf[24:24 + n] = operation + b'\0'
+    end = write_body(buf, 24 + n, body)
+    write_header(buf, REQUEST, byteorder, end)
+    return end
+
+def write_reply(buf, request_id, status, body, byteorder):
+    cdr.reserve(buf, 20)
+    ULONG[byteorder].pack_into(buf, 12, request_id)
+    ULONG[byteorder].pack_into(buf, 16, status)
+    end = write_body(buf, 20, body)
+    write_header(buf, REPLY, byteorder, end)
+    return end
+
+def read_header(data):
+    # (message type, byte order, octets following the header)
+    if len(data) < HEADER_SIZE:
+        raise ProtocolError('Truncated message header')
+    magic, major, minor, flags, message_type = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or major != 1:
+        raise ProtocolError('Not a GIOP 1.x message')
+    byteorder = flags & 1
+    return message_type, byteorder, ULONG[byteorder].unpack_from(data, 8)[0]
+
+def read_request(data, byteorder):
+    # (request id, response expected, operation, body) of a whole message
+    data = memoryview(data)
+    request_id, = ULONG[byteorder].unpack_from(data, 12)
+    operation, pos = cdr.read_string(data, 20, byteorder)
+    if not isinstance(operation, str):
+        operation = operation.decode('ascii')
+    return request_id, data[16:17].tobytes() != b'\0', operation, data[pos + (-pos & 7):]
+
+def read_reply(data, byteorder):
+    data = memoryview(data)
+    request_id, = ULONG[byteorder].unpack_from(data, 12)
+    status, = ULONG[byteorder].unpack_from(data, 16)
+    return request_id, status, data[24:]
+
+class BufferPool(object):
+    # bytearrays that messages are written to and received into; a buffer
+    # keeps the size of the largest message it has held, so steady traffic
+    # allocates nothing. buffers over max_octets are not kept
+    def __init__(self, size=16, max_octets=1 << 20):
+        self.size = size
+        self.max_octets = max_octets
+        self.free = []
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                self.reused += 1
+                return self.free.pop()
+            self.allocated += 1
+        return bytearray(256)
+
+    def release(self, buf):
+        if len(buf) > self.max_octets:
+            return
+        with self.lock:
+            if len(self.free) < self.size:
+                self.free.append(buf)
+
+class Channel(object):
+    # framed messages over a connected stream socket. sends may come from
+    # any thread; receives are expected from one thread at a time
+    def __init__(self, sock, pool=None):
+        self.sock = sock
+        self.pool = pool or BufferPool()
+        self.send_lock = threading.Lock()
+
+    def send(self, write, *args):
+        buf = self.pool.acquire()
+        try:
+            end = write(buf, *args)
+            with self.send_lock:
+                self.sock.sendall(memoryview(buf)[:end])
+        finally:
+            self.pool.release(buf)
+
+    def recv_into(self, buf, pos, end):
+        view = memoryview(buf)
+        while pos < end:
+            n = self.sock.recv_into(view[pos:end])
+            if not n:
+                return False
+            pos += n
+        return True
+
+    def receive(self, handle):
+        # passes (message type, byte order, message) to handle and returns
+        # its result, or raises EOFError once the peer has closed. message
+        # is only valid until handle returns
+        buf = self.pool.acquire()
+        try:
+            if not self.recv_into(buf, 0, HEADER_SIZE):
+                raise EOFError()
+            message_type, byteorder, size = read_header(buf)
+            cdr.reserve(buf, HEADER_SIZE + size)
+            if not self.recv_into(buf, HEADER_SIZE, HEADER_SIZE + size):
+                raise ProtocolError('Connection closed in the middle of a message')
+            return handle(message_type, byteorder, memoryview(buf)[:HEADER_SIZE + size])
+        finally:
+            self.pool.release(buf)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock.close()
+
+class Client(object):
+    # blocking client end of a channel with one call in flight at a time
+    def __init__(self, channel, byteorder=cdr.NATIVE):
+        self.channel = channel
+        self.byteorder = byteorder
+        # the thread serving the other end, for loopback clients
+        self.thread = None
+        self.request_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def call(self, operation, body, response_expected=True):
+        # (status, reply body) of a two-way call, None for a oneway one
+        with self.lock:
+            request_id = next(self.request_ids)
+            self.channel.send(write_request, request_id, operation, body, self.byteorder, response_expected)
+            if not response_expected:
+                return None
+            while True:
+                retval = self.channel.receive(self.reply)
+                if retval[0] == request_id:
+                    return retval[1:]
+
+    def reply(self, message_type, byteorder, message):
+        if message_type != REPLY:
+            raise ProtocolError('Unexpected message type %d' % message_type)
+        request_id, status, body = read_reply(message, byteorder)
+        return request_id, status, tobytes(body)
+
+    def close(self):
+        # the other end still answers what was sent before, oneway
+        # requests included, and then exits
+        self.channel.close()
+        if self.thread is not None:
+            self.thread.join()
+
+def serve(channel, handler):
+    # answers requests with handler(operation, body, byteorder) until the
+    # peer closes. the handler returns (status, body), None for no reply,
+    # or a concurrent.futures.Future of (status, body) whose reply is sent
+    # when it completes, as a policies.Dispatcher does
+    def reply(request_id, byteorder, result):
+        if result is not None:
+            channel.send(write_reply, request_id, result[0], result[1], byteorder)
+    def handle(message_type, byteorder, message):
+        if message_type != REQUEST:
+            raise ProtocolError('Unexpected message type %d' % message_type)
+        request_id, response_expected, operation, body = read_request(message, byteorder)
+        # the servant may keep views into its arguments
+        body = tobytes(body)
+        try:
+            result = handler(operation, body, byteorder)
+        except Exception as e:
+            result = SYSTEM_EXCEPTION, encode_exception(UNKNOWN, None, None, byteorder)
+        if not response_expected:
+            return
+        if isinstance(result, tuple) or result is None:
+            reply(request_id, byteorder, result)
+        else:
+            def done(future):
+                try:
+                    value = future.result()
+                except Exception as e:
+                    value = SYSTEM_EXCEPTION, encode_exception(UNKNOWN, None, None, byteorder)
+                try:
+                    reply(request_id, byteorder, value)
+                except socket.error:
+                    pass
+            result.add_done_callback(done)
+    try:
+        while True:
+            channel.receive(handle)
+    except (EOFError, ProtocolError, socket.error):
+        pass
+    finally:
+        channel.sock.close()
+
+def spawn(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def loopback(handler, byteorder=cdr.NATIVE, pool=None):
+    # a Client whose requests are served by handler on a thread at the
+    # other end of a socketpair
+    client, server = socket.socketpair()
+    retval = Client(Channel(client, pool), byteorder)
+    retval.thread = spawn(serve, Channel(server, pool), handler)
+    return retval
+
+def connect(path, byteorder=cdr.NATIVE, pool=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    return Client(Channel(sock, pool), byteorder)
+
+class Server(object):
+    # serves handler on a Unix socket, one thread per connection
+    def __init__(self, path, handler, pool=None):
+        self.path = path
+        self.handler = handler
+        self.pool = pool or BufferPool()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(16)
+        self.thread = None
+        self.connections = []
+
+    def serve_forever(self):
+        try:
+            while True:
+                sock = self.sock.accept()[0]
+                self.connections = [connection for connection in self.connections if connection[0].is_alive()]
+                self.connections.append((spawn(serve, Channel(sock, self.pool), self.handler), sock))
+        except socket.error:
+            pass
+
+    def start(self):
+        self.thread = spawn(self.serve_forever)
+        return self
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock.close()
+        if self.thread is not None:
+            self.thread.join()
+        # the requests already received are still answered
+        for thread, sock in self.connections:
+            try:
+                sock.shutdown(socket.SHUT_RD)
+            except socket.error:
+                pass
+            thread.join()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+def encode_exception(repository_id, write, value, byteorder):
+    buf = bytearray()
+    cdr.write_string(buf, repository_id, byteorder)
+    if write is not None:
+        write(buf, value, byteorder)
+    return bytes(buf)
+
+def raise_reply(status, body, byteorder, raises=None):
+    data = memoryview(body)
+    repository_id, pos = cdr.read_string(data, 0, byteorder)
+    repository_id = repository_id.decode('utf-8')
+    if status == USER_EXCEPTION and raises and repository_id in raises:
+        raise raises[repository_id](data, pos, byteorder)[0]
+    raise RemoteError(repository_id)
+
+class Skeleton(object):
+    # generated subclasses map operation names to functions taking
+    # (servant, body, byteorder) and returning (status, reply body), and
+    # carry the execution policies given as IDL properties
+    _operations = {}
+    _policy = None
+    _policies = {}
+    _oneway = frozenset()
+
+    def __init__(self, servant=None):
+        self._servant = self if servant is None else servant
+
+    def _dispatch(self, operation, body, byteorder):
+        skeleton = self._operations.get(operation)
+        if skeleton is None:
+            return SYSTEM_EXCEPTION, encode_exception(BAD_OPERATION, None, None, byteorder)
+        return skeleton(self._servant, body, byteorder)
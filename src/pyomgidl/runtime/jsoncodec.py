@@ -0,0 +1,62 @@
+import json
+import base64
+
+__all__ = [
+    'JSONCodecError',
+    'as_bytes',
+    'as_list',
+    'as_string',
+    'b64decode',
+    'b64encode',
+    'dump_sequence',
+    'dumps',
+    'unsupported',
+    ]
+
+class JSONCodecError(ValueError):
+    pass
+
+dumps = json.JSONEncoder().encode
+
+def as_list(values):
+    # ndarrays decoded by the NumPy path convert in one call
+    tolist = getattr(values, 'tolist', None)
+    if tolist is not None:
+        return tolist()
+    return list(values)
+
+def as_string(value):
+    # char sequences decoded by the CDR codec are views of the message
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return value
+
+def as_bytes(value):
+    # chars come back from JSON as text; IDL chars are ISO 8859-1 octets
+    if isinstance(value, bytes):
+        return value
+    return value.encode('latin-1')
+
+def b64encode(value):
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    return base64.b64encode(value).decode('ascii')
+
+def b64decode(value):
+    return base64.b64decode(value)
+
+def unsupported(name):
+    raise JSONCodecError('%s cannot be converted to JSON' % name)
+
+def dump_sequence(write, values, convert=None, chunk=4096):
+    write('[')
+    for start in range(0, len(values), chunk):
+        items = values[start:start + chunk]
+        if convert is None:
+            items = as_list(items)
+        else:
+            items = [convert(item) for item in items]
+        if start:
+            write(', ')
+        write(dumps(items)[1:-1])
+    write(']')
@@ -0,0 +1,32 @@
+import sys
+from types import ModuleType
+from importlib import import_module
+
+__all__ = [
+    'LazyModule',
+    'install_lazy_module',
+    ]
+
+class LazyModule(ModuleType):
+    def __getattr__(self, name):
+        submodule = self.__lazy_index__.get(name)
+        if submodule is None:
+            raise AttributeError("'%s' module has no attribute '%s'" % (self.__name__, name))
+        module = import_module('%s.%s' % (self.__name__, submodule))
+        value = module if submodule == name else getattr(module, name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.__lazy_index__))
+
+def install_lazy_module(name, index):
+    original = sys.modules[name]
+    retval = LazyModule(name)
+    retval.__dict__.update(original.__dict__)
+    retval.__lazy_index__ = index
+    retval.__all__ = sorted(index)
+    # keeps the globals of the original module from being cleared
+    retval.__original_module__ = original
+    sys.modules[name] = retval
+    return retval
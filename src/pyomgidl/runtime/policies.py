@@ -0,0 +1,151 @@
+import re
+import time
+import threading
+from pyomgidl.runtime.cdr import tobytes
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+try:
+    from configparser import RawConfigParser
+except ImportError:
+    from ConfigParser import RawConfigParser
+
+__all__ = [
+    'INLINE',
+    'THREADPOOL',
+    'PROCESSPOOL',
+    'Dispatcher',
+    'Stats',
+    'load_policies',
+    'parse_policy',
+    ]
+
+INLINE = 'inline'
+THREADPOOL = 'threadpool'
+PROCESSPOOL = 'processpool'
+
+DEFAULT_POOL_SIZE = 4
+
+POLICY = re.compile(r'^\s*(inline|threadpool|processpool)\s*(?:\(\s*(\d*)\s*\))?\s*$')
+
+def parse_policy(text):
+    match = POLICY.match(text)
+    if match is None:
+        raise ValueError('Unknown execution policy: %s' % text)
+    return match.group(1), match.group(2) and int(match.group(2)) or None
+
+def load_policies(path):
+    # one section per repository id; `*' sets the interface default and
+    # every other option names an operation:
+    #
+    # [IDL:Example/Service:1.0]
+    # * = threadpool(8)
+    # report = processpool(2)
+    config = RawConfigParser()
+    config.optionxform = str
+    config.read(path)
+    return dict(
+        (section, dict((operation, parse_policy(value)) for operation, value in config.items(section)))
+        for section in config.sections())
+
+class Stats(object):
+    __slots__ = ('depth', 'completed', 'wait_total', 'wait_max')
+
+    def __init__(self):
+        self.depth = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self):
+        return {
+            'depth': self.depth,
+            'completed': self.completed,
+            'wait_total': self.wait_total,
+            'wait_max': self.wait_max,
+            'wait_mean': self.completed and self.wait_total / self.completed or 0.0,
+            }
+
+def run(function, servant, body, byteorder, enqueued):
+    # executed by the pool; the wait is measured where the call starts
+    return time.time() - enqueued, function(servant, body, byteorder)
+
+class Dispatcher(object):
+    # a transport handler that runs each operation of a skeleton inline or
+    # on the pool picked by its policy. the config file wins over the IDL
+    # properties, operations over interfaces. pooled calls return a
+    # concurrent.futures.Future, oneway calls return None without waiting.
+    # a processpool worker gets a pickled copy of the servant, so it only
+    # suits stateless operations and attribute setters are refused
+    def __init__(self, skeleton, policies=None, default=(INLINE, None)):
+        self.skeleton = skeleton
+        self.lock = threading.Lock()
+        self.executors = {}
+        self.routes = {}
+        self.stats = {}
+        config = (policies or {}).get(skeleton._repository_id, {})
+        for operation, function in skeleton._operations.items():
+            policy = config.get(operation) or skeleton._policies.get(operation) or \
+                config.get('*') or skeleton._policy or default
+            if policy[0] == PROCESSPOOL and operation.startswith('_set_'):
+                raise ValueError('%s cannot run in a processpool, the servant would not see the change' % operation)
+            self.stats[operation] = Stats()
+            self.routes[operation] = function, self.executor(policy), operation in skeleton._oneway
+
+    def executor(self, policy):
+        kind, size = policy
+        if kind == INLINE:
+            return None
+        if futures is None:
+            raise RuntimeError('%s needs concurrent.futures' % kind)
+        if policy not in self.executors:
+            factory = kind == THREADPOOL and futures.ThreadPoolExecutor or futures.ProcessPoolExecutor
+            self.executors[policy] = factory(size or DEFAULT_POOL_SIZE)
+        return self.executors[policy]
+
+    def __call__(self, operation, body, byteorder):
+        route = self.routes.get(operation)
+        if route is None:
+            return self.skeleton._dispatch(operation, body, byteorder)
+        function, executor, oneway = route
+        stats = self.stats[operation]
+        if executor is None:
+            result = function(self.skeleton._servant, body, byteorder)
+            with self.lock:
+                stats.completed += 1
+            return result
+        with self.lock:
+            stats.depth += 1
+        future = executor.submit(run, function, self.skeleton._servant, tobytes(body), byteorder, time.time())
+        result = futures.Future()
+        def done(future):
+            with self.lock:
+                stats.depth -= 1
+                stats.completed += 1
+            if future.exception() is not None:
+                result.set_exception(future.exception())
+                return
+            wait, value = future.result()
+            with self.lock:
+                stats.wait_total += wait
+                stats.wait_max = max(stats.wait_max, wait)
+            result.set_result(value)
+        future.add_done_callback(done)
+        if oneway:
+            return None
+        return result
+
+    def metrics(self):
+        with self.lock:
+            return dict((operation, stats.as_dict()) for operation, stats in self.stats.items())
+
+    def queue_depth(self):
+        with self.lock:
+            return sum(stats.depth for stats in self.stats.values())
+
+    def shutdown(self, wait=True):
+        for executor in self.executors.values():
+            executor.shutdown(wait)
@@ -0,0 +1,468 @@
+import struct
+from pyomgidl.runtime import cdr
+from pyomgidl.runtime.cdr import ZEROS, ULONG, MarshalError, check_length, tobytes
+
+__all__ = [
+    'Any',
+    'TypeCode',
+    'decode_typecode',
+    'enum_reader',
+    'read_any',
+    'register',
+    'write_any',
+    ]
+
+TK_NULL = 0
+TK_VOID = 1
+TK_SHORT = 2
+TK_LONG = 3
+TK_USHORT = 4
+TK_ULONG = 5
+TK_FLOAT = 6
+TK_DOUBLE = 7
+TK_BOOLEAN = 8
+TK_CHAR = 9
+TK_OCTET = 10
+TK_ANY = 11
+TK_TYPECODE = 12
+TK_PRINCIPAL = 13
+TK_OBJREF = 14
+TK_STRUCT = 15
+TK_UNION = 16
+TK_ENUM = 17
+TK_STRING = 18
+TK_SEQUENCE = 19
+TK_ARRAY = 20
+TK_ALIAS = 21
+TK_EXCEPT = 22
+TK_LONGLONG = 23
+TK_ULONGLONG = 24
+TK_LONGDOUBLE = 25
+TK_WCHAR = 26
+TK_WSTRING = 27
+
+# marks a reference to an enclosing TypeCode, followed by a long offset
+INDIRECTION = 0xffffffff
+
+FORMATS = {
+    TK_SHORT: 'h',
+    TK_LONG: 'i',
+    TK_USHORT: 'H',
+    TK_ULONG: 'I',
+    TK_FLOAT: 'f',
+    TK_DOUBLE: 'd',
+    TK_BOOLEAN: '?',
+    TK_CHAR: 'c',
+    TK_OCTET: 'B',
+    TK_LONGLONG: 'q',
+    TK_ULONGLONG: 'Q',
+    }
+
+STRUCTS = dict((kind, cdr.structs(fmt)) for kind, fmt in FORMATS.items())
+LONG = cdr.structs('i')
+OCTET = cdr.structs('B')
+
+# kinds whose parameters are written to an encapsulation
+COMPLEX = frozenset([TK_OBJREF, TK_STRUCT, TK_UNION, TK_ENUM, TK_SEQUENCE, TK_ARRAY, TK_ALIAS, TK_EXCEPT])
+BOUNDED = frozenset([TK_STRING, TK_WSTRING])
+
+class TypeCode(object):
+    # members are (name, TypeCode) for structs and exceptions, (label, name,
+    # TypeCode) for unions, with a None label for the default branch, and
+    # names for enums. they may be assigned after construction, so that a
+    # type can refer to itself, but not once the TypeCode has been encoded:
+    # the encoding is computed once per byte order and kept. write and read
+    # are the codecs of the generated class the type maps to
+    __slots__ = ('kind', 'id', 'name', 'members', 'content', 'length', 'discriminator', 'write', 'read', 'encoded')
+
+    def __init__(self, kind, id='', name='', members=(), content=None, length=0,
+                 discriminator=None, write=None, read=None):
+        self.kind = kind
+        self.id = id
+        self.name = name
+        self.members = members
+        self.content = content
+        self.length = length
+        self.discriminator = discriminator
+        self.write = write
+        self.read = read
+        self.encoded = [None, None]
+
+    def encode(self, byteorder=cdr.NATIVE):
+        retval = self.encoded[byteorder]
+        if retval is None:
+            buf = bytearray()
+            write_typecode(buf, self, byteorder)
+            retval = self.encoded[byteorder] = bytes(buf)
+        return retval
+
+    def default_index(self):
+        for i, member in enumerate(self.members):
+            if member[0] is None:
+                return i
+        return -1
+
+    def __eq__(self, that):
+        return self is that or isinstance(that, TypeCode) and self.encode() == that.encode()
+
+    def __ne__(self, that):
+        return not self == that
+
+    def __hash__(self):
+        return hash(self.encode())
+
+    def __repr__(self):
+        return 'TypeCode(%d, %r)' % (self.kind, self.id or self.name)
+
+TC_NULL = TypeCode(TK_NULL)
+TC_VOID = TypeCode(TK_VOID)
+TC_SHORT = TypeCode(TK_SHORT)
+TC_LONG = TypeCode(TK_LONG)
+TC_USHORT = TypeCode(TK_USHORT)
+TC_ULONG = TypeCode(TK_ULONG)
+TC_FLOAT = TypeCode(TK_FLOAT)
+TC_DOUBLE = TypeCode(TK_DOUBLE)
+TC_BOOLEAN = TypeCode(TK_BOOLEAN)
+TC_CHAR = TypeCode(TK_CHAR)
+TC_OCTET = TypeCode(TK_OCTET)
+TC_ANY = TypeCode(TK_ANY)
+TC_TYPECODE = TypeCode(TK_TYPECODE)
+TC_LONGLONG = TypeCode(TK_LONGLONG)
+TC_ULONGLONG = TypeCode(TK_ULONGLONG)
+TC_LONGDOUBLE = TypeCode(TK_LONGDOUBLE)
+TC_WCHAR = TypeCode(TK_WCHAR)
+TC_STRING = TypeCode(TK_STRING)
+TC_WSTRING = TypeCode(TK_WSTRING)
+TC_OBJECT = TypeCode(TK_OBJREF, 'IDL:omg.org/CORBA/Object:1.0', 'Object')
+
+BASIC = dict((tc.kind, tc) for tc in [
+    TC_NULL, TC_VOID, TC_SHORT, TC_LONG, TC_USHORT, TC_ULONG, TC_FLOAT, TC_DOUBLE,
+    TC_BOOLEAN, TC_CHAR, TC_OCTET, TC_ANY, TC_TYPECODE, TC_LONGLONG, TC_ULONGLONG,
+    TC_LONGDOUBLE, TC_WCHAR])
+
+def string(bound=0):
+    return bound and TypeCode(TK_STRING, length=bound) or TC_STRING
+
+def wstring(bound=0):
+    return bound and TypeCode(TK_WSTRING, length=bound) or TC_WSTRING
+
+def sequence(content, bound=0):
+    return TypeCode(TK_SEQUENCE, content=content, length=bound)
+
+def array(content, length):
+    return TypeCode(TK_ARRAY, content=content, length=length)
+
+def objref(id, name):
+    return TypeCode(TK_OBJREF, id, name)
+
+# TypeCodes of the generated types by repository id, so that anys holding
+# them decode to the generated classes
+REGISTRY = {}
+
+def register(tc):
+    REGISTRY[tc.id] = tc
+    return tc
+
+def enum_reader(cls):
+    def read(data, pos, bo):
+        pos += -pos & 3
+        return cls._values[ULONG[bo].unpack_from(data, pos)[0]], pos + 4
+    return read
+
+def write_label(buf, tc, label, bo):
+    if label is None:
+        # the default branch
+        buf += b'\0'
+    else:
+        write_value(buf, tc, label, bo)
+
+def write_typecode(buf, tc, bo, base=0, enclosing=None):
+    # base is the stream offset buf starts at and enclosing maps the
+    # TypeCodes being written to the offset of their kind, so that
+    # recursive references become indirections
+    buf += ZEROS[:-len(buf) & 3]
+    position = base + len(buf)
+    if enclosing is not None and id(tc) in enclosing:
+        buf += ULONG[bo].pack(INDIRECTION)
+        buf += LONG[bo].pack(enclosing[id(tc)] - (position + 4))
+        return
+    kind = tc.kind
+    buf += ULONG[bo].pack(kind)
+    if kind in BOUNDED:
+        buf += ULONG[bo].pack(tc.length)
+        return
+    elif kind not in COMPLEX:
+        return
+    enclosing = dict(enclosing or {})
+    enclosing[id(tc)] = position
+    # the encapsulation starts after the kind and its length
+    base = position + 8
+    params = bytearray(OCTET[bo].pack(bo))
+    if kind in (TK_SEQUENCE, TK_ARRAY):
+        write_typecode(params, tc.content, bo, base, enclosing)
+        params += ZEROS[:-len(params) & 3]
+        params += ULONG[bo].pack(tc.length)
+    else:
+        cdr.write_string(params, tc.id, bo)
+        cdr.write_string(params, tc.name, bo)
+        if kind == TK_ALIAS:
+            write_typecode(params, tc.content, bo, base, enclosing)
+        elif kind == TK_ENUM:
+            params += ZEROS[:-len(params) & 3]
+            params += ULONG[bo].pack(len(tc.members))
+            for name in tc.members:
+                cdr.write_string(params, name, bo)
+        elif kind == TK_UNION:
+            write_typecode(params, tc.discriminator, bo, base, enclosing)
+            params += ZEROS[:-len(params) & 3]
+            params += LONG[bo].pack(tc.default_index())
+            params += ULONG[bo].pack(len(tc.members))
+            for label, name, member in tc.members:
+                write_label(params, tc.discriminator, label, bo)
+                cdr.write_string(params, name, bo)
+                write_typecode(params, member, bo, base, enclosing)
+        elif kind in (TK_STRUCT, TK_EXCEPT):
+            params += ZEROS[:-len(params) & 3]
+            params += ULONG[bo].pack(len(tc.members))
+            for name, member in tc.members:
+                cdr.write_string(params, name, bo)
+                write_typecode(params, member, bo, base, enclosing)
+    buf += ULONG[bo].pack(len(params))
+    buf += params
+
+def read_ulong(data, pos, bo):
+    pos += -pos & 3
+    check_length(data, pos, 4)
+    return ULONG[bo].unpack_from(data, pos)[0], pos + 4
+
+def read_typecode(data, pos, bo, base=0, enclosing=None):
+    pos += -pos & 3
+    position = base + pos
+    kind, pos = read_ulong(data, pos, bo)
+    if kind == INDIRECTION:
+        check_length(data, pos, 4)
+        offset, = LONG[bo].unpack_from(data, pos)
+        retval = (enclosing or {}).get(position + 4 + offset)
+        if retval is None:
+            raise MarshalError('Indirection at %d does not refer to an enclosing TypeCode' % position)
+        return retval, pos + 4
+    elif kind in BOUNDED:
+        bound, pos = read_ulong(data, pos, bo)
+        return (kind == TK_STRING and string or wstring)(bound), pos
+    elif kind not in COMPLEX:
+        retval = BASIC.get(kind)
+        if retval is None:
+            raise MarshalError('Unknown TypeCode kind %d' % kind)
+        return retval, pos
+    n, pos = read_ulong(data, pos, bo)
+    check_length(data, pos, n)
+    retval = TypeCode(kind)
+    enclosing = dict(enclosing or {})
+    enclosing[position] = retval
+    read_params(data[pos:pos + n], retval, base + pos, enclosing)
+    if retval.id in REGISTRY and REGISTRY[retval.id].kind == kind:
+        retval = REGISTRY[retval.id]
+    return retval, pos + n
+
+def read_params(params, tc, base, enclosing):
+    bo, = OCTET[0].unpack_from(params, 0)
+    pos = 1
+    kind = tc.kind
+    if kind in (TK_SEQUENCE, TK_ARRAY):
+        tc.content, pos = read_typecode(params, pos, bo, base, enclosing)
+        tc.length, pos = read_ulong(params, pos, bo)
+        return
+    tc.id, pos = cdr.read_string(params, pos, bo)
+    tc.name, pos = cdr.read_string(params, pos, bo)
+    if kind == TK_ALIAS:
+        tc.content, pos = read_typecode(params, pos, bo, base, enclosing)
+    elif kind == TK_ENUM:
+        n, pos = read_ulong(params, pos, bo)
+        tc.members = []
+        for _ in range(n):
+            name, pos = cdr.read_string(params, pos, bo)
+            tc.members.append(name)
+    elif kind == TK_UNION:
+        tc.discriminator, pos = read_typecode(params, pos, bo, base, enclosing)
+        pos += -pos & 3
+        default, = LONG[bo].unpack_from(params, pos)
+        n, pos = read_ulong(params, pos + 4, bo)
+        tc.members = []
+        for i in range(n):
+            if i == default:
+                label, pos = None, pos + 1
+            else:
+                label, pos = read_value(params, pos, tc.discriminator, bo)
+            name, pos = cdr.read_string(params, pos, bo)
+            member, pos = read_typecode(params, pos, bo, base, enclosing)
+            tc.members.append((label, name, member))
+    elif kind in (TK_STRUCT, TK_EXCEPT):
+        n, pos = read_ulong(params, pos, bo)
+        tc.members = []
+        for _ in range(n):
+            name, pos = cdr.read_string(params, pos, bo)
+            member, pos = read_typecode(params, pos, bo, base, enclosing)
+            tc.members.append((name, member))
+
+# decoded TypeCodes by their encoding; anys mostly carry a few types
+DECODED = {}
+DECODED_MAX = 256
+
+def decode_typecode(data, pos, bo):
+    pos += -pos & 3
+    kind, end = read_ulong(data, pos, bo)
+    if kind in COMPLEX:
+        n, end = read_ulong(data, end, bo)
+        end += n
+        check_length(data, pos, end - pos)
+        key = bo, tobytes(data[pos:end])
+        retval = DECODED.get(key)
+        if retval is None:
+            retval, end = read_typecode(data, pos, bo)
+            if len(DECODED) >= DECODED_MAX:
+                DECODED.clear()
+            DECODED[key] = retval
+        return retval, end
+    return read_typecode(data, pos, bo)
+
+def write_value(buf, tc, value, bo):
+    # the generated codecs when there are some, a walk of the TypeCode
+    # otherwise
+    if tc.write is not None:
+        tc.write(buf, value, bo)
+        return
+    kind = tc.kind
+    structs = STRUCTS.get(kind)
+    if structs is not None:
+        buf += ZEROS[:-len(buf) & (structs[bo].size - 1)]
+        buf += structs[bo].pack(value)
+    elif kind in (TK_STRING, TK_WSTRING):
+        (kind == TK_STRING and cdr.write_string or cdr.write_wstring)(buf, value, bo)
+    elif kind == TK_WCHAR:
+        cdr.write_wchar(buf, value, bo)
+    elif kind == TK_ENUM:
+        buf += ZEROS[:-len(buf) & 3]
+        buf += ULONG[bo].pack(value)
+    elif kind == TK_ALIAS:
+        write_value(buf, tc.content, value, bo)
+    elif kind == TK_SEQUENCE and tc.content.kind == TK_OCTET:
+        cdr.write_octets(buf, value, bo)
+    elif kind in (TK_SEQUENCE, TK_ARRAY):
+        if kind == TK_SEQUENCE:
+            buf += ZEROS[:-len(buf) & 3]
+            buf += ULONG[bo].pack(len(value))
+        for element in value:
+            write_value(buf, tc.content, element, bo)
+    elif kind in (TK_STRUCT, TK_EXCEPT):
+        for name, member in tc.members:
+            write_value(buf, member, getattr(value, name), bo)
+    elif kind == TK_UNION:
+        write_value(buf, tc.discriminator, value._d, bo)
+        default = None
+        for label, _, member in tc.members:
+            if label == value._d:
+                break
+            elif label is None:
+                default = member
+        else:
+            member = default
+        if member is not None:
+            write_value(buf, member, value._v, bo)
+    elif kind == TK_ANY:
+        write_any(buf, value, bo)
+    elif kind == TK_TYPECODE:
+        buf += ZEROS[:-len(buf) & 3]
+        buf += value.encode(bo)
+    elif kind not in (TK_NULL, TK_VOID):
+        raise MarshalError('%r cannot be marshaled' % tc)
+
+def read_value(data, pos, tc, bo):
+    # structs and unions without generated codecs decode to tuples of their
+    # members and (discriminator, value) pairs
+    if tc.read is not None:
+        return tc.read(data, pos, bo)
+    kind = tc.kind
+    structs = STRUCTS.get(kind)
+    if structs is not None:
+        size = structs[bo].size
+        pos += -pos & (size - 1)
+        check_length(data, pos, size)
+        return structs[bo].unpack_from(data, pos)[0], pos + size
+    elif kind == TK_STRING:
+        return cdr.read_string(data, pos, bo)
+    elif kind == TK_WSTRING:
+        return cdr.read_wstring(data, pos, bo)
+    elif kind == TK_WCHAR:
+        return cdr.read_wchar(data, pos, bo)
+    elif kind == TK_ENUM:
+        return read_ulong(data, pos, bo)
+    elif kind == TK_ALIAS:
+        return read_value(data, pos, tc.content, bo)
+    elif kind == TK_SEQUENCE and tc.content.kind == TK_OCTET:
+        value, pos = cdr.read_octets(data, pos, bo)
+        return tobytes(value), pos
+    elif kind in (TK_SEQUENCE, TK_ARRAY):
+        n = tc.length
+        if kind == TK_SEQUENCE:
+            n, pos = read_ulong(data, pos, bo)
+        values = []
+        for _ in range(n):
+            value, pos = read_value(data, pos, tc.content, bo)
+            values.append(value)
+        return values, pos
+    elif kind in (TK_STRUCT, TK_EXCEPT):
+        values = []
+        for _, member in tc.members:
+            value, pos = read_value(data, pos, member, bo)
+            values.append(value)
+        return tuple(values), pos
+    elif kind == TK_UNION:
+        d, pos = read_value(data, pos, tc.discriminator, bo)
+        default = None
+        for label, _, member in tc.members:
+            if label == d:
+                break
+            elif label is None:
+                default = member
+        else:
+            member = default
+        if member is None:
+            return (d, None), pos
+        value, pos = read_value(data, pos, member, bo)
+        return (d, value), pos
+    elif kind == TK_ANY:
+        return read_any(data, pos, bo)
+    elif kind == TK_TYPECODE:
+        return decode_typecode(data, pos, bo)
+    elif kind in (TK_NULL, TK_VOID):
+        return None, pos
+    raise MarshalError('%r cannot be marshaled' % tc)
+
+class Any(object):
+    __slots__ = ('typecode', 'value')
+
+    def __init__(self, typecode, value=None):
+        self.typecode = typecode
+        self.value = value
+
+    def __eq__(self, that):
+        return isinstance(that, Any) and self.typecode == that.typecode and self.value == that.value
+
+    def __ne__(self, that):
+        return not self == that
+
+    def __repr__(self):
+        return 'Any(%r, %r)' % (self.typecode, self.value)
+
+def write_any(buf, value, bo):
+    # the TypeCode goes out as the octets it has been encoded to once
+    if not isinstance(value, Any):
+        raise MarshalError('Any expected, got %r' % (value, ))
+    buf += ZEROS[:-len(buf) & 3]
+    buf += value.typecode.encode(bo)
+    write_value(buf, value.typecode, value.value, bo)
+
+def read_any(data, pos, bo):
+    tc, pos = decode_typecode(data, pos, bo)
+    value, pos = read_value(data, pos, tc, bo)
+    return Any(tc, value), pos
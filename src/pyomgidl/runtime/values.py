@@ -0,0 +1,15 @@
+__all__ = [
+    'hashable',
+    ]
+
+def hashable(value):
+    # sequences and arrays decode to lists, octets to memoryviews and, with
+    # numpy, to ndarrays; hash() takes none of them
+    if isinstance(value, (list, tuple)):
+        return tuple(hashable(item) for item in value)
+    elif isinstance(value, memoryview):
+        return value.tobytes()
+    tobytes = getattr(value, 'tobytes', None)
+    if tobytes is not None:
+        return tobytes()
+    return value
@@ -1,8 +1,158 @@
-from unittest import TestSuite, defaultTestLoader
+import os
+import sys
+import shutil
+import socket
+import tempfile
+import threading
+from StringIO import StringIO
+from unittest import TestCase, TestSuite, defaultTestLoader
+from pyomgidl.commands import main, compile_file
+from pyomgidl.daemon import CompileServer
+from pyomgidl.client import request
 
 __all__ = [
     'suite',
     ]
 
 def suite():
-    return defaultTestLoader.loadTestsFromName('pyomgidl.reader.tests')
+    return defaultTestLoader.loadTestsFromNames([
+        'pyomgidl.reader.tests',
+        'pyomgidl.codegen.tests',
+        'pyomgidl.tests.CommandsTest',
+        'pyomgidl.tests.DaemonTest',
+        ])
+
+class CommandsTest(TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.base_dir, 'inc'))
+        self.write('inc/base.idl', '#ifndef BASE\n#define BASE\nmodule Base { typedef long Id; };\n#endif\n')
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        shutil.rmtree(self.base_dir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.base_dir, name), 'w') as f:
+            f.write(text)
+        return os.path.join(self.base_dir, name)
+
+    def path(self, *components):
+        return os.path.join(self.base_dir, *components)
+
+    def testCompile(self):
+        a = self.write('a.idl', '#include <base.idl>\nmodule A { struct S { Base::Id id; long n[N]; }; };\n')
+        b = self.write('b.idl', '#include <base.idl>\nmodule B { struct T { Base::Id id; }; };\n')
+        self.assertEqual(0, main([a, b, '-b', 'cdr', '-o', self.path('out'), '-I', self.path('inc'), '-D', 'N=3',
+                                  '--depfile', self.path('out.d'), '--timings']))
+        for module in ('Base', 'A', 'B'):
+            self.assertTrue(os.path.exists(self.path('out', module, '__init__.py')))
+        with open(self.path('out.d')) as f:
+            depfile = f.read()
+        self.assertTrue(depfile.startswith(self.path('out') + ':'))
+        self.assertEqual(2, depfile.count(self.path('inc', 'base.idl')))
+        self.assertTrue('\n%s:\n' % self.path('inc', 'base.idl') in depfile)
+        self.assertTrue('generate (ms)' in sys.stderr.getvalue())
+
+    def testErrors(self):
+        a = self.write('a.idl', 'module A { struct S { long }; };\n')
+        b = self.write('b.idl', '#include "missing.idl"\n')
+        self.assertEqual(1, main([a, b, '-o', self.path('out')]))
+        errors = sys.stderr.getvalue().splitlines()
+        self.assertEqual(['%s: Syntax error at line 1' % a, "%s: Couldn't find 'missing.idl' at line 1" % b], errors)
+        self.assertFalse(os.path.exists(self.path('out')))
+
+    def testCache(self):
+        a = self.write('a.idl', '#include <base.idl>\nmodule A { struct S { Base::Id id; }; };\n')
+        kwargs = dict(include_path=[self.path('inc')], cache_dir=self.path('cache'))
+        spec, dependencies, error, stats, cached = compile_file(a, **kwargs)
+        self.assertFalse(cached)
+        self.assertEqual(spec, compile_file(a, **kwargs)[0])
+        self.assertTrue(compile_file(a, **kwargs)[4])
+        # an include changing invalidates the file including it
+        self.write('inc/base.idl', 'module Base { typedef short Id; };\n')
+        os.utime(self.path('inc', 'base.idl'), (0, 0))
+        spec2, _, _, _, cached = compile_file(a, **kwargs)
+        self.assertFalse(cached)
+        self.assertNotEqual(spec, spec2)
+
+class DaemonTest(TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.socket = os.path.join(self.base_dir, 'socket')
+        self.server = CompileServer(self.socket, poll_interval=0.05)
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.start()
+
+    def tearDown(self):
+        request(self.socket, {'command': 'stop'})
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.base_dir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.base_dir, name), 'w') as f:
+            f.write(text)
+        return os.path.join(self.base_dir, name)
+
+    def compile(self, *argv):
+        return request(self.socket, {'command': 'compile', 'argv': list(argv), 'cwd': self.base_dir})
+
+    def testCompile(self):
+        self.write('base.idl', 'module Base { typedef long Id; };\n')
+        self.write('a.idl', '#include "base.idl"\nmodule A { struct S { Base::Id id; }; };\n')
+        response = self.compile('a.idl', '-b', 'values', '--timings')
+        self.assertEqual(0, response['status'])
+        self.assertTrue('class S(object):' in response['stdout'])
+        self.assertTrue('miss' in response['stderr'])
+        response = self.compile('a.idl', '-b', 'values', '--timings')
+        self.assertTrue('hit' in response['stderr'])
+        # a changed include is noticed, whether or not it was polled yet
+        self.write('base.idl', 'module Base { typedef long Id; struct T { Id id; }; };\n')
+        os.utime(os.path.join(self.base_dir, 'base.idl'), (0, 0))
+        response = self.compile('a.idl', '-b', 'values', '--timings')
+        self.assertTrue('class T(object):' in response['stdout'])
+        self.assertTrue('miss' in response['stderr'])
+
+    def testPoll(self):
+        self.write('a.idl', 'module A { struct S { long id; }; };\n')
+        self.compile('a.idl', '-o', 'out')
+        self.assertEqual(1, len(self.server.specs))
+        os.utime(os.path.join(self.base_dir, 'a.idl'), (0, 0))
+        self.server.poll()
+        self.assertEqual(0, len(self.server.specs))
+
+    def testCacheSize(self):
+        self.assertEqual(0600, os.stat(self.socket).st_mode & 0777)
+        self.server.max_entries = 2
+        for name in ('a', 'b', 'c'):
+            self.write('%s.idl' % name, 'module %s { struct S { long id; }; };\n' % name.upper())
+        self.compile('a.idl', '-o', 'out')
+        self.compile('b.idl', '-o', 'out')
+        # a hit makes a the most recently used, so b goes first
+        self.compile('a.idl', '-o', 'out')
+        self.compile('c.idl', '-o', 'out')
+        self.assertEqual(['a.idl', 'c.idl'], [key[1] for key in self.server.specs])
+        self.assertEqual(1, len(self.server.outputs))
+
+    def testStalledClient(self):
+        self.server.request_timeout = 0.1
+        self.write('a.idl', 'module A { struct S { long id; }; };\n')
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            stalled.connect(self.socket)
+            stalled.sendall('{"command": ')
+            # the next client is served once the first one is dropped
+            self.assertEqual(0, self.compile('a.idl', '-b', 'values')['status'])
+            self.assertEqual('', stalled.recv(1))
+        finally:
+            stalled.close()
+
+    def testErrors(self):
+        self.write('a.idl', 'module A { struct S { long }; };\n')
+        response = self.compile('a.idl')
+        self.assertEqual(1, response['status'])
+        self.assertEqual('a.idl: Syntax error at line 1\n', response['stderr'])
+        self.assertEqual(2, self.compile('--no-such-option')['status'])